@@ -0,0 +1,294 @@
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Literal, Optional
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from modules.data_loader import registrar_cambio_talento, registrar_talento
+from modules.dataset import cargar_dataset
+from modules.instrumentation import instrumentacion
+from modules.recommendations import get_skill_gap
+from modules.capacity import INICIOS_ROL
+from modules.ranking import filtrar_ranking, pagina_ranking
+from modules.talent_store import tipos_talento
+
+# Servicio de scoring sin interfaz (para el ATS).
+# Ejecutar desde esta carpeta con un solo worker: uvicorn api:app
+# Los datos se cargan una vez por proceso y se mantienen en memoria, y las
+# altas de POST /candidatos (y los cambios de PUT /talento) solo se aplican en el proceso que las recibe
+# (los demás las verían al reiniciar, al releer el journal). Con varios
+# workers, un candidato recién dado de alta daría 404 en los otros.
+# Las peticiones se atienden en paralelo (threadpool): cada endpoint lee
+# dataset.estado una sola vez, para no mezclar talento y scores de dos versiones.
+
+ARCHIVO_POR_TIPO = {'Interno': 'data/talento_actual.csv', 'Externo': 'data/candidatos_externos.csv'}
+
+estado = {}
+
+@asynccontextmanager
+async def lifespan(app):
+    estado['dataset'] = cargar_dataset(cache_scores=True)
+    yield
+    estado.clear()
+
+app = FastAPI(title="Quether Talent Gap Analyzer API", lifespan=lifespan)
+
+@app.middleware("http")
+async def medir_peticion(request: Request, call_next):
+    inicio = time.perf_counter()
+    respuesta = await call_next(request)
+    # Etiqueta por plantilla de ruta (no por URL) para no disparar la cardinalidad
+    ruta = request.scope.get('route')
+    instrumentacion.registrar_medida(f"api {request.method} {getattr(ruta, 'path', 'desconocida')}", time.perf_counter() - inicio)
+    return respuesta
+
+class PeticionScores(BaseModel):
+    ids_empleado: Optional[List[int]] = None # None = todo el pool
+    roles: Optional[List[str]] = None # None = todos los roles futuros
+    componentes: bool = False
+
+class ParBrecha(BaseModel):
+    id_empleado: int
+    rol: str
+
+class PeticionBrechas(BaseModel):
+    pares: List[ParBrecha]
+
+class CambioProyecto(BaseModel):
+    proyecto: str
+    factor: float # Carga respecto a la actual (0 = el proyecto termina)
+    desde_mes: int = 0
+    hasta_mes: Optional[int] = None
+
+class PeticionCapacidad(BaseModel):
+    horizonte: Optional[int] = None # None = hasta el último hito / ventana de rol
+    inicio: str = 'temprano'
+    cambios: List[CambioProyecto] = []
+
+class NuevoTalento(BaseModel):
+    nombre: str
+    email: str = 'N/A'
+    tipo: Literal['Interno', 'Externo'] = 'Externo' # Validado antes de escribir nada en el journal
+    chapter: str = 'Externo'
+    rol_actual: str = 'Candidato Externo'
+    manager: str = 'N/A'
+    antigüedad: str = '0m'
+    habilidades: Dict[str, int]
+    responsabilidades_actuales: List[str] = []
+    dedicación_actual: Dict[str, float] = {}
+    ambiciones: Dict[str, object] = {'nivel_aspiración': 'junior'}
+
+def _dataset():
+    return estado['dataset']
+
+def _filas(estado_datos, ids_empleado):
+    if ids_empleado is None:
+        return np.arange(len(estado_datos.talent_df))
+    try:
+        return np.array([estado_datos.fila_por_id[i] for i in ids_empleado], dtype=np.intp)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Empleado no encontrado: {e.args[0]}")
+
+def _columnas(estado_datos, roles):
+    ids_rol = estado_datos.score_matrix['ids_rol']
+    if roles is None:
+        return list(range(len(ids_rol)))
+    try:
+        return [ids_rol.index(r) for r in roles]
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"Rol no encontrado en vision_futura.json: {roles}")
+
+@app.get("/health")
+def health():
+    dataset = _dataset()
+    estado_datos = dataset.estado
+    cache = dataset.cache_scores.estadisticas() if dataset.cache_scores is not None else None
+    return {'estado': 'ok', 'version': estado_datos.version, 'candidatos': len(estado_datos.talent_df), 'cache_scores': cache}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Métricas por etapa en formato de texto de Prometheus.
+    """
+    return instrumentacion.a_prometheus()
+
+@app.post("/scores")
+def scores(peticion: PeticionScores):
+    """
+    Scores candidato x rol (filas = ids_empleado, columnas = roles).
+    """
+    estado_datos = _dataset().estado
+    score_matrix = estado_datos.score_matrix
+    filas = _filas(estado_datos, peticion.ids_empleado)
+    columnas = _columnas(estado_datos, peticion.roles)
+    respuesta = {
+        'ids_empleado': score_matrix['ids_empleado'][filas].tolist(),
+        'roles': [score_matrix['ids_rol'][j] for j in columnas],
+        'total': score_matrix['total'][np.ix_(filas, columnas)].round(2).tolist(),
+    }
+    if peticion.componentes:
+        for clave in ('skills', 'responsabilidades', 'ambiciones', 'dedicacion'):
+            respuesta[clave] = score_matrix[clave][np.ix_(filas, columnas)].round(2).tolist()
+    return respuesta
+
+@app.get("/roles/{role_id}/top")
+def top_candidatos(role_id: str, k: int = 10, tipo: Optional[str] = None):
+    """
+    Top-K candidatos para un rol futuro ('tipo' = Interno / Externo), sobre
+    la columna precalculada de la matriz de scores.
+    """
+    estado_datos = _dataset().estado
+    scores = estado_datos.score_matrix['total'][:, _columnas(estado_datos, [role_id])[0]]
+    df = estado_datos.talent_df
+    if k <= 0:
+        return []
+    mascara = None if tipo is None else tipos_talento(df) == tipo
+    filas = pagina_ranking(scores, filtrar_ranking(scores, mascara), tamano_pagina=k)
+    return [
+        {'id_empleado': int(df['id_empleado'].iat[fila]), 'nombre': df['nombre'].iat[fila], 'score': round(float(scores[fila]), 2)}
+        for fila in filas.tolist()
+    ]
+
+@app.get("/kpis")
+def kpis():
+    """
+    KPIs estratégicos (los mismos que el Dashboard Estratégico).
+    """
+    riesgo_df, capacidad_df, gaps_df, project_load_df = _dataset().kpis_dataframes()
+    return {
+        'talento_en_riesgo': riesgo_df[['id_empleado', 'nombre', 'rol_actual', 'chapter']].to_dict(orient='records'),
+        'sobre_asignados': capacidad_df.to_dict(orient='records'),
+        'cobertura_roles': gaps_df.to_dict(orient='records'),
+        'vacios_criticos': gaps_df[gaps_df['Mejor Score (%)'] < 50]['Rol Futuro'].tolist(),
+        'carga_proyectos': project_load_df.to_dict(orient='records'),
+    }
+
+@app.post("/skill-gaps")
+def brechas(peticion: PeticionBrechas):
+    """
+    Brechas de habilidades (< 7) para cada par (empleado, rol).
+    """
+    dataset = _dataset()
+    estado_datos = dataset.estado
+    resultado = []
+    for par in peticion.pares:
+        fila = _filas(estado_datos, [par.id_empleado])[0]
+        rol_def = dataset.roles_lookup.get(par.rol)
+        if rol_def is None:
+            raise HTTPException(status_code=404, detail=f"Rol no encontrado en org_config.json: {par.rol}")
+        resultado.append({
+            'id_empleado': par.id_empleado, 'rol': par.rol,
+            'brecha': get_skill_gap(estado_datos.talent_df['habilidades'].iat[fila], rol_def.get('habilidades_requeridas', []), dataset.skills_lookup),
+        })
+    return resultado
+
+@app.get("/skill-gaps/resumen")
+def resumen_brechas(solo_internos: bool = True, top: int = 20):
+    """
+    Demanda de formación de toda la organización: skills que bloquean más
+    pares (candidato, rol), niveles a cerrar por chapter y ruta más barata por rol.
+    """
+    dataset = _dataset()
+    brechas = dataset.brechas()
+    # Del talento con el que se construyó la matriz (puede haber llegado un alta después)
+    candidatos = (tipos_talento(brechas.talent_df) == 'Interno') if solo_internos else None
+    chapters_df = brechas.puntos_por_chapter(candidatos)
+    return {
+        'version': dataset.version,
+        'bloqueos': brechas.bloqueos_por_skill(candidatos).head(top).to_dict(orient='records'),
+        'chapters': chapters_df[['Personas', 'Total']].reset_index().to_dict(orient='records'),
+        # Roles sin definición no tienen candidato (NaN no es JSON válido)
+        'rutas': brechas.ruta_mas_barata(candidatos).astype(object).replace({np.nan: None}).to_dict(orient='records'),
+    }
+
+@app.get("/chapters/habilidades")
+def habilidades_chapter(chapter: Optional[str] = None):
+    """
+    Analítica de habilidades de los internos de un chapter (o de toda la
+    organización sin 'chapter'): plantilla, nivel medio y distribución por skill.
+    """
+    dataset = _dataset()
+    analitica = dataset.analitica_chapters()
+    if chapter is not None and chapter not in analitica.chapters and chapter not in [c['nombre'] for c in dataset.config['chapters']]:
+        raise HTTPException(status_code=404, detail=f"Chapter no encontrado: {chapter}")
+    distribucion_df = analitica.distribucion_niveles(chapter)
+    return {
+        'version': dataset.version,
+        'chapter': chapter,
+        # Nivel medio NaN (chapter sin skills) no es JSON válido
+        'plantilla': analitica.plantilla().astype(object).replace({np.nan: None}).to_dict(orient='records'),
+        'promedios': analitica.promedio_habilidades(chapter).to_dict(orient='records'),
+        'distribucion': {skill: fila.tolist() for skill, fila in zip(distribucion_df.index, distribucion_df.to_numpy())},
+    }
+
+@app.post("/capacidad")
+def capacidad(peticion: PeticionCapacidad):
+    """
+    Plan de capacidad por meses: primer mes en que cada chapter supera su
+    capacidad y utilización mensual, con cambios opcionales de carga de proyectos.
+    """
+    dataset = _dataset()
+    if peticion.inicio not in INICIOS_ROL:
+        raise HTTPException(status_code=422, detail=f"Inicio desconocido: {peticion.inicio} (opciones: {INICIOS_ROL})")
+    plan = dataset.capacidad(peticion.horizonte, peticion.inicio)
+    if peticion.cambios:
+        plan = plan.copia()
+        for cambio in peticion.cambios:
+            if cambio.proyecto not in plan.proyectos:
+                raise HTTPException(status_code=404, detail=f"Proyecto no encontrado: {cambio.proyecto}")
+            plan.cambiar_carga_proyecto(cambio.proyecto, cambio.factor, cambio.desde_mes, cambio.hasta_mes)
+    exceso_df = plan.primer_mes_exceso()
+    utilizacion_df = plan.utilizacion_chapters()[exceso_df['Chapter'].tolist()]
+    return {
+        'version': dataset.version,
+        'horizonte': plan.horizonte,
+        'hitos': {str(mes): hitos for mes, hitos in plan.hitos.items()},
+        # Primer mes NA -> None (sin exceso en el horizonte)
+        'chapters': exceso_df.astype(object).where(exceso_df.notna(), None).to_dict(orient='records'),
+        # inf (chapter sin personas con demanda) no es JSON válido
+        'utilizacion': utilizacion_df.round(1).replace({np.inf: None}).to_dict(orient='list'),
+        'sobre_asignados_por_mes': plan.sobre_asignados_por_mes().tolist(),
+    }
+
+@app.post("/candidatos")
+def ingestar(candidatos: List[NuevoTalento]):
+    """
+    Alta incremental de candidatos: journal en disco + delta en memoria.
+    Devuelve el id asignado y sus scores contra todos los roles futuros.
+    """
+    dataset = _dataset()
+    registros = []
+    for candidato in candidatos:
+        datos = candidato.model_dump(exclude={'tipo'})
+        datos['metadata'] = {'tipo': candidato.tipo}
+        registros.append(registrar_talento(ARCHIVO_POR_TIPO[candidato.tipo], datos))
+    # Todo el lote en una sola alta: se puntúa y se publica una vez
+    filas = dataset.añadir_talentos(registros)
+    score_matrix = dataset.estado.score_matrix
+    return [{
+        'id_empleado': registro['id_empleado'],
+        'scores': dict(zip(score_matrix['ids_rol'], score_matrix['total'][fila].round(2).tolist())),
+    } for registro, fila in zip(registros, filas)]
+
+@app.put("/talento/{id_empleado}")
+def actualizar(id_empleado: int, candidato: NuevoTalento):
+    """
+    Cambio de una persona existente: journal de cambios + delta en memoria.
+    Los campos de 'metadata' distintos del tipo se conservan.
+    Devuelve sus scores actualizados contra todos los roles futuros.
+    """
+    dataset = _dataset()
+    estado_datos = dataset.estado
+    fila = _filas(estado_datos, [id_empleado])[0]
+    datos = candidato.model_dump(exclude={'tipo'})
+    datos['id_empleado'] = id_empleado
+    datos['metadata'] = dict(estado_datos.talent_df['metadata'].iloc[fila] or {}, tipo=candidato.tipo)
+    registro = registrar_cambio_talento(os.path.dirname(ARCHIVO_POR_TIPO[candidato.tipo]), datos)
+    fila = dataset.actualizar_talento(registro)
+    score_matrix = dataset.estado.score_matrix
+    return {
+        'id_empleado': id_empleado,
+        'scores': dict(zip(score_matrix['ids_rol'], score_matrix['total'][fila].round(2).tolist())),
+    }
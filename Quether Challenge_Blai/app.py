@@ -1,14 +1,17 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
-from modules.data_loader import load_all_data
-from modules.compatibility import calcular_compatibilidad_total
-from modules.recommendations import generar_plan_desarrollo, generar_resumen_ejecutivo
+from modules.data_loader import registrar_talento
+from modules.dataset import cargar_dataset
+from modules.capacity import HORIZONTE_MESES, INICIOS_ROL
+from modules.instrumentation import instrumentacion, etapa, ProfilerMuestreo
+from modules.recommendations import generar_plan_desarrollo_stream, generar_planes_lote, generar_resumen_ejecutivo_stream
+from modules.graph import generar_html_grafo, modo_detalle
+from modules.talent_store import tipos_talento
+from modules.ranking import NOMBRES_BANDAS, filtrar_ranking, pagina_ranking, tabla_pagina
+from modules.scenarios import Escenario, MotorEscenarios
+from modules.compatibility import PESOS_COMPONENTES
 import json
-from collections import defaultdict
-import networkx as nx
-from pyvis.network import Network
 import streamlit.components.v1 as components
 
 # --- Configuración y Carga de Datos ---
@@ -16,39 +19,24 @@ st.set_page_config(page_title="Talent Gap Analyzer", layout="wide", initial_side
 st.title("Quether Talent Gap Analyzer")
 st.markdown("Optimización de Alineación de Talento en la Empresa del Futuro.")
 
-@st.cache_data # Cachear los datos para performance
+# --- Instrumentación por rerun (ver panel "Debug: Rendimiento" en la sidebar) ---
+instrumentacion.iniciar_ejecucion()
+profiler = ProfilerMuestreo().iniciar() if st.session_state.get('debug_perfilar') else None
+
+@st.cache_resource # Un único dataset en memoria, compartido y actualizado por deltas
 def cargar_datos():
-    config, vision, talent_df = load_all_data()
-    roles_lookup = {rol['id']: rol for rol in config['roles']}
-    skills_lookup = {skill['id']: skill['nombre'] for skill in config['skills']}
-    return config, vision, talent_df, roles_lookup, skills_lookup
+    # Con caché de scores en disco: al reiniciar solo se puntúa lo que haya cambiado
+    return cargar_dataset(cache_scores=True)
 
-config, vision, talent_df, roles_lookup, skills_lookup = cargar_datos()
-roles_futuros_opciones = {rol['título']: rol for rol in vision['roles_necesarios']}
+@st.cache_resource(max_entries=1) # El motor what-if se rehace solo cuando cambia el dataset
+def motor_escenarios(_dataset, version):
+    return MotorEscenarios.desde_dataset(_dataset)
 
-# --- Funciones de Cálculo para el Dashboard ---
-def get_strategic_kpis(talent_df, vision_df, roles_lookup):
-    internal_df = talent_df[talent_df['metadata'].apply(lambda x: x.get('tipo', 'Interno') == 'Interno')].copy()
-    riesgo_df = internal_df[internal_df['metadata'].apply(lambda x: x.get('retention_risk') == 'Media')]
-    internal_df['dedicacion_total'] = internal_df['dedicación_actual'].apply(lambda x: sum(x.values()) if isinstance(x, dict) else 0)
-    capacidad_df = internal_df[internal_df['dedicacion_total'] > 95][['nombre', 'rol_actual', 'dedicacion_total']]
-    project_load = defaultdict(int)
-    for projects_dict in internal_df['dedicación_actual']:
-        if isinstance(projects_dict, dict):
-            for project, load in projects_dict.items():
-                project_load[project] += load
-    project_load_df = pd.DataFrame(project_load.items(), columns=['Proyecto', 'Carga Total (%)']).sort_values(by='Carga Total (%)', ascending=False)
-    roles_futuros = vision_df['roles_necesarios']
-    gaps_data = []
-    for rol in roles_futuros:
-        best_score = 0
-        for idx, empleado in internal_df.iterrows():
-            score = calcular_compatibilidad_total(empleado, rol, roles_lookup)
-            if score > best_score:
-                best_score = score
-        gaps_data.append({'Rol Futuro': rol['título'], 'Mejor Score (%)': int(best_score)})
-    gaps_df = pd.DataFrame(gaps_data).sort_values(by='Mejor Score (%)', ascending=True)
-    return riesgo_df, capacidad_df, gaps_df, project_load_df
+with etapa('app.cargar_datos'):
+    dataset = cargar_datos()
+config, vision, talent_df = dataset.config, dataset.vision, dataset.talent_df
+roles_lookup, skills_lookup, score_matrix = dataset.roles_lookup, dataset.skills_lookup, dataset.score_matrix
+roles_futuros_opciones = {rol['título']: rol for rol in vision['roles_necesarios']}
 
 # --- Sidebar (Global) ---
 st.sidebar.header("Captura de Talento")
@@ -124,20 +112,17 @@ with st.sidebar.expander("Formulario de Nuevo Talento"):
             else:
                 try:
                     talent_type_from_radio = st.session_state.talent_type_radio
-                    new_id = (talent_df['id_empleado'].max() + 1) if not talent_df.empty else 1001
                     
                     # --- PASO 4: Usar los valores de los sliders ---
                     new_skills_dict = skill_levels_from_sliders 
                     
                     metadata_dict = {"tipo": "Interno" if talent_type_from_radio == 'Interno (Empleado Actual)' else "Externo"}
-                    new_talent_data = {"id_empleado": new_id, "nombre": new_name, "email": new_email or 'N/A', "chapter": new_chapter, "rol_actual": new_rol, "manager": new_manager, "antigüedad": "0m", "habilidades": str(new_skills_dict), "responsabilidades_actuales": str([]), "dedicación_actual": str({}), "ambiciones": str({"nivel_aspiración": "junior"}), "metadata": str(metadata_dict)}
+                    new_talent_data = {"nombre": new_name, "email": new_email or 'N/A', "chapter": new_chapter, "rol_actual": new_rol, "manager": new_manager, "antigüedad": "0m", "habilidades": new_skills_dict, "responsabilidades_actuales": [], "dedicación_actual": {}, "ambiciones": {"nivel_aspiración": "junior"}, "metadata": metadata_dict}
                     filepath_to_save = 'data/talento_actual.csv' if talent_type_from_radio == 'Interno (Empleado Actual)' else 'data/candidatos_externos.csv'
-                    current_talent_df = pd.read_csv(filepath_to_save)
-                    new_row_df = pd.DataFrame([new_talent_data])
-                    updated_df = pd.concat([current_talent_df, new_row_df], ignore_index=True)
-                    updated_df.to_csv(filepath_to_save, index=False)
                     
-                    st.cache_data.clear()
+                    # Alta O(1) en el journal + delta al dataset en memoria (sin recargar ni repuntuar todo)
+                    registro = registrar_talento(filepath_to_save, new_talent_data)
+                    dataset.añadir_talento(registro)
                     st.success(f"¡Talento {new_name} añadido a {filepath_to_save}!")
                     st.rerun()
                     
@@ -146,7 +131,9 @@ with st.sidebar.expander("Formulario de Nuevo Talento"):
 
 # --- Dashboard Estratégico (Vista "General") ---
 st.header("Dashboard Estratégico (Vista General)")
-riesgo_df, capacidad_df, gaps_df, project_load_df = get_strategic_kpis(talent_df, vision, roles_lookup)
+with etapa('app.kpis', filas=len(talent_df)):
+    # Snapshot materializado: se mantiene por deltas, no se recalcula en cada rerun
+    riesgo_df, capacidad_df, gaps_df, project_load_df = dataset.kpis_dataframes()
 gaps_list_criticos = gaps_df[gaps_df['Mejor Score (%)'] < 50]['Rol Futuro'].tolist()
 col1, col2, col3 = st.columns(3)
 col1.metric("Talento en Riesgo (Fuga)", f"{len(riesgo_df)} Empleados")
@@ -171,13 +158,70 @@ with st.expander("Ver Detalles del Diagnóstico"):
     with c2: st.subheader("Capacidad Excedida (>95%)"); st.dataframe(capacidad_df)
     with c3: st.subheader("Vacíos Críticos (Roles <50%)"); st.dataframe(gaps_list_criticos, column_config={"value": "Rol Futuro"})
 
+with st.expander("Plan de Staffing Óptimo (Asignación Global)"):
+    st.caption("Asigna como mucho una plaza por persona, respetando la 'cantidad' de cada rol y la capacidad libre de cada empleado.")
+    s1, s2 = st.columns(2)
+    incluir_externos = s1.checkbox("Incluir candidatos externos", value=False, key="staffing_externos")
+    # Por defecto no: con los datos actuales todos los internos están al 100% y no se asignaría a nadie
+    considerar_dedicacion = s2.checkbox("Descontar la dedicación actual a proyectos", value=False, key="staffing_dedicacion")
+    tipos_staffing = tipos_talento(talent_df)
+    with etapa('app.staffing', filas=len(talent_df)):
+        plan = dataset.plan_staffing(incluir_externos, considerar_dedicacion)
+    if plan['sin_capacidad']:
+        st.warning("Ningún candidato tiene capacidad libre para las plazas: todos están ya al 100% en proyectos. "
+                   "Desmarca 'Descontar la dedicación actual a proyectos' para planificar sin contar la carga actual.")
+    plan_df = pd.DataFrame([
+        {'Rol Futuro': vision['roles_necesarios'][j]['título'], 'Nombre': talent_df['nombre'].iloc[fila],
+         'Tipo': tipos_staffing[fila], 'Compatibilidad (%)': round(score, 1)}
+        for fila, j, score in plan['asignaciones']
+    ])
+    p1, p2 = st.columns(2)
+    with p1: st.subheader("Asignaciones"); st.dataframe(plan_df)
+    with p2: st.subheader(f"Vacíos Reales ({len(plan['vacios'])} Roles)"); st.dataframe(pd.DataFrame(plan['vacios']))
+
+with st.expander("Planificación de Capacidad (Timeline)"):
+    st.caption("Carga mensual de cada chapter (proyectos actuales + roles futuros desde su 'inicio_estimado') frente a su capacidad (internos x 100%).")
+    k1, k2, k3 = st.columns(3)
+    horizonte_cap = k1.slider("Horizonte (meses)", 12, 60, HORIZONTE_MESES, step=6, key="capacidad_horizonte")
+    inicio_cap = k2.selectbox("Inicio de los roles en su ventana", INICIOS_ROL, key="capacidad_inicio")
+    sumar_plan = k3.checkbox("Sumar el plan de staffing a las personas asignadas", value=False, key="capacidad_plan")
+    with etapa('app.capacidad', filas=len(talent_df)):
+        plan_capacidad = dataset.capacidad(horizonte_cap, inicio_cap)
+        proyectos_cap = ['Ninguno'] + sorted(plan_capacidad.proyectos)
+        q1, q2, q3 = st.columns(3)
+        proyecto_cap = q1.selectbox("Cambiar la carga de un proyecto", proyectos_cap, key="capacidad_proyecto")
+        factor_cap = q2.slider("Carga (% de la actual)", 0, 200, 100, step=10, key="capacidad_factor")
+        desde_cap = q3.slider("Desde el mes", 0, 60, 0, key="capacidad_desde")
+        if proyecto_cap != 'Ninguno' or sumar_plan:
+            # Copia: el plan cacheado lo comparten todas las sesiones
+            plan_capacidad = plan_capacidad.copia(plan['asignaciones'] if sumar_plan else None)
+            if proyecto_cap != 'Ninguno':
+                plan_capacidad.cambiar_carga_proyecto(proyecto_cap, factor_cap / 100, desde_cap)
+        exceso_df = plan_capacidad.primer_mes_exceso()
+        utilizacion_df = plan_capacidad.utilizacion_chapters()[exceso_df['Chapter'].tolist()]
+        sobre_mes = plan_capacidad.sobre_asignados_por_mes()
+    fig_capacidad = px.line(utilizacion_df.clip(upper=300).reset_index().melt(id_vars='mes', var_name='Chapter', value_name='Utilización (%)'),
+                            x='mes', y='Utilización (%)', color='Chapter', title="Utilización de Capacidad por Chapter")
+    fig_capacidad.add_hline(y=100, line_dash='dash', line_color='red')
+    for mes_hito in plan_capacidad.hitos:
+        if mes_hito <= horizonte_cap:
+            fig_capacidad.add_vline(x=mes_hito, line_dash='dot', annotation_text=f"Hitos {mes_hito}m")
+    st.plotly_chart(fig_capacidad, use_container_width=True)
+    m1, m2 = st.columns(2)
+    m1.metric("Chapters que Superan su Capacidad", f"{int(exceso_df['Primer Mes en Exceso'].notna().sum())} de {len(exceso_df)}")
+    m2.metric("Sobre-asignados (Pico Mensual)", f"{int(sobre_mes.max())} Empleados", delta=int(sobre_mes.max() - sobre_mes.iloc[0]), delta_color='inverse')
+    st.subheader("Primer Mes en Exceso por Chapter")
+    st.dataframe(exceso_df, hide_index=True, use_container_width=True)
+
 if st.button("Generar Resumen Ejecutivo (IA)"):
-    with st.spinner("La IA está analizando la situación..."):
-        riesgo_str = "Ninguno" if riesgo_df.empty else riesgo_df['nombre'].to_string(index=False)
-        capacidad_str = "Ninguno" if capacidad_df.empty else capacidad_df['nombre'].to_string(index=False)
-        gaps_str = "Ninguno" if not gaps_list_criticos else "\n".join(gaps_list_criticos)
-        resumen = generar_resumen_ejecutivo(riesgo_str, capacidad_str, gaps_str)
-        st.info("Resumen Ejecutivo (Generado por IA)"); st.markdown(resumen)
+    riesgo_str = "Ninguno" if riesgo_df.empty else riesgo_df['nombre'].to_string(index=False)
+    capacidad_str = "Ninguno" if capacidad_df.empty else capacidad_df['nombre'].to_string(index=False)
+    gaps_str = "Ninguno" if not gaps_list_criticos else "\n".join(gaps_list_criticos)
+    st.info("Resumen Ejecutivo (Generado por IA)")
+    metricas_resumen = {}
+    st.write_stream(generar_resumen_ejecutivo_stream(riesgo_str, capacidad_str, gaps_str, metricas=metricas_resumen))
+    if metricas_resumen.get('ttft') is not None:
+        st.caption(f"Primer token: {metricas_resumen['ttft']:.2f}s · Total: {metricas_resumen['total']:.2f}s")
 
 st.divider()
 
@@ -191,42 +235,93 @@ with st.expander("Análisis Táctico de Roles (Mánagers)"):
     )
     selected_rol_futuro = roles_futuros_opciones[selected_rol_titulo_tactico]
     st.subheader(f"Rol Futuro Seleccionado: {selected_rol_titulo_tactico}")
-    scores = []
-    for idx, empleado_row in talent_df.iterrows():
-        if not isinstance(empleado_row.get('metadata'), dict): empleado_row['metadata'] = {}
-        score = calcular_compatibilidad_total(empleado_row, selected_rol_futuro, roles_lookup)
-        talent_type = empleado_row['metadata'].get('tipo', 'Interno')
-        scores.append({'ID Empleado': empleado_row['id_empleado'], 'Nombre': empleado_row['nombre'], 'Rol Actual': empleado_row['rol_actual'], 'Tipo': talent_type, 'Compatibilidad': round(score, 2)})
-    ranking_df = pd.DataFrame(scores).sort_values(by='Compatibilidad', ascending=False)
-    internal_df = ranking_df[ranking_df['Tipo'] == 'Interno']
-    external_df = ranking_df[ranking_df['Tipo'] == 'Externo']
-    def display_ranking_table(df, key_prefix):
-        col1, col2, col3, col4 = st.columns([2, 2, 2, 2])
-        col1.markdown("**Nombre**"); col2.markdown("**Rol Actual / Estado**"); col3.markdown("**Compatibilidad (%)**"); col4.markdown("**Acción (Plan IA)**")
-        st.divider()
-        if df.empty: st.info("No hay candidatos en esta categoría."); return
-        for idx, row in df.iterrows():
-            col1, col2, col3, col4 = st.columns([2, 2, 2, 2])
-            col1.write(row['Nombre']); col2.write(row['Rol Actual'])
-            score_val = int(row['Compatibilidad'])
-            if score_val > 85: label = f"{score_val}% (READY)"
-            elif score_val > 70: label = f"{score_val}% (READY_WITH_SUPPORT)"
-            elif score_val > 50: label = f"{score_val}% (NEAR)"
-            elif score_val > 25: label = f"{score_val}% (FAR)"
-            else: label = f"{score_val}% (NOT_VIABLE)"
-            col3.progress(score_val, text=label)
-            if col4.button("Generar Plan", key=f"{key_prefix}_{row['ID Empleado']}"):
-                with st.spinner(f"Generando plan para {row['Nombre']}..."):
-                    empleado_data = talent_df[talent_df['id_empleado'] == row['ID Empleado']].iloc[0]
-                    rol_def_data = roles_lookup.get(selected_rol_futuro['id'])
-                    if rol_def_data:
-                        plan_ia = generar_plan_desarrollo(empleado_data, selected_rol_futuro, rol_def_data, row['Compatibilidad'], skills_lookup)
-                        with st.expander(f"Ver Plan de Desarrollo para {row['Nombre']}", expanded=True): st.markdown(plan_ia)
-                    else: st.error(f"Error: No se encontró la definición del rol {selected_rol_futuro['id']} en org_config.json")
+    # Columna de scores precalculada del rol (se mantiene por deltas en el dataset)
+    scores_rol = score_matrix['total'][:, score_matrix['ids_rol'].index(selected_rol_futuro['id'])]
+    tipos_ranking = tipos_talento(talent_df)
+    rol_def_data = roles_lookup.get(selected_rol_futuro['id'])
+    ordenes_ranking = {'Compatibilidad (mayor primero)': 'score_desc', 'Compatibilidad (menor primero)': 'score_asc', 'Nombre (A-Z)': 'nombre'}
+    def mostrar_plan(row):
+        empleado_data = talent_df.iloc[dataset.fila_por_id[row['ID Empleado']]]
+        with st.expander(f"Ver Plan de Desarrollo para {row['Nombre']}", expanded=True):
+            metricas_plan = {}
+            st.write_stream(generar_plan_desarrollo_stream(empleado_data, selected_rol_futuro, rol_def_data, row['Compatibilidad'], skills_lookup, metricas=metricas_plan))
+            if metricas_plan.get('ttft') is not None:
+                st.caption(f"Primer token: {metricas_plan['ttft']:.2f}s · Total: {metricas_plan['total']:.2f}s")
+    def display_ranking_table(talent_filter, key_prefix):
+        # Orden, filtro y paginación en servidor: solo se materializa la página visible
+        f1, f2, f3 = st.columns([3, 2, 1])
+        bandas = f1.multiselect("Bandas de preparación", NOMBRES_BANDAS, default=NOMBRES_BANDAS, key=f"{key_prefix}_bandas")
+        orden = ordenes_ranking[f2.selectbox("Ordenar por", list(ordenes_ranking), key=f"{key_prefix}_orden")]
+        tamano_pagina = f3.selectbox("Filas por página", [10, 25, 50, 100], index=1, key=f"{key_prefix}_tamano")
+        candidatas = filtrar_ranking(scores_rol, tipos_ranking == talent_filter, bandas)
+        total = len(candidatas)
+        n_paginas = max(1, -(-total // tamano_pagina))
+        pagina = st.number_input(f"Página (de {n_paginas})", min_value=1, max_value=n_paginas, value=1, step=1, key=f"{key_prefix}_pagina") - 1
+        filas = pagina_ranking(scores_rol, candidatas, talent_df['nombre'], orden, pagina, tamano_pagina)
+        df = tabla_pagina(talent_df, filas, scores_rol, tipos_ranking)
+        if df.empty: st.info("No hay candidatos en esta categoría."); return df
+        st.caption(f"{total} candidatos · mostrando {pagina * tamano_pagina + 1}-{pagina * tamano_pagina + len(df)}. Selecciona una fila para generar su Plan IA.")
+        seleccion = st.dataframe(
+            df, hide_index=True, use_container_width=True, on_select="rerun", selection_mode="single-row", key=f"{key_prefix}_tabla",
+            column_config={'Compatibilidad': st.column_config.ProgressColumn("Compatibilidad (%)", min_value=0, max_value=100, format="%.2f")}
+        )
+        filas_seleccionadas = seleccion.selection.rows
+        if filas_seleccionadas:
+            if rol_def_data: mostrar_plan(df.iloc[filas_seleccionadas[0]])
+            else: st.error(f"Error: No se encontró la definición del rol {selected_rol_futuro['id']} en org_config.json")
+        return df
     tab_internos, tab_externos = st.tabs(["Ranking de Candidatos Internos", "Ranking de Candidatos Externos (Talent Pool)"])
-    with tab_internos: display_ranking_table(internal_df, "internal")
-    with tab_externos: display_ranking_table(external_df, "external")
+    with etapa('app.ranking', filas=len(talent_df)):
+        with tab_internos: internal_df = display_ranking_table('Interno', "internal")
+        with tab_externos: display_ranking_table('Externo', "external")
+    if rol_def_data and not internal_df.empty and st.button(f"Generar Planes IA para los {len(internal_df)} Internos de la Página", key="batch_plans"):
+        with st.spinner(f"Generando {len(internal_df)} planes en paralelo..."):
+            peticiones = [(talent_df.iloc[dataset.fila_por_id[row['ID Empleado']]], selected_rol_futuro, rol_def_data, row['Compatibilidad'])
+                          for _, row in internal_df.iterrows()]
+            planes = generar_planes_lote(peticiones, skills_lookup)
+        for (_, row), plan_ia in zip(internal_df.iterrows(), planes):
+            with st.expander(f"Ver Plan de Desarrollo para {row['Nombre']}"): st.markdown(plan_ia)
 
+# --- Simulador What-If (Escenarios) ---
+with st.expander("Simulador What-If (Formación y Pesos)"):
+    st.caption("Cambia los pesos del score o sube/baja niveles de skills y mira quién entra o sale de cada banda. No modifica los datos.")
+    motor = motor_escenarios(dataset, dataset.version)
+    w_cols = st.columns(len(PESOS_COMPONENTES))
+    pesos_escenario = {c: col.slider(f"Peso {c}", 0, 100, peso, key=f"whatif_peso_{c}")
+                       for col, (c, peso) in zip(w_cols, PESOS_COMPONENTES.items())}
+    if 'whatif_ediciones' not in st.session_state: st.session_state.whatif_ediciones = []
+    if 'whatif_guardados' not in st.session_state: st.session_state.whatif_guardados = []
+    tipos_whatif = tipos_talento(talent_df)
+    filas_internas = [int(f) for f in (tipos_whatif == 'Interno').nonzero()[0]]
+    e1, e2, e3, e4 = st.columns([3, 3, 2, 1])
+    fila_edicion = e1.selectbox("Empleado", filas_internas, format_func=lambda f: talent_df['nombre'].iloc[f], key="whatif_empleado")
+    skill_edicion = e2.selectbox("Skill", all_skills_list, format_func=lambda x: f"{x[1]} ({x[0]})", key="whatif_skill")
+    nivel_edicion = e3.slider("Nuevo nivel", 0, 10, 8, key="whatif_nivel")
+    if e4.button("Añadir", key="whatif_anadir") and fila_edicion is not None:
+        st.session_state.whatif_ediciones.append((int(talent_df['id_empleado'].iloc[fila_edicion]), skill_edicion[0], nivel_edicion))
+    if st.session_state.whatif_ediciones:
+        st.dataframe(pd.DataFrame(st.session_state.whatif_ediciones, columns=['id_empleado', 'skill', 'nivel']), hide_index=True)
+        if st.button("Quitar ediciones", key="whatif_limpiar"): st.session_state.whatif_ediciones = []; st.rerun()
+    try:
+        escenario = Escenario("Escenario", pesos_escenario, st.session_state.whatif_ediciones)
+        st.caption("Pesos efectivos: " + " · ".join(f"{c} {p:.1f}" for c, p in escenario.pesos_normalizados().items()))
+    except ValueError as e:
+        st.error(str(e)); escenario = None
+    b1, b2 = st.columns(2)
+    banda_whatif = b1.selectbox("Banda", NOMBRES_BANDAS[:-1], key="whatif_banda")
+    solo_internos_whatif = b2.checkbox("Solo internos", value=True, key="whatif_internos")
+    candidatos_whatif = (tipos_whatif == 'Interno') if solo_internos_whatif else None
+    if escenario is not None:
+        with etapa('app.whatif', filas=len(talent_df)):
+            cambios_df = motor.cambios_banda(escenario, banda_whatif, candidatos_whatif)
+        st.subheader(f"Cambios en {banda_whatif} ({len(cambios_df)})")
+        st.dataframe(cambios_df, hide_index=True, use_container_width=True)
+        nombre_guardado = st.text_input("Nombre del escenario", value=f"Escenario {len(st.session_state.whatif_guardados) + 1}")
+        if st.button("Guardar escenario", key="whatif_guardar"):
+            st.session_state.whatif_guardados.append(Escenario(nombre_guardado, pesos_escenario, st.session_state.whatif_ediciones))
+    if st.session_state.whatif_guardados:
+        st.subheader("Comparativa de Escenarios")
+        st.dataframe(motor.comparar([Escenario('Base')] + st.session_state.whatif_guardados, banda_whatif, candidatos_whatif), hide_index=True)
 
 # --- Sección de Talento Actual ---
 with st.expander("Dashboard de Talento Actual (Vista de RRHH)"):
@@ -236,45 +331,77 @@ with st.expander("Dashboard de Talento Actual (Vista de RRHH)"):
         options=['Todos'] + [c['nombre'] for c in config['chapters']],
         key="hr_selector"
     )
-    internal_talent_df_hr = talent_df[talent_df['metadata'].apply(lambda x: x.get('tipo', 'Interno') == 'Interno')]
+    # Solo se materializan las filas internas (con el modelo compacto, el resto no sale de los arrays)
+    internal_talent_df_hr = talent_df[tipos_talento(talent_df) == 'Interno']
     if selected_chapter_hr == 'Todos': display_df = internal_talent_df_hr
     else: display_df = internal_talent_df_hr[internal_talent_df_hr['chapter'] == selected_chapter_hr]
     st.dataframe(display_df[['nombre', 'chapter', 'rol_actual', 'manager']])
     st.subheader(f"Promedio de Habilidades en: {selected_chapter_hr}")
-    skills_data = []
-    for idx, row in display_df.iterrows():
-        if isinstance(row['habilidades'], dict):
-            for skill_id, level in row['habilidades'].items():
-                skills_data.append({'nombre': row['nombre'], 'skill_nombre': skills_lookup.get(skill_id, skill_id), 'nivel': level})
-    skills_df = pd.DataFrame(skills_data)
-    if not skills_df.empty:
-        avg_skills = skills_df.groupby('skill_nombre')['nivel'].mean().reset_index().sort_values(by='nivel')
+    with etapa('app.skills_promedio', filas=len(display_df)):
+        # Agregados precalculados por chapter: cambiar de chapter es una consulta a la caché
+        analitica = dataset.analitica_chapters()
+        chapter_analitica = None if selected_chapter_hr == 'Todos' else selected_chapter_hr
+        avg_skills = analitica.promedio_habilidades(chapter_analitica)
+    if not avg_skills.empty:
         fig_avg_skills = px.bar(avg_skills, x='nivel', y='skill_nombre', orientation='h', title="Nivel de Habilidad Promedio (0-10)")
         st.plotly_chart(fig_avg_skills, use_container_width=True)
+        st.subheader("Distribución de Niveles (Nº de Personas)")
+        st.dataframe(analitica.distribucion_niveles(chapter_analitica), use_container_width=True)
 
     # --- Grafo de Habilidades (Pyvis) ---
     st.subheader("Grafo Interactivo de Conexiones (Empleados y Habilidades)")
 
-    G = nx.Graph()
-    for idx, row in display_df.iterrows():
-        G.add_node(row['nombre'], type='empleado', title=row['rol_actual'], color='#1E90FF') # Azul
-    for skill_id, skill_name in skills_lookup.items():
-        skill_in_use = any(skill_id in row['habilidades'] for _, row in display_df.iterrows() if isinstance(row['habilidades'], dict))
-        if skill_in_use:
-            G.add_node(skill_name, type='habilidad', title=skill_name, color='#32CD32') # Verde
-    for idx, row in display_df.iterrows():
-        if isinstance(row['habilidades'], dict):
-            for skill_id, level in row['habilidades'].items():
-                if level > 4 and skill_id in skills_lookup:
-                    skill_name = skills_lookup[skill_id]
-                    if G.has_node(row['nombre']) and G.has_node(skill_name):
-                        G.add_edge(row['nombre'], skill_name, value=level/2, title=f"Nivel: {level}")
-    net = Network(height='750px', width='100%', bgcolor='#222222', font_color='white', notebook=True, cdn_resources='in_line')
-    net.from_nx(G)
-    net.toggle_physics(True)
-    
+    col_umbral, col_top, col_modo = st.columns(3)
+    umbral_grafo = col_umbral.slider("Nivel mínimo de conexión (>)", 0, 9, 4, key="grafo_umbral")
+    top_n_grafo = col_top.number_input("Máx. conexiones por nodo (0 = todas)", min_value=0, value=0, step=1, key="grafo_top_n")
+    modos_grafo = {'Automático': 'auto', 'Detalle (empleados)': None, 'Agrupado por Chapter': 'chapter', 'Agrupado por Rol': 'rol_actual'}
+    modo_grafo = modos_grafo[col_modo.selectbox("Nivel de detalle", list(modos_grafo), key="grafo_modo")]
+    agrupar_por = modo_detalle(display_df, modo_grafo, selected_chapter_hr)
+    if agrupar_por is not None:
+        st.caption(f"{len(display_df)} empleados: el grafo se muestra agrupado por '{agrupar_por}'.")
+
     try:
-        net.generate_html()
-        components.html(net.html, height=800, scrolling=True)
+        with etapa('app.grafo', filas=len(display_df)):
+            # La clave incluye la versión del dataset: un alta nueva invalida el HTML cacheado
+            html_grafo = generar_html_grafo(display_df, skills_lookup, clave_cache=(selected_chapter_hr, dataset.version),
+                                            umbral_nivel=umbral_grafo, top_n=int(top_n_grafo) or None, agrupar_por=agrupar_por)
+        components.html(html_grafo, height=800, scrolling=True)
     except Exception as e:
-        st.error(f"Error al generar el grafo: {e}")
\ No newline at end of file
+        st.error(f"Error al generar el grafo: {e}")
+
+# --- Demanda de Formación (Brechas de toda la organización) ---
+with st.expander("Demanda de Formación (L&D)"):
+    st.caption("Brechas (< 7) de todos los empleados internos contra todos los roles futuros, calculadas de una vez y cacheadas por versión del dataset.")
+    with etapa('app.brechas', filas=len(talent_df)):
+        brechas = dataset.brechas()
+        internos_brechas = tipos_talento(talent_df) == 'Interno'
+        bloqueos_df = brechas.bloqueos_por_skill(internos_brechas)
+        chapters_brechas_df = brechas.puntos_por_chapter(internos_brechas)
+        rutas_df = brechas.ruta_mas_barata(internos_brechas)
+    st.subheader("Skills que Bloquean más Pares (Candidato, Rol)")
+    st.dataframe(bloqueos_df.head(20), hide_index=True)
+    st.subheader("Niveles a Cerrar por Chapter")
+    st.dataframe(chapters_brechas_df)
+    st.subheader("Ruta de Formación más Barata por Rol")
+    st.dataframe(rutas_df, hide_index=True)
+
+# --- Panel de Depuración (Rendimiento por Etapa) ---
+if profiler is not None:
+    profiler.detener()
+with st.sidebar.expander("Debug: Rendimiento"):
+    ejecucion = instrumentacion.ejecucion_actual()
+    etapas_df = pd.DataFrame([
+        {'Etapa': nombre, 'Tiempo (ms)': round(m['segundos'] * 1000, 1), 'Llamadas': m['llamadas'],
+         'Filas': m['filas'], 'Pico Memoria (MB)': round(m['pico_bytes'] / 2**20, 2)}
+        for nombre, m in ejecucion['etapas'].items()
+    ])
+    st.dataframe(etapas_df, hide_index=True)
+    if dataset.cache_scores is not None:
+        stats_cache = dataset.cache_scores.estadisticas()
+        st.caption(f"Caché de scores: {stats_cache['aciertos']} aciertos · {stats_cache['fallos']} fallos · {stats_cache['memoria_mb']} MB")
+    st.checkbox("Perfilar la próxima ejecución (muestreo)", key="debug_perfilar")
+    if profiler is not None:
+        st.write("Funciones más calientes (tiempo propio):")
+        st.dataframe(pd.DataFrame(profiler.funciones_calientes(15), columns=['Función', 'Muestras', 'Fracción']), hide_index=True)
+    st.download_button("Exportar JSON", instrumentacion.a_json(ejecucion), file_name="rendimiento.json", mime="application/json")
+    st.download_button("Exportar Prometheus", instrumentacion.a_prometheus(), file_name="metrics.prom", mime="text/plain")
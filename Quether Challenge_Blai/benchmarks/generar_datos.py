@@ -0,0 +1,189 @@
+"""
+Generador de organizaciones sintéticas para pruebas de escala.
+Produce org_config.json, vision_futura.json, talento_actual.csv y
+candidatos_externos.csv con el mismo formato que data/.
+
+Uso (desde la carpeta de la app):
+    python -m benchmarks.generar_datos --candidatos 100000 --salida /tmp/org_100k
+"""
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from modules.data_loader import COLUMNAS_TALENTO
+
+NIVELES = ['Junior', 'Mid', 'Senior', 'Lead']
+MODALIDADES = ['FT', 'PT', 'Fractional']
+INICIOS = ['0-3m', '0-6m', '3-6m', '6-12m', '12-18m', '12-24m']
+RIESGOS = ['Baja', 'Media', 'Alta']
+RATINGS = ['A', 'B', 'C']
+
+# Vocabulario para componer responsabilidades verosímiles
+VERBOS = ['Definir', 'Coordinar', 'Optimizar', 'Diseñar', 'Automatizar', 'Analizar', 'Gestionar',
+          'Implantar', 'Medir', 'Documentar', 'Priorizar', 'Escalar']
+OBJETOS = ['OKRs', 'roadmap', 'campañas', 'pipelines', 'dashboards', 'workflows', 'sprints',
+           'presupuesto', 'propuesta de valor', 'integraciones', 'contenidos', 'métricas',
+           'experimentos', 'stakeholders', 'entregables', 'procesos', 'riesgos', 'partners']
+CONTEXTOS = ['de cliente', 'del capítulo', 'de negocio', 'de datos', 'de marca', 'de producto',
+             'internos', 'ejecutivos', 'de crecimiento', 'de CRM']
+
+def _responsabilidad(rng):
+    return f"{rng.choice(VERBOS)} {rng.choice(OBJETOS)} {rng.choice(CONTEXTOS)}"
+
+def generar_organizacion(n_skills=200, n_roles=100, n_chapters=12, n_proyectos=50, semilla=42):
+    """
+    Genera (config, vision) con n_skills skills repartidas por chapter y
+    n_roles roles (todos ellos necesarios en la visión futura).
+    """
+    rng = np.random.default_rng(semilla)
+    chapters = [f"Chapter {c:02d}" for c in range(n_chapters)]
+    skills = [
+        {'id': f"S-{k:04d}", 'nombre': f"Skill {k:04d}", 'categoria': chapters[k % n_chapters], 'peso': int(rng.integers(1, 6))}
+        for k in range(n_skills)
+    ]
+    skills_por_chapter = {c: [s['id'] for s in skills if s['categoria'] == c] for c in chapters}
+
+    roles, roles_necesarios = [], []
+    for r in range(n_roles):
+        chapter = chapters[r % n_chapters]
+        propias = skills_por_chapter[chapter]
+        n_req = int(rng.integers(3, 6))
+        requeridas = list(rng.choice(propias, size=min(n_req, len(propias)), replace=False))
+        nivel = NIVELES[int(rng.integers(0, len(NIVELES)))]
+        modalidad = MODALIDADES[int(rng.choice(3, p=[0.6, 0.3, 0.1]))]
+        roles.append({
+            'id': f"R-{r:04d}",
+            'título': f"Rol {r:04d} ({chapter})",
+            'nivel': nivel,
+            'responsabilidades': [_responsabilidad(rng) for _ in range(3)],
+            'habilidades_requeridas': requeridas,
+            'dedicación_esperada': "30-40h/semana",
+        })
+        roles_necesarios.append({
+            'id': f"R-{r:04d}",
+            'título': f"Rol {r:04d} ({chapter})",
+            'nivel': nivel,
+            'capítulo': chapter,
+            'modalidad': modalidad,
+            'cantidad': 0.5 if modalidad == 'Fractional' else int(rng.integers(1, 4)),
+            'inicio_estimado': INICIOS[int(rng.integers(0, len(INICIOS)))],
+            'objetivos_asociados': [_responsabilidad(rng) for _ in range(2)],
+        })
+
+    config = {
+        'organization': {'nombre': "Organización Sintética", 'direccion': "N/A", 'descripcion': "Datos generados para benchmarks."},
+        'chapters': [
+            {'nombre': c, 'descripción': f"Chapter sintético {c}.", 'role_templates': [r['id'] for r in roles[i::n_chapters]]}
+            for i, c in enumerate(chapters)
+        ],
+        'roles': roles,
+        'skills': skills,
+    }
+    vision = {
+        'organization': config['organization'],
+        'timeline': {
+            f"{meses}_meses": {'hitos': [f"Hito sintético a {meses} meses."], 'kpis_objetivo': {}, 'riesgos_clave': []}
+            for meses in (12, 18, 24)
+        },
+        'roles_necesarios': roles_necesarios,
+        'proyectos': [f"Proyecto {p:03d}" for p in range(n_proyectos)],
+    }
+    return config, vision
+
+def generar_talento(n, config, vision, tipo='Interno', id_inicial=1001, semilla=0):
+    """
+    Genera un DataFrame de n personas con las columnas literales en JSON
+    (igual que talento_actual.csv).
+    """
+    rng = np.random.default_rng(semilla)
+    chapters = [c['nombre'] for c in config['chapters']]
+    skills_por_chapter = {c: [s['id'] for s in config['skills'] if s['categoria'] == c] for c in chapters}
+    todas_skills = [s['id'] for s in config['skills']]
+    proyectos = vision.get('proyectos', ['Proyecto 000'])
+    externo = tipo == 'Externo'
+
+    chapter_idx = rng.integers(0, len(chapters), size=n)
+    n_skills = rng.integers(3, 9, size=n)
+    filas = []
+    for i in range(n):
+        chapter = chapters[chapter_idx[i]]
+        propias = skills_por_chapter[chapter] or todas_skills
+        # ~80% skills de su chapter, el resto de cualquier otro
+        n_propias = min(len(propias), int(np.ceil(n_skills[i] * 0.8)))
+        elegidas = set(rng.choice(propias, size=n_propias, replace=False))
+        elegidas.update(rng.choice(todas_skills, size=n_skills[i] - n_propias))
+        niveles = np.clip(np.rint(rng.normal(6, 2, size=len(elegidas))), 1, 10).astype(int)
+        habilidades = dict(zip(elegidas, niveles.tolist()))
+
+        if externo:
+            dedicacion = {}
+        else:
+            n_proy = int(rng.integers(1, 5))
+            cargas = rng.dirichlet(np.ones(n_proy)) * rng.uniform(60, 110)
+            dedicacion = dict(zip(rng.choice(proyectos, size=n_proy, replace=False).tolist(), np.rint(cargas).astype(int).tolist()))
+
+        metadata = {'tipo': tipo} if externo else {
+            'performance_rating': RATINGS[int(rng.integers(0, 3))],
+            'retention_risk': RIESGOS[int(rng.choice(3, p=[0.6, 0.3, 0.1]))],
+            'trayectoria': "Sintética",
+        }
+        filas.append({
+            'id_empleado': id_inicial + i,
+            'nombre': f"{'Candidato' if externo else 'Empleado'} {id_inicial + i}",
+            'email': f"persona{id_inicial + i}@ejemplo.com",
+            'chapter': 'Externo' if externo else chapter,
+            'rol_actual': 'Candidato Externo' if externo else f"{NIVELES[int(rng.integers(0, 4))]} {chapter}",
+            'manager': 'N/A',
+            'antigüedad': '0m' if externo else f"{int(rng.integers(1, 120))}m",
+            'habilidades': json.dumps(habilidades, ensure_ascii=False),
+            'responsabilidades_actuales': json.dumps([_responsabilidad(rng) for _ in range(int(rng.integers(0 if externo else 1, 4)))], ensure_ascii=False),
+            'dedicación_actual': json.dumps(dedicacion, ensure_ascii=False),
+            'ambiciones': json.dumps({'nivel_aspiración': NIVELES[int(rng.integers(0, 4))].lower()}, ensure_ascii=False),
+            'metadata': json.dumps(metadata, ensure_ascii=False),
+        })
+    return pd.DataFrame(filas, columns=COLUMNAS_TALENTO)
+
+def escribir_dataset(salida, n_candidatos, fraccion_externos=0.3, n_skills=200, n_roles=100,
+                     n_chapters=12, n_proyectos=50, semilla=42, tamano_bloque=100_000):
+    """
+    Escribe un dataset completo en la carpeta 'salida'. Los CSVs se escriben
+    por bloques para no tener el millón de filas en memoria a la vez.
+    """
+    os.makedirs(salida, exist_ok=True)
+    config, vision = generar_organizacion(n_skills, n_roles, n_chapters, n_proyectos, semilla)
+    for nombre, datos in (('org_config.json', config), ('vision_futura.json', vision)):
+        with open(os.path.join(salida, nombre), 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False, indent=2)
+
+    n_externos = int(n_candidatos * fraccion_externos)
+    siguiente_id = 1001
+    for nombre, tipo, n in (('talento_actual.csv', 'Interno', n_candidatos - n_externos),
+                            ('candidatos_externos.csv', 'Externo', n_externos)):
+        ruta = os.path.join(salida, nombre)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        for bloque, inicio in enumerate(range(0, max(n, 1), tamano_bloque)):
+            tamano = min(tamano_bloque, n - inicio)
+            df = generar_talento(max(tamano, 0), config, vision, tipo, siguiente_id, semilla + bloque + (1000 if tipo == 'Externo' else 0))
+            df.to_csv(ruta, mode='a', header=(bloque == 0), index=False)
+            siguiente_id += max(tamano, 0)
+    return salida
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una organización sintética.")
+    parser.add_argument('--candidatos', type=int, default=1000)
+    parser.add_argument('--externos', type=float, default=0.3, help="Fracción de candidatos externos")
+    parser.add_argument('--skills', type=int, default=200)
+    parser.add_argument('--roles', type=int, default=100)
+    parser.add_argument('--chapters', type=int, default=12)
+    parser.add_argument('--proyectos', type=int, default=50)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', required=True)
+    args = parser.parse_args()
+    escribir_dataset(args.salida, args.candidatos, args.externos, args.skills, args.roles,
+                     args.chapters, args.proyectos, args.semilla)
+    print(f"Dataset generado en {args.salida}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Suite de benchmarks de escala: mide tiempo y pico de memoria de cada etapa
+(carga, parseo, matriz de scores, ranking, KPIs, capacidad y grafo) sobre datasets
+sintéticos de distintos tamaños, guarda los resultados en JSON y marca las
+regresiones frente a un baseline guardado.
+
+Uso (desde la carpeta de la app):
+    python -m benchmarks.run_benchmarks --tamanos 1000,10000 --salida resultados.json
+    python -m benchmarks.run_benchmarks --tamanos 1000 --guardar-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from benchmarks.generar_datos import escribir_dataset
+from modules.capacity import PlanCapacidad
+from modules.chapter_analytics import AnaliticaChapters
+from modules.compatibility import CacheScores, calcular_matriz_compatibilidad, construir_indice_responsabilidades
+from modules.data_loader import load_all_data, parsear_talento_columnar
+from modules.kpis import get_strategic_kpis
+from modules.parallel import puntuar_en_paralelo
+from modules.ranking import pagina_ranking
+from modules.graph import generar_html_grafo
+from modules.similarity import BACKENDS, construir_indice_vectorial
+from modules.skill_gaps import MatrizBrechas
+
+BASELINE_POR_DEFECTO = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Una etapa solo cuenta como regresión si empeora más de la tolerancia
+# relativa y, además, más de este mínimo absoluto (ruido de medida)
+MINIMO_ABSOLUTO_S = 0.05
+
+def medir(resultados, etapa, funcion, filas, memoria=False):
+    """
+    Ejecuta funcion() y guarda su tiempo (y pico de memoria si se pide).
+    """
+    inicio = time.perf_counter()
+    valor = funcion()
+    resultados[etapa] = {'segundos': round(time.perf_counter() - inicio, 4), 'filas': int(filas)}
+    if memoria:
+        # Segunda ejecución bajo tracemalloc: no contamina la medida de tiempo
+        tracemalloc.start()
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        resultados[etapa]['pico_mb'] = round(pico / 2**20, 2)
+    return valor
+
+def ejecutar_tamano(data_dir, memoria=False, k=20, max_filas_grafo=1000, workers=None):
+    """
+    Ejecuta todas las etapas sobre el dataset de data_dir.
+    """
+    r = {}
+    shutil.rmtree(os.path.join(data_dir, '.cache'), ignore_errors=True)
+    # La carga en frío solo se mide una vez: bajo tracemalloc la caché ya estaría caliente
+    config, vision, talent_df = medir(r, 'carga_fria', lambda: load_all_data(data_dir), 0)
+    n = len(talent_df)
+    r['carga_fria']['filas'] = n
+    medir(r, 'carga_caliente', lambda: load_all_data(data_dir), n, memoria)
+    medir(r, 'carga_compacta', lambda: load_all_data(data_dir, compacto=True), n, memoria)
+
+    csv_interno = os.path.join(data_dir, 'talento_actual.csv')
+    crudo = pd.read_csv(csv_interno)
+    medir(r, 'parseo', lambda: parsear_talento_columnar(crudo), len(crudo), memoria)
+
+    roles_futuros = vision['roles_necesarios']
+    roles_lookup = {rol['id']: rol for rol in config['roles']}
+    skills_lookup = {skill['id']: skill['nombre'] for skill in config['skills']}
+    indice = medir(r, 'indice_resp', lambda: construir_indice_responsabilidades(talent_df, roles_futuros, roles_lookup).ajustar(), n, memoria)
+    score_matrix = medir(r, 'matriz_scores', lambda: calcular_matriz_compatibilidad(talent_df, roles_futuros, roles_lookup, indice), n, memoria)
+    cache_scores = CacheScores()
+    medir(r, 'matriz_scores_cache_fria', lambda: calcular_matriz_compatibilidad(talent_df, roles_futuros, roles_lookup, indice, cache=cache_scores), n, memoria)
+    medir(r, 'matriz_scores_cache', lambda: calcular_matriz_compatibilidad(talent_df, roles_futuros, roles_lookup, indice, cache=cache_scores), n, memoria)
+
+    # Backends de similitud: en frío se calculan y guardan los vectores; en caliente se leen (memmap)
+    dir_vectores = os.path.join(data_dir, '.cache', 'vectores')
+    for backend in BACKENDS:
+        construir = lambda: construir_indice_vectorial(backend, talent_df, roles_futuros, roles_lookup, dir_vectores).scores()
+        medir(r, f'similitud_{backend}_fria', construir, n)
+        medir(r, f'similitud_{backend}', construir, n, memoria)
+
+    # Top-K de cada rol sobre su columna precalculada (lo mismo que GET /roles/{id}/top)
+    filas_ranking = np.arange(n)
+    medir(r, 'ranking_top_k', lambda: [pagina_ranking(score_matrix['total'][:, j], filas_ranking, tamano_pagina=k)
+                                       for j in range(len(roles_futuros))], n, memoria)
+    medir(r, 'ranking_completo', lambda: np.argsort(-score_matrix['total'], axis=0, kind='stable'), n, memoria)
+    if workers is not None:
+        talento = load_all_data(data_dir, compacto=True)[2]
+        medir(r, 'puntuacion_paralela', lambda: puntuar_en_paralelo(talento, roles_futuros, roles_lookup, k, workers, indice), n, memoria)
+
+    medir(r, 'kpis', lambda: get_strategic_kpis(talent_df, vision, roles_lookup, score_matrix), n, memoria)
+    brechas = medir(r, 'brechas', lambda: MatrizBrechas(talent_df, roles_futuros, roles_lookup, skills_lookup), n, memoria)
+    medir(r, 'brechas_agregados', lambda: (brechas.bloqueos_por_skill(), brechas.puntos_por_chapter(), brechas.ruta_mas_barata()), n, memoria)
+    analitica = medir(r, 'analitica_chapters', lambda: AnaliticaChapters(talent_df, skills_lookup), n, memoria)
+    medir(r, 'analitica_consultas', lambda: [(analitica.promedio_habilidades(c), analitica.distribucion_niveles(c))
+                                              for c in [None, *analitica.chapters]], n, memoria)
+    capacidad = medir(r, 'capacidad', lambda: PlanCapacidad(talent_df, vision, inicio='rampa'), n, memoria)
+    proyecto = capacidad.proyectos[0] if capacidad.proyectos else None
+    if proyecto is not None:
+        medir(r, 'capacidad_cambio', lambda: capacidad.copia().cambiar_carga_proyecto(proyecto, 0.5, 6).primer_mes_exceso(), n, memoria)
+
+    display_df = talent_df.head(max_filas_grafo)
+    # Mismo builder que el "Grafo Interactivo" del dashboard, sin caché de HTML
+    medir(r, 'grafo', lambda: generar_html_grafo(display_df, skills_lookup), len(display_df), memoria)
+    medir(r, 'grafo_agrupado', lambda: generar_html_grafo(talent_df, skills_lookup, agrupar_por='chapter', top_n=20), n, memoria)
+    return r
+
+def comparar_con_baseline(resultados, baseline, tolerancia):
+    """
+    Devuelve la lista de regresiones (etapas más lentas que el baseline).
+    """
+    regresiones = []
+    for tamano, etapas in resultados['tamanos'].items():
+        for etapa, medida in etapas.items():
+            base = baseline.get('tamanos', {}).get(tamano, {}).get(etapa)
+            if not base:
+                continue
+            antes, ahora = base['segundos'], medida['segundos']
+            if ahora > antes * (1 + tolerancia) and ahora - antes > MINIMO_ABSOLUTO_S:
+                regresiones.append({'tamano': tamano, 'etapa': etapa, 'baseline_s': antes, 'actual_s': ahora,
+                                    'ratio': round(ahora / antes, 2) if antes else None})
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de escala del Talent Gap Analyzer.")
+    parser.add_argument('--tamanos', default='1000,10000', help="Nº de candidatos por dataset, separados por comas")
+    parser.add_argument('--skills', type=int, default=200)
+    parser.add_argument('--roles', type=int, default=100)
+    parser.add_argument('--memoria', action='store_true', help="Medir también el pico de memoria (tracemalloc)")
+    parser.add_argument('--max-filas-grafo', type=int, default=1000)
+    parser.add_argument('--workers', type=int, help="Mide también el scoring paralelo por shards con este nº de procesos")
+    parser.add_argument('--datos', help="Carpeta donde generar/reutilizar los datasets (por defecto, temporal)")
+    parser.add_argument('--salida', help="Fichero JSON de resultados (por defecto, stdout)")
+    parser.add_argument('--baseline', default=BASELINE_POR_DEFECTO)
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Empeoramiento relativo permitido")
+    parser.add_argument('--guardar-baseline', action='store_true')
+    args = parser.parse_args()
+
+    base_datos = args.datos or tempfile.mkdtemp(prefix='talent_bench_')
+    resultados = {
+        'entorno': {'python': sys.version.split()[0], 'plataforma': platform.platform(),
+                    'numpy': np.__version__, 'pandas': pd.__version__, 'fecha': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'parametros': {'skills': args.skills, 'roles': args.roles, 'max_filas_grafo': args.max_filas_grafo},
+        'tamanos': {},
+    }
+    try:
+        for tamano in [int(t) for t in args.tamanos.split(',')]:
+            data_dir = os.path.join(base_datos, f"org_{tamano}")
+            if not os.path.exists(os.path.join(data_dir, 'talento_actual.csv')):
+                escribir_dataset(data_dir, tamano, n_skills=args.skills, n_roles=args.roles)
+            print(f"Ejecutando benchmarks con {tamano} candidatos...", file=sys.stderr)
+            resultados['tamanos'][str(tamano)] = ejecutar_tamano(data_dir, args.memoria, max_filas_grafo=args.max_filas_grafo, workers=args.workers)
+    finally:
+        if not args.datos:
+            shutil.rmtree(base_datos, ignore_errors=True)
+
+    regresiones = []
+    if os.path.exists(args.baseline) and not args.guardar_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regresiones = comparar_con_baseline(resultados, json.load(f), args.tolerancia)
+    resultados['regresiones'] = regresiones
+
+    texto = json.dumps(resultados, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    else:
+        print(texto)
+    if args.guardar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            f.write(texto)
+        print(f"Baseline guardado en {args.baseline}", file=sys.stderr)
+
+    for reg in regresiones:
+        print(f"REGRESIÓN [{reg['tamano']}] {reg['etapa']}: {reg['baseline_s']}s -> {reg['actual_s']}s", file=sys.stderr)
+    sys.exit(1 if regresiones else 0)
+
+if __name__ == '__main__':
+    main()
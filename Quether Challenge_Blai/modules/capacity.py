@@ -0,0 +1,231 @@
+import re
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from modules.compatibility import DEDICACION_POR_MODALIDAD, _csr_desde_celdas
+from modules.instrumentation import instrumentar
+from modules.kpis import UMBRAL_SOBRE_ASIGNACION
+from modules.talent_store import TalentoCompacto, tipos_talento
+
+# --- Planificación de Capacidad por Meses ---
+# Tensor mes x empleado x proyecto de dedicación (%), en forma factorizada:
+# asignacion[e, p] (dedicación actual, dispersa) por curva[m, p] (factor de
+# carga del proyecto en cada mes, 1 = como hoy). Sobre él se superpone la
+# demanda de los roles futuros desde su ventana de inicio ('inicio_estimado')
+# y se compara la carga de cada chapter con su capacidad. Los agregados por
+# chapter se guardan como chapter x proyecto, así que cambiar la carga de un
+# proyecto solo actualiza su columna.
+
+HORIZONTE_MESES = 24
+INICIOS_ROL = ['temprano', 'rampa', 'tardio']
+
+def ventana_inicio(inicio_estimado):
+    """
+    (mes desde, mes hasta) de un 'inicio_estimado' como '0-3m' o '6m'.
+    Sin dato, el rol empieza en el mes 0.
+    """
+    numeros = [int(n) for n in re.findall(r'\d+', str(inicio_estimado or ''))]
+    if not numeros:
+        return 0, 0
+    return numeros[0], numeros[-1]
+
+def meses_timeline(vision):
+    """
+    {mes: hitos} de los hitos del 'timeline' (claves como '12_meses').
+    """
+    hitos = {}
+    for clave, datos in vision.get('timeline', {}).items():
+        numeros = re.findall(r'\d+', clave)
+        if numeros:
+            hitos[int(numeros[0])] = (datos or {}).get('hitos', [])
+    return dict(sorted(hitos.items()))
+
+class PlanCapacidad:
+    """
+    Carga mensual de cada persona y de cada chapter desde el mes 0 (hoy)
+    hasta el mes 'horizonte' (por defecto, el último hito del timeline o
+    el final de la última ventana de rol, y al menos HORIZONTE_MESES).
+    - capacidad_maxima: % de dedicación de cada persona.
+    - solo_internos: los externos no cuentan para la capacidad ni la carga.
+    - inicio: cuándo empieza a pesar un rol dentro de su ventana
+      ('temprano' = al abrirse, 'tardio' = al cerrarse, 'rampa' = lineal).
+    - plan: asignaciones (fila, columna de rol, score) de resolver_plan_staffing;
+      la demanda de esos roles se suma también a la persona asignada.
+    """
+
+    @instrumentar('capacidad.construir', filas=lambda self, talent_df, *args, **kwargs: len(talent_df))
+    def __init__(self, talent_df, vision, horizonte=None, capacidad_maxima=100, solo_internos=True,
+                 inicio='temprano', plan=None):
+        if inicio not in INICIOS_ROL:
+            raise ValueError(f"Inicio de rol desconocido: {inicio} (opciones: {', '.join(INICIOS_ROL)})")
+        self.talent_df = talent_df
+        self.roles_futuros = vision['roles_necesarios']
+        self.hitos = meses_timeline(vision)
+        ventanas = [ventana_inicio(rol.get('inicio_estimado')) for rol in self.roles_futuros]
+        self.horizonte = horizonte or max([HORIZONTE_MESES, *self.hitos, *(hasta for _, hasta in ventanas)])
+        self.meses = np.arange(self.horizonte + 1)
+        self.capacidad_maxima = capacidad_maxima
+
+        # Asignación actual empleado x proyecto (CSR)
+        if isinstance(talent_df, TalentoCompacto):
+            indptr, claves, valores, self.proyectos = talent_df.mapa('dedicación_actual')
+        else:
+            indptr, claves, valores, self.proyectos = _csr_desde_celdas(talent_df['dedicación_actual'], True)
+        n = len(talent_df)
+        self.proyectos = list(self.proyectos)
+        self.incluidos = tipos_talento(talent_df) == 'Interno' if solo_internos else np.ones(n, dtype=bool)
+        asignacion = sp.csr_matrix((valores, claves, indptr), shape=(n, len(self.proyectos)))
+        self.asignacion = sp.diags(self.incluidos.astype(float)) @ asignacion
+        self._columnas = self.asignacion.tocsc()
+        self.curva = np.ones((len(self.meses), len(self.proyectos)))
+
+        # Chapters: pertenencia chapter x empleado y carga chapter x proyecto
+        chapters = pd.Series(np.asarray(talent_df['chapter'].take(np.arange(n)), dtype=object)).fillna('Sin chapter')
+        codigos, nombres = pd.factorize(chapters)
+        roles_chapter = [rol.get('capítulo') or 'Sin chapter' for rol in self.roles_futuros]
+        self.chapters = list(nombres) + sorted(set(roles_chapter) - set(nombres))
+        indice_chapter = {c: k for k, c in enumerate(self.chapters)}
+        self.chapter_fila = codigos
+        pertenencia = sp.csr_matrix((self.incluidos.astype(float), (codigos, np.arange(n))), shape=(len(self.chapters), n))
+        self.personas = np.asarray(pertenencia.sum(axis=1)).ravel().astype(int)
+        self.capacidad = self.personas * float(capacidad_maxima)
+        self._carga_chapter_proyecto = (pertenencia @ self.asignacion).toarray()
+
+        # Demanda de los roles futuros: mes x rol (% de dedicación)
+        meses = self.meses[:, None]
+        desde = np.array([d for d, _ in ventanas], dtype=float)
+        hasta = np.array([h for _, h in ventanas], dtype=float)
+        if inicio == 'temprano':
+            activo = (meses >= desde).astype(float)
+        elif inicio == 'tardio':
+            activo = (meses >= hasta).astype(float)
+        else:
+            activo = np.clip((meses - desde + 1) / (hasta - desde + 1), 0.0, 1.0)
+        dedicacion = np.array([DEDICACION_POR_MODALIDAD.get(rol.get('modalidad', 'FT'), 100) * rol.get('cantidad', 1)
+                               for rol in self.roles_futuros], dtype=float)
+        self.demanda_roles = activo * dedicacion
+        self._rol_chapter = np.array([indice_chapter[c] for c in roles_chapter], dtype=np.intp)
+        self.plan = list(plan or [])
+
+        self._carga_chapters = self.curva @ self._carga_chapter_proyecto.T
+        self._carga_empleados = None
+
+    def copia(self, plan=None):
+        """
+        Copia independiente para simular cambios (comparte las matrices que no
+        cambian). Con 'plan' se sustituyen las asignaciones de roles.
+        """
+        otra = object.__new__(PlanCapacidad)
+        otra.__dict__.update(self.__dict__)
+        otra.curva = self.curva.copy()
+        otra._carga_chapters = self._carga_chapters.copy()
+        if plan is not None:
+            otra.plan, otra._carga_empleados = list(plan), None
+        elif self._carga_empleados is not None:
+            otra._carga_empleados = self._carga_empleados.copy()
+        return otra
+
+    def cambiar_carga_proyecto(self, proyecto, factor, desde_mes=0, hasta_mes=None):
+        """
+        Fija la carga de 'proyecto' en factor x la actual entre desde_mes y
+        hasta_mes (excluido; por defecto, hasta el final del horizonte).
+        factor=0 equivale a que el proyecto termine. Solo se recalcula la
+        columna del proyecto en los agregados.
+        """
+        p = self.proyectos.index(proyecto)
+        nueva = self.curva[:, p].copy()
+        nueva[desde_mes:hasta_mes] = factor
+        delta = nueva - self.curva[:, p]
+        cambian = np.flatnonzero(delta)
+        if not len(cambian):
+            return self
+        self.curva[:, p] = nueva
+        self._carga_chapters[cambian] += np.outer(delta[cambian], self._carga_chapter_proyecto[:, p])
+        if self._carga_empleados is not None:
+            inicio, fin = self._columnas.indptr[p], self._columnas.indptr[p + 1]
+            filas = self._columnas.indices[inicio:fin]
+            self._carga_empleados[filas[:, None], cambian] += np.outer(self._columnas.data[inicio:fin], delta[cambian])
+        return self
+
+    def carga_empleados(self):
+        """
+        Dedicación (%) de cada persona en cada mes (personas x meses),
+        incluida la demanda de los roles que tenga asignados en el plan.
+        """
+        if self._carga_empleados is None:
+            carga = np.asarray(self.asignacion @ self.curva.T)
+            for fila, j, _ in self.plan:
+                carga[fila] += self.demanda_roles[:, j]
+            self._carga_empleados = carga
+        return self._carga_empleados
+
+    def tensor(self, filas, meses=None):
+        """
+        Tramo denso del tensor mes x empleado x proyecto para 'filas' (y
+        'meses', por defecto todos). Solo proyectos actuales, sin roles.
+        """
+        meses = self.meses if meses is None else np.asarray(meses)
+        asignacion = self.asignacion[filas].toarray()
+        return self.curva[meses][:, None, :] * asignacion[None, :, :]
+
+    def carga_chapters(self, con_roles=True):
+        """
+        Carga (%) de cada chapter por mes: DataFrame meses x chapters.
+        """
+        carga = self._carga_chapters.copy()
+        if con_roles:
+            np.add.at(carga.T, self._rol_chapter, self.demanda_roles.T)
+        return pd.DataFrame(carga, index=pd.Index(self.meses, name='mes'), columns=self.chapters)
+
+    def utilizacion_chapters(self):
+        """
+        Carga / capacidad (%) de cada chapter por mes (inf si no tiene personas y hay demanda).
+        """
+        carga = self.carga_chapters().to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            utilizacion = np.where(self.capacidad > 0, 100 * carga / self.capacidad, np.where(carga > 0, np.inf, 0.0))
+        return pd.DataFrame(utilizacion, index=pd.Index(self.meses, name='mes'), columns=self.chapters)
+
+    def primer_mes_exceso(self):
+        """
+        Por chapter: personas, capacidad, carga actual y de roles, primer mes
+        en que la carga supera la capacidad (None si no llega a pasar) y pico.
+        """
+        carga = self.carga_chapters()
+        exceso = carga.to_numpy() > self.capacidad[None, :]
+        primero = np.where(exceso.any(axis=0), exceso.argmax(axis=0), -1)
+        demanda = np.bincount(self._rol_chapter, weights=self.demanda_roles[-1], minlength=len(self.chapters))
+        df = pd.DataFrame({
+            'Chapter': self.chapters,
+            'Personas': self.personas,
+            'Capacidad (%)': self.capacidad,
+            'Carga Actual (%)': self._carga_chapters[0],
+            'Demanda Roles (%)': demanda,
+            'Primer Mes en Exceso': pd.array(np.where(primero >= 0, primero, None), dtype='Int64'),
+            'Pico (%)': carga.max(axis=0).to_numpy(),
+        })
+        # Fuera los chapters sin personas incluidas ni demanda (p.ej. 'Externo' con solo_internos)
+        df = df[(self.personas > 0) | (carga.to_numpy().max(axis=0) > 0)]
+        return df.sort_values(['Primer Mes en Exceso', 'Chapter'], na_position='last', kind='stable').reset_index(drop=True)
+
+    def sobre_asignados(self, umbral=UMBRAL_SOBRE_ASIGNACION):
+        """
+        Personas que superan 'umbral' (%) en algún mes, con el primer mes y su pico.
+        """
+        carga = self.carga_empleados()
+        exceso = carga > umbral
+        filas = np.flatnonzero(exceso.any(axis=1) & self.incluidos)
+        return pd.DataFrame({
+            'id_empleado': np.asarray(self.talent_df['id_empleado'].take(filas)),
+            'nombre': np.asarray(self.talent_df['nombre'].take(filas), dtype=object),
+            'chapter': [self.chapters[c] for c in self.chapter_fila[filas]],
+            'Primer Mes': exceso[filas].argmax(axis=1),
+            'Pico (%)': carga[filas].max(axis=1),
+        })
+
+    def sobre_asignados_por_mes(self, umbral=UMBRAL_SOBRE_ASIGNACION):
+        """
+        Nº de personas por encima de 'umbral' (%) en cada mes.
+        """
+        return pd.Series((self.carga_empleados()[self.incluidos] > umbral).sum(axis=0),
+                         index=pd.Index(self.meses, name='mes'), name='Sobre-asignados')
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from modules.compatibility import _csr_desde_celdas
+from modules.instrumentation import instrumentar
+from modules.talent_store import TalentoCompacto, tipos_talento
+
+# --- Analítica de Habilidades por Chapter ---
+# Tabla larga (persona, chapter, skill, nivel) en Arrow, construida desde los
+# arrays CSR de 'habilidades' sin recorrer filas. Sobre ella, un plan lazy de
+# Polars calcula de una vez sumas, recuentos e histogramas de nivel por
+# chapter x skill (tablas pequeñas); cambiar de chapter solo filtra esos
+# agregados, y cada vista queda cacheada. Polars se importa al construir.
+
+NIVEL_MAXIMO = 10
+
+def _diccionario(codigos, valores):
+    return pa.DictionaryArray.from_arrays(np.asarray(codigos, dtype=np.int32), pa.array([str(v) for v in valores], type=pa.string()))
+
+class AnaliticaChapters:
+    """
+    Medias, distribución de niveles y plantilla por chapter y skill.
+    - solo_internos: los externos no cuentan (como en la vista de RRHH).
+    - tabla: la tabla larga (pyarrow.Table), para informes por lotes.
+    chapter=None en los métodos significa toda la organización ('Todos').
+    Se reconstruye entera cuando cambia la versión del dataset.
+    """
+
+    @instrumentar('analitica.construir', filas=lambda self, talent_df, *args, **kwargs: len(talent_df))
+    def __init__(self, talent_df, skills_lookup, solo_internos=True):
+        import polars as pl
+
+        self.skills_lookup = skills_lookup
+        n = len(talent_df)
+        if isinstance(talent_df, TalentoCompacto):
+            indptr, claves, valores, skill_ids = talent_df.mapa('habilidades')
+        else:
+            indptr, claves, valores, skill_ids = _csr_desde_celdas(talent_df['habilidades'], True)
+        incluidos = tipos_talento(talent_df) == 'Interno' if solo_internos else np.ones(n, dtype=bool)
+
+        if isinstance(talent_df, TalentoCompacto):
+            codigos, valores_chapter = talent_df.codigos('chapter')
+            chapters = np.array(list(valores_chapter) + [None], dtype=object)[codigos]
+        else:
+            chapters = np.asarray(talent_df['chapter'], dtype=object)
+        codigos_chapter, nombres = pd.factorize(pd.Series(chapters, dtype=object).fillna('Sin chapter'))
+        self.chapters = [str(c) for c in nombres]
+
+        # Tabla larga: una fila por (persona incluida, skill)
+        filas = np.repeat(np.arange(n), np.diff(indptr))
+        mantener = incluidos[filas]
+        filas = filas[mantener]
+        self.tabla = pa.table({
+            'fila': filas.astype(np.int32),
+            'id_empleado': np.asarray(talent_df['id_empleado'].take(filas)).astype(np.int64),
+            'chapter': _diccionario(codigos_chapter[filas], self.chapters),
+            'skill_id': _diccionario(np.asarray(claves)[mantener], skill_ids),
+            'nivel': np.asarray(valores, dtype=float)[mantener],
+        })
+
+        # Agregados chapter x skill (y x nivel), en un solo plan lazy
+        larga = pl.from_arrow(self.tabla).lazy().with_columns(
+            pl.col('chapter').cast(pl.String), pl.col('skill_id').cast(pl.String),
+            pl.col('nivel').round(0).clip(0, NIVEL_MAXIMO).cast(pl.Int8).alias('nivel_entero'),
+        )
+        agregados, histograma = pl.collect_all([
+            larga.group_by(['chapter', 'skill_id']).agg(pl.col('nivel').sum().alias('suma'), pl.len().alias('personas')),
+            larga.group_by(['chapter', 'skill_id', 'nivel_entero']).agg(pl.len().alias('personas')),
+        ])
+        self.agregados = agregados.sort(['chapter', 'skill_id'])
+        self.histograma = histograma.sort(['chapter', 'skill_id', 'nivel_entero'])
+        # Plantilla: también cuentan las personas sin ninguna skill
+        self.personas = (pl.from_arrow(pa.table({'chapter': _diccionario(codigos_chapter[incluidos], self.chapters)}))
+                         .lazy().group_by(pl.col('chapter').cast(pl.String)).agg(pl.len().alias('personas')).collect())
+        self._vistas = {}
+
+    def _cacheado(self, nombre, chapter, calcular):
+        clave = (nombre, chapter)
+        if clave not in self._vistas:
+            self._vistas[clave] = calcular()
+        return self._vistas[clave]
+
+    def _del_chapter(self, tabla, chapter, claves, sumas):
+        """
+        Filas de 'tabla' del chapter (un chapter sin personas da una tabla
+        vacía) o, con chapter=None, las columnas 'sumas' sumadas por 'claves'.
+        """
+        import polars as pl
+
+        if chapter is None:
+            return tabla.group_by(claves).agg(pl.col(sumas).sum())
+        return tabla.filter(pl.col('chapter') == chapter)
+
+    def _nombre(self, skill_id):
+        return self.skills_lookup.get(skill_id, skill_id)
+
+    def promedio_habilidades(self, chapter=None):
+        """
+        Nivel medio de cada skill entre las personas del chapter que la
+        tienen, de menor a mayor. Columnas ['skill_id', 'skill_nombre', 'nivel', 'personas'].
+        """
+        def calcular():
+            datos = self._del_chapter(self.agregados, chapter, ['skill_id'], ['suma', 'personas']).to_pandas()
+            df = pd.DataFrame({
+                'skill_id': datos['skill_id'].astype(object),
+                'skill_nombre': datos['skill_id'].map(self._nombre).astype(object),
+                'nivel': datos['suma'] / datos['personas'],
+                'personas': datos['personas'].astype(int),
+            })
+            return df.sort_values(['nivel', 'skill_id'], kind='stable').reset_index(drop=True)
+        return self._cacheado('promedio', chapter, calcular)
+
+    def distribucion_niveles(self, chapter=None):
+        """
+        Nº de personas del chapter por skill (filas) y nivel 0-10 (columnas).
+        """
+        def calcular():
+            datos = self._del_chapter(self.histograma, chapter, ['skill_id', 'nivel_entero'], ['personas']).to_pandas()
+            if datos.empty:
+                return pd.DataFrame(columns=range(NIVEL_MAXIMO + 1), index=pd.Index([], name='skill_nombre'), dtype=int)
+            datos['skill_nombre'] = datos['skill_id'].map(self._nombre)
+            tabla = datos.pivot_table(index='skill_nombre', columns='nivel_entero', values='personas', aggfunc='sum', fill_value=0)
+            tabla = tabla.reindex(columns=range(NIVEL_MAXIMO + 1), fill_value=0).astype(int)
+            tabla.columns.name = None
+            return tabla.sort_index()
+        return self._cacheado('distribucion', chapter, calcular)
+
+    def plantilla(self):
+        """
+        Personas, skills distintas y nivel medio (de todas sus skills) por chapter.
+        """
+        def calcular():
+            import polars as pl
+
+            por_chapter = self.agregados.group_by('chapter').agg(
+                pl.len().alias('Skills Distintas'), (pl.col('suma').sum() / pl.col('personas').sum()).alias('Nivel Medio'))
+            datos = self.personas.join(por_chapter, on='chapter', how='left').to_pandas()
+            df = pd.DataFrame({
+                'Chapter': datos['chapter'].astype(object),
+                'Personas': datos['personas'].astype(int),
+                'Skills Distintas': datos['Skills Distintas'].fillna(0).astype(int),
+                'Nivel Medio': datos['Nivel Medio'].astype(float),
+            })
+            return df.sort_values(['Personas', 'Chapter'], ascending=[False, True], kind='stable').reset_index(drop=True)
+        return self._cacheado('plantilla', None, calcular)
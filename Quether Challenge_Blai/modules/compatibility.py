@@ -1,7 +1,12 @@
+import hashlib
+import json
+import os
+from collections import Counter, OrderedDict
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+import scipy.sparse as sp
+from modules.instrumentation import instrumentar
+from modules.talent_store import ArrayCreciente, TalentoCompacto
 
 # Creamos un "lookup" para las definiciones de roles (de org_config.json)
 # Lo haremos en la app principal y lo pasaremos a las funciones.
@@ -26,10 +31,12 @@ def score_skills(empleado_skills_dict, rol_skills_list):
     final_score = (score_total / len(rol_skills_list)) * 50
     return final_score
 
-def score_responsibilities(empleado_resp_list, rol_resp_list):
+def score_responsibilities(empleado_resp_list, rol_resp_list, backend=None):
     """
     Calcula el score de responsabilidades (Peso: 25%)
     Usa similitud de texto (Cosine Similarity) para comparar las listas.
+    Con 'backend' (ver similarity) la similitud sale de sus vectores en lugar
+    del TF-IDF de los dos documentos.
     """
     if not rol_resp_list:
         return 25.0 # Rol sin responsabilidades, 100% cubierto.
@@ -39,8 +46,14 @@ def score_responsibilities(empleado_resp_list, rol_resp_list):
     # Unimos las listas en "documentos" para comparar
     doc_empleado = " ".join(empleado_resp_list)
     doc_rol = " ".join(rol_resp_list)
+
+    if backend is not None:
+        from modules.similarity import similitud_densa
+        return similitud_densa(backend.vectorizar([doc_empleado, doc_rol]), [0], [1])[0, 0] * 25
     
-    # TF-IDF
+    # TF-IDF (scikit-learn se importa aquí: el scoring de skills no lo necesita)
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
     tfidf_vectorizer = TfidfVectorizer().fit_transform([doc_empleado, doc_rol])
     similarity = cosine_similarity(tfidf_vectorizer[0:1], tfidf_vectorizer[1:2])
     
@@ -86,9 +99,11 @@ def score_dedication(empleado_dedicacion_dict, rol_modalidad):
         # Proporcional
         return (total_dedicacion_empleado / dedicacion_requerida) * 10
 
-def calcular_compatibilidad_total(empleado_row, rol_futuro, roles_lookup):
+@instrumentar()
+def calcular_compatibilidad_total(empleado_row, rol_futuro, roles_lookup, backend_resp=None):
     """
     Función orquestadora que calcula el score final.
+    'backend_resp' es el backend de similitud de responsabilidades (opcional).
     """
     
     # 1. Encontrar la definición completa del rol futuro
@@ -114,11 +129,776 @@ def calcular_compatibilidad_total(empleado_row, rol_futuro, roles_lookup):
     
     # 3. Calcular scores parciales
     s_skills = score_skills(empleado_skills, rol_skills_req)
-    s_resp = score_responsibilities(empleado_resp, rol_resp_req)
+    s_resp = score_responsibilities(empleado_resp, rol_resp_req, backend_resp)
     s_amb = score_ambitions(empleado_amb, rol_nivel)
     s_ded = score_dedication(empleado_ded, rol_modalidad)
     
     # 4. Sumar
     total_score = s_skills + s_resp + s_amb + s_ded
     
-    return total_score
\ No newline at end of file
+    return total_score
+
+# --- Motor Vectorizado (Matriz Candidato x Rol) ---
+# Las funciones de arriba puntúan un empleado contra un rol. Las de abajo
+# calculan la matriz completa (todos los candidatos x todos los roles) con
+# NumPy, aplicando exactamente las mismas fórmulas.
+
+DEDICACION_POR_MODALIDAD = {'FT': 100, 'PT': 50, 'Fractional': 25}
+
+# Peso (puntos máximos) de cada componente, igual que en las funciones score_*
+PESOS_COMPONENTES = {'skills': 50, 'responsabilidades': 25, 'ambiciones': 15, 'dedicacion': 10}
+
+def _como_dict(valor):
+    return valor if isinstance(valor, dict) else {}
+
+def _como_lista(valor):
+    return valor if isinstance(valor, list) else []
+
+def construir_matriz_habilidades(talent_df, skill_ids=None):
+    """
+    Construye la matriz densa empleado x skill con los niveles (0 si no la tiene).
+    Devuelve (matriz, skill_index) donde skill_index es {skill_id: columna}.
+    """
+    if isinstance(talent_df, TalentoCompacto):
+        # Directamente desde los arrays CSR, sin crear un dict por persona
+        indptr, claves, valores, vocabulario = talent_df.mapa('habilidades')
+        if skill_ids is None:
+            skill_ids = sorted({vocabulario[c] for c in np.unique(claves)})
+        skill_index = {skill_id: j for j, skill_id in enumerate(skill_ids)}
+        columna_por_codigo = np.array([skill_index.get(v, -1) for v in vocabulario] + [-1], dtype=np.intp)
+        matriz = np.zeros((len(talent_df), len(skill_index) + 1))
+        filas = np.repeat(np.arange(len(talent_df)), np.diff(indptr))
+        columnas = columna_por_codigo[claves]
+        validas = columnas >= 0
+        matriz[filas[validas], columnas[validas]] = valores[validas]
+        return matriz, skill_index
+
+    habilidades = [_como_dict(h) for h in talent_df['habilidades']]
+    if skill_ids is None:
+        skill_ids = sorted({s for h in habilidades for s in h})
+    skill_index = {skill_id: j for j, skill_id in enumerate(skill_ids)}
+
+    # Una columna extra (siempre 0) sirve de relleno para los roles
+    matriz = np.zeros((len(habilidades), len(skill_index) + 1))
+    for i, h in enumerate(habilidades):
+        for skill_id, level in h.items():
+            j = skill_index.get(skill_id)
+            if j is not None:
+                matriz[i, j] = level
+    return matriz, skill_index
+
+def _indices_skills_roles(skill_index, roles_defs, relleno):
+    """
+    Codifica los roles como una matriz rol x posición con la columna de cada
+    skill requerida ('relleno' = columna de ceros) y el nº de skills pedidas.
+    """
+    listas = [rol_def.get('habilidades_requeridas', []) if rol_def else [] for rol_def in roles_defs]
+    max_req = max((len(l) for l in listas), default=0)
+    indices = np.full((len(roles_defs), max_req), relleno, dtype=np.intp)
+    for r, lista in enumerate(listas):
+        indices[r, :len(lista)] = [skill_index.get(s, relleno) for s in lista]
+    return indices, np.array([len(l) for l in listas], dtype=float)
+
+def _sumar_skills(matriz_niveles, indices, n_req):
+    # Se suma posición a posición para conservar el mismo orden de suma que score_skills
+    acumulado = np.zeros((matriz_niveles.shape[0], len(n_req)))
+    for p in range(indices.shape[1]):
+        acumulado = acumulado + matriz_niveles[:, indices[:, p]] / 10.0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = (acumulado / n_req) * 50
+    scores[:, n_req == 0] = 50.0
+    return scores
+
+def _matriz_skills(matriz_niveles, skill_index, roles_defs):
+    """
+    Score de habilidades (50%) para todos los pares.
+    Los roles se codifican como una matriz rol x posición con el índice de
+    cada skill requerida (rellenada con la columna de ceros), y se suma
+    posición a posición para conservar el mismo orden de suma que score_skills.
+    """
+    indices, n_req = _indices_skills_roles(skill_index, roles_defs, relleno=matriz_niveles.shape[1] - 1)
+    return _sumar_skills(matriz_niveles, indices, n_req)
+
+def _matriz_responsabilidades(talent_df, roles_defs):
+    """
+    Score de responsabilidades (25%) para todos los pares.
+    Reproduce el TF-IDF de dos documentos de score_responsibilities sin
+    ajustar un vectorizador por par: con dos documentos el IDF vale 1 para
+    los términos compartidos y ln(3/2) + 1 para el resto, así que el coseno
+    sale de productos de matrices de conteos.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    listas_emp = [_como_lista(r) for r in talent_df['responsabilidades_actuales']]
+    listas_rol = [rol_def.get('responsabilidades', []) if rol_def else [] for rol_def in roles_defs]
+    n, n_roles = len(listas_emp), len(listas_rol)
+
+    docs = [" ".join(l) for l in listas_emp] + [" ".join(l) for l in listas_rol]
+    try:
+        conteos = CountVectorizer().fit_transform(docs).astype(float).tocsr()
+    except ValueError:
+        # Ningún documento tiene vocabulario: todas las similitudes son 0
+        conteos = None
+
+    if conteos is None:
+        similitud = np.zeros((n, n_roles))
+    else:
+        c_emp, c_rol = conteos[:n], conteos[n:]
+        b_emp, b_rol = (c_emp > 0).astype(float), (c_rol > 0).astype(float)
+        idf_2 = (np.log(3 / 2) + 1) ** 2
+
+        producto = (c_emp @ c_rol.T).toarray()
+        # Norma^2 de cada vector: los términos compartidos pesan 1, el resto idf_2
+        cuad_emp, cuad_rol = c_emp.multiply(c_emp), c_rol.multiply(c_rol)
+        compartido_emp = (cuad_emp @ b_rol.T).toarray()
+        compartido_rol = (b_emp @ cuad_rol.T).toarray()
+        total_emp = np.asarray(cuad_emp.sum(axis=1))
+        total_rol = np.asarray(cuad_rol.sum(axis=1)).T
+        norma_emp = compartido_emp + idf_2 * (total_emp - compartido_emp)
+        norma_rol = compartido_rol + idf_2 * (total_rol - compartido_rol)
+
+        denominador = np.sqrt(norma_emp * norma_rol)
+        similitud = np.divide(producto, denominador, out=np.zeros_like(producto), where=denominador > 0)
+
+    scores = similitud * 25
+    scores[[not l for l in listas_emp], :] = 0.0
+    scores[:, [not l for l in listas_rol]] = 25.0
+    return scores
+
+# Con un ajuste guardado, se reajusta al cargar si el corpus ha crecido más
+# de este factor respecto a los documentos con que se ajustó
+FACTOR_REAJUSTE = 1.5
+VERSION_AJUSTE = 1
+
+def _leer_ajuste(ruta, huella_roles, n_candidatos):
+    """
+    Ajuste guardado en 'ruta' (arrays + 'huella', 'huella_roles', 'candidatos')
+    si sigue valiendo: mismos textos de roles y un corpus que no ha crecido
+    más de FACTOR_REAJUSTE. None si no hay o no vale.
+    """
+    if not ruta:
+        return None
+    try:
+        with np.load(ruta) as datos:
+            ajuste = {clave: datos[clave] for clave in datos.files if clave != 'meta'}
+            ajuste.update(json.loads(str(datos['meta'])))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Advertencia: ajuste guardado ilegible ({e}); se reajusta.")
+        return None
+    if ajuste.get('version') != VERSION_AJUSTE or ajuste.get('huella_roles') != huella_roles:
+        return None
+    if n_candidatos > FACTOR_REAJUSTE * max(ajuste.get('candidatos', 0), 1):
+        return None
+    return ajuste
+
+def _guardar_ajuste(ruta, huella, huella_roles, n_candidatos, arrays):
+    """
+    Guarda un ajuste (escritura atómica). No hace nada sin ruta.
+    """
+    if not ruta:
+        return
+    meta = {'version': VERSION_AJUSTE, 'huella': huella, 'huella_roles': huella_roles, 'candidatos': n_candidatos}
+    try:
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp.npz"
+        np.savez(temporal, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(temporal, ruta)
+    except OSError as e:
+        print(f"Advertencia: no se pudo guardar el ajuste: {e}")
+
+def _exportar_tfidf(vectorizer):
+    """
+    Vocabulario (términos en orden de columna) e IDF de un TfidfVectorizer ajustado.
+    """
+    if vectorizer is None:
+        return {'terminos': np.array([], dtype=str), 'idf': np.zeros(0)}
+    terminos = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    return {'terminos': np.array(terminos, dtype=str), 'idf': vectorizer.idf_}
+
+def _tfidf_guardado(ajuste, **opciones):
+    """
+    TfidfVectorizer con el vocabulario y el IDF de _exportar_tfidf (None si
+    el vocabulario está vacío). Transforma igual que el original.
+    """
+    terminos = ajuste['terminos'].tolist()
+    if not terminos:
+        return None
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    vectorizer = TfidfVectorizer(vocabulary={t: i for i, t in enumerate(terminos)}, **opciones)
+    vectorizer.idf_ = ajuste['idf']
+    return vectorizer
+
+class IndiceResponsabilidades:
+    """
+    Índice TF-IDF de responsabilidades. El vocabulario y el IDF salen de
+    todos los documentos (responsabilidades de cada rol y
+    responsabilidades_actuales de cada candidato), se guardan las matrices
+    dispersas normalizadas (L2) y todas las similitudes se obtienen con un
+    único producto disperso. Los candidatos nuevos se transforman con el
+    vectorizador ya ajustado, sin reajustar nada.
+    Con 'ruta_ajuste' el vocabulario y el IDF se guardan en disco y las
+    cargas siguientes los reutilizan, así que un proceso reiniciado puntúa
+    igual que el que recibió las altas. Se reajusta (y cambia 'huella', lo
+    que invalida la CacheScores) solo si cambian los roles o si el corpus
+    ha crecido más de FACTOR_REAJUSTE desde el ajuste guardado; en ese
+    caso los scores de responsabilidades se mueven respecto a la sesión
+    anterior. Sin 'ruta_ajuste' se ajusta en cada carga.
+    El ajuste (y la importación de scikit-learn) se hace en el primer uso: si
+    todos los scores salen de la CacheScores, no llega a hacerse.
+    """
+
+    def __init__(self, listas_candidatos, listas_roles, ruta_ajuste=None):
+        self._vacios_cand = [not l for l in listas_candidatos]
+        self._vacios_rol = [not l for l in listas_roles]
+        self._docs = [" ".join(l) for l in listas_candidatos] + [" ".join(l) for l in listas_roles]
+        self._n_candidatos = len(listas_candidatos)
+        self._ruta_ajuste = ruta_ajuste
+        self._huella_roles = _huella_json(self._docs[self._n_candidatos:])
+        self._ajuste_guardado = _leer_ajuste(ruta_ajuste, self._huella_roles, self._n_candidatos)
+        # Huella del ajuste del IDF (ver CacheScores): la del corpus con el que se ajustó
+        if self._ajuste_guardado is not None:
+            self.huella = self._ajuste_guardado['huella']
+        else:
+            self.huella = _huella_corpus(self._docs[:self._n_candidatos], self._docs[self._n_candidatos:])
+        self._vectorizer = self._matriz_candidatos = self._matriz_roles = None
+        self._pendientes = [] # Documentos de candidatos añadidos aún sin transformar
+        self._crecientes = None # (matriz, buffers indptr/indices/data) para que las altas no copien la matriz
+
+    def ajustar(self):
+        """
+        Ajusta el TF-IDF (o carga el ajuste guardado) si aún no se ha hecho.
+        Devuelve el propio índice.
+        """
+        if self._docs is None:
+            return self
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        if self._ajuste_guardado is not None:
+            vectorizer = _tfidf_guardado(self._ajuste_guardado)
+            matriz = sp.csr_matrix((len(self._docs), 0)) if vectorizer is None else vectorizer.transform(self._docs).tocsr()
+        else:
+            vectorizer = TfidfVectorizer()
+            try:
+                # fit + transform y no fit_transform: este difiere en el último bit
+                # de lo que da el ajuste recargado (o el streaming) con transform
+                matriz = vectorizer.fit(self._docs).transform(self._docs).tocsr()
+            except ValueError:
+                # Vocabulario vacío: el índice devuelve similitud 0 para todo
+                vectorizer = None
+                matriz = sp.csr_matrix((len(self._docs), 0))
+            _guardar_ajuste(self._ruta_ajuste, self.huella, self._huella_roles, self._n_candidatos, _exportar_tfidf(vectorizer))
+        self._vectorizer = vectorizer
+        self._matriz_candidatos = matriz[:self._n_candidatos]
+        self._matriz_roles = matriz[self._n_candidatos:]
+        self._docs = self._ajuste_guardado = None
+        return self
+
+    @property
+    def vectorizer(self):
+        return self.ajustar()._vectorizer
+
+    @property
+    def matriz_candidatos(self):
+        self._consolidar()
+        return self._matriz_candidatos
+
+    @property
+    def matriz_roles(self):
+        return self.ajustar()._matriz_roles
+
+    def añadir_candidato(self, lista_resp):
+        """
+        Añade un candidato nuevo y devuelve su fila en el índice. Su vector se
+        calcula con el vectorizador ya ajustado (los términos fuera del
+        vocabulario se ignoran) cuando se necesite.
+        """
+        lista_resp = _como_lista(lista_resp)
+        self._pendientes.append(" ".join(lista_resp))
+        self._vacios_cand.append(not lista_resp)
+        return len(self._vacios_cand) - 1
+
+    def actualizar_candidato(self, fila, lista_resp):
+        """
+        Cambia las responsabilidades del candidato de 'fila' (con el mismo
+        ajuste). Copia la matriz de candidatos.
+        """
+        lista_resp = _como_lista(lista_resp)
+        self._consolidar()
+        matriz = self._matriz_candidatos
+        if self._vectorizer is None:
+            vector = sp.csr_matrix((1, matriz.shape[1]))
+        else:
+            vector = self._vectorizer.transform([" ".join(lista_resp)])
+        self._matriz_candidatos = sp.vstack([matriz[:fila], vector, matriz[fila + 1:]]).tocsr()
+        self._vacios_cand[fila] = not lista_resp
+
+    def descartar_candidatos(self, desde):
+        """
+        Quita los candidatos a partir de la fila 'desde' (p.ej. los de un
+        chunk ya puntuado en streaming). El ajuste no cambia.
+        """
+        self._consolidar()
+        self._matriz_candidatos = self._matriz_candidatos[:desde]
+        del self._vacios_cand[desde:]
+
+    def _consolidar(self):
+        self.ajustar()
+        if self._pendientes:
+            if self._vectorizer is None:
+                vectores = sp.csr_matrix((len(self._pendientes), 0))
+            else:
+                vectores = self._vectorizer.transform(self._pendientes)
+            self._matriz_candidatos = self._apilar(vectores.tocsr())
+            self._pendientes = []
+
+    def _apilar(self, vectores):
+        # Como sp.vstack, pero escribiendo las filas nuevas detrás de los buffers (ver ArrayCreciente)
+        matriz = self._matriz_candidatos
+        if self._crecientes is None or self._crecientes[0] is not matriz:
+            self._crecientes = (matriz, ArrayCreciente(matriz.indptr), ArrayCreciente(matriz.indices), ArrayCreciente(matriz.data))
+        _, indptr, indices, datos = self._crecientes
+        indptr = indptr.añadir((vectores.indptr[1:] + matriz.indptr[-1]).astype(matriz.indptr.dtype))
+        indices = indices.añadir(vectores.indices.astype(matriz.indices.dtype))
+        datos = datos.añadir(vectores.data)
+        matriz = sp.csr_matrix((datos.array, indices.array, indptr.array), shape=(len(indptr) - 1, matriz.shape[1]))
+        self._crecientes = (matriz, indptr, indices, datos)
+        return matriz
+
+    def similitudes(self, filas=None, roles=None):
+        """
+        Similitud coseno (0 a 1) de los candidatos (todos, o solo 'filas') con
+        cada rol (todos, o solo las columnas 'roles').
+        """
+        self._consolidar()
+        candidatos = self.matriz_candidatos if filas is None else self.matriz_candidatos[filas]
+        matriz_roles = self.matriz_roles if roles is None else self.matriz_roles[roles]
+        return (candidatos @ matriz_roles.T).toarray()
+
+    def scores(self, filas=None, roles=None):
+        """
+        Score de responsabilidades (25%) con las mismas reglas que score_responsibilities
+        para listas vacías.
+        """
+        scores = self.similitudes(filas, roles) * 25
+        if filas is None:
+            vacios_cand = np.array(self._vacios_cand, dtype=bool)
+        else: # Sin convertir la lista entera: con una alta se consulta una fila
+            vacios_cand = np.array([self._vacios_cand[f] for f in np.ravel(filas).tolist()], dtype=bool)
+        vacios_rol = np.array(self._vacios_rol, dtype=bool)
+        if roles is not None:
+            vacios_rol = vacios_rol[roles]
+        scores[vacios_cand, :] = 0.0
+        scores[:, vacios_rol] = 25.0
+        return scores
+
+    def candidatos_vacios(self):
+        """
+        Máscara de los candidatos sin responsabilidades (score de responsabilidades 0).
+        """
+        return np.array(self._vacios_cand, dtype=bool)
+
+@instrumentar(filas=lambda talent_df, *args, **kwargs: len(talent_df))
+def construir_indice_responsabilidades(talent_df, roles_futuros, roles_lookup, ruta_ajuste=None):
+    """
+    Crea el índice de responsabilidades con las filas de talent_df y las
+    columnas en el orden de roles_futuros ('ruta_ajuste': ver IndiceResponsabilidades).
+    """
+    listas_candidatos = [_como_lista(r) for r in talent_df['responsabilidades_actuales']]
+    listas_roles = []
+    for rol in roles_futuros:
+        rol_def = roles_lookup.get(rol['id'])
+        listas_roles.append(rol_def.get('responsabilidades', []) if rol_def else [])
+    return IndiceResponsabilidades(listas_candidatos, listas_roles, ruta_ajuste)
+
+def _niveles_aspiracion(talent_df):
+    """
+    'nivel_aspiración' de cada persona en minúsculas ('' si no consta).
+    """
+    if isinstance(talent_df, TalentoCompacto):
+        codigos, valores = talent_df.codigos('amb_nivel_aspiración')
+        return np.array([str(v).lower() for v in valores] + [''], dtype=object)[codigos]
+    return np.array([_como_dict(a).get('nivel_aspiración', '').lower() for a in talent_df['ambiciones']], dtype=object)
+
+def dedicacion_total(talent_df):
+    """
+    Suma de la dedicación actual (%) de cada persona.
+    """
+    if isinstance(talent_df, TalentoCompacto):
+        indptr, _, valores, _ = talent_df.mapa('dedicación_actual')
+        filas = np.repeat(np.arange(len(talent_df)), np.diff(indptr))
+        return np.bincount(filas, weights=valores, minlength=len(talent_df)).astype(float)
+    return np.array([sum(_como_dict(d).values()) for d in talent_df['dedicación_actual']], dtype=float)
+
+def _matriz_ambiciones(talent_df, roles_defs):
+    """
+    Score de ambiciones (15%): compara códigos de nivel por broadcasting.
+    """
+    niveles_emp = _niveles_aspiracion(talent_df)
+    niveles_rol = [rol_def.get('nivel', 'N/A').lower() if rol_def else '' for rol_def in roles_defs]
+
+    codigos = {nivel: k for k, nivel in enumerate(sorted(set(niveles_emp) | set(niveles_rol)))}
+    cod_emp = np.array([codigos[n] for n in niveles_emp], dtype=np.intp)
+    cod_rol = np.array([codigos[n] for n in niveles_rol], dtype=np.intp)
+    return np.where(cod_emp[:, None] == cod_rol[None, :], 15.0, 0.0)
+
+def _matriz_dedicacion(talent_df, roles_futuros):
+    """
+    Score de dedicación (10%): dedicación total vs. la requerida por la modalidad.
+    """
+    total = dedicacion_total(talent_df)
+    requerida = np.array([
+        DEDICACION_POR_MODALIDAD.get(rol.get('modalidad', 'FT'), 100) for rol in roles_futuros
+    ], dtype=float)
+    proporcional = (total[:, None] / requerida[None, :]) * 10
+    return np.where(total[:, None] >= requerida[None, :], 10.0, proporcional)
+
+@instrumentar(filas=lambda talent_df, *args, **kwargs: len(talent_df))
+def calcular_matriz_compatibilidad(talent_df, roles_futuros, roles_lookup, indice_resp=None, filas_resp=None, cache=None):
+    """
+    Versión vectorizada de calcular_compatibilidad_total.
+    Puntúa todo el talent pool contra todos los roles futuros de una vez.
+    Si se pasa un IndiceResponsabilidades, el componente de responsabilidades
+    usa su TF-IDF global en lugar del TF-IDF por pares ('filas_resp' indica
+    qué filas del índice corresponden a talent_df, por defecto todas).
+    Con 'cache' (un CacheScores) solo se puntúan las filas que no estén en
+    la caché para su versión; el resultado es el mismo.
+    Devuelve un dict con la matriz 'total' (candidato x rol), las cuatro
+    submatrices por componente y los ids de filas y columnas.
+    """
+    if cache is not None:
+        return _calcular_matriz_con_cache(talent_df, roles_futuros, roles_lookup, indice_resp, filas_resp, cache)
+    roles_defs = [roles_lookup.get(rol['id']) for rol in roles_futuros]
+
+    matriz_niveles, skill_index = construir_matriz_habilidades(talent_df)
+    s_skills = _matriz_skills(matriz_niveles, skill_index, roles_defs)
+    if indice_resp is not None:
+        s_resp = indice_resp.scores(filas_resp)
+    else:
+        s_resp = _matriz_responsabilidades(talent_df, roles_defs)
+    s_amb = _matriz_ambiciones(talent_df, roles_defs)
+    s_ded = _matriz_dedicacion(talent_df, roles_futuros)
+
+    total = s_skills + s_resp + s_amb + s_ded
+
+    # Roles sin definición en org_config.json puntúan 0 (igual que la versión escalar)
+    sin_definicion = [rol_def is None for rol_def in roles_defs]
+    for componente in (total, s_skills, s_resp, s_amb, s_ded):
+        componente[:, sin_definicion] = 0.0
+
+    return {
+        'total': total,
+        'skills': s_skills,
+        'responsabilidades': s_resp,
+        'ambiciones': s_amb,
+        'dedicacion': s_ded,
+        'ids_empleado': talent_df['id_empleado'].to_numpy(),
+        'ids_rol': [rol['id'] for rol in roles_futuros],
+    }
+
+# --- Caché Versionada de Scores ---
+# Cada score (candidato, rol) depende solo del registro del candidato, de la
+# definición del rol y, para responsabilidades con el índice global, del
+# corpus con el que se ajustó el IDF. La caché guarda los cuatro componentes
+# por bloques (un bloque por rol + huella del rol + huella del corpus) con las
+# huellas de contenido de los candidatos ordenadas, así que un cambio en
+# org_config.json / vision_futura.json invalida solo los roles afectados y un
+# cambio en un registro solo su fila (si cambian responsabilidades, cambia el
+# IDF y con él todo el componente de responsabilidades).
+
+VERSION_CACHE_SCORES = 1
+MAX_BYTES_CACHE_SCORES = 512 * 2**20
+
+def _hash_valores(valores):
+    return pd.util.hash_array(np.asarray(valores, dtype=object)) if len(valores) else np.zeros(0, dtype=np.uint64)
+
+def _hash_por_fila(indptr, hashes):
+    # Suma (con desbordamiento) de los hashes de cada fila: no depende del orden
+    acumulado = np.zeros(len(hashes) + 1, dtype=np.uint64)
+    np.cumsum(hashes, out=acumulado[1:])
+    return acumulado[indptr[1:]] - acumulado[indptr[:-1]]
+
+def _hash_mapa(indptr, claves, valores, vocabulario):
+    # Solo se hashean las claves usadas: con pocas filas (una alta) no se recorre todo el vocabulario
+    usadas, codigos = np.unique(claves, return_inverse=True)
+    hashes = _hash_valores([vocabulario[c] for c in usadas.tolist()])[codigos.ravel()] ^ pd.util.hash_array(np.asarray(valores, dtype=float))
+    return _hash_por_fila(indptr, pd.util.hash_array(hashes))
+
+def _csr_desde_celdas(celdas, es_mapa):
+    indptr, claves, valores = [0], [], []
+    for celda in celdas:
+        elementos = _como_dict(celda).items() if es_mapa else ((c, 0) for c in _como_lista(celda))
+        for clave, valor in elementos:
+            claves.append(clave)
+            valores.append(valor)
+        indptr.append(len(claves))
+    codigos, vocabulario = pd.factorize(pd.Series(claves, dtype=object))
+    return np.array(indptr, dtype=np.int64), codigos, np.array(valores, dtype=float), list(vocabulario)
+
+def huellas_registros(talent_df):
+    """
+    Huella de contenido (uint64) de cada fila: id y los campos que usan los
+    scores (habilidades, responsabilidades, nivel de aspiración, dedicación).
+    Es la misma para un DataFrame y para un TalentoCompacto con los mismos datos.
+    """
+    columnas = {'id': talent_df['id_empleado'].to_numpy().astype(np.int64)}
+    for columna in ('habilidades', 'responsabilidades_actuales', 'dedicación_actual'):
+        if isinstance(talent_df, TalentoCompacto):
+            if columna == 'responsabilidades_actuales':
+                indptr, claves, vocabulario = talent_df.lista(columna)
+                partes = (indptr, claves, np.zeros(len(claves)), vocabulario)
+            else:
+                partes = talent_df.mapa(columna)
+        else:
+            partes = _csr_desde_celdas(talent_df[columna], columna != 'responsabilidades_actuales')
+        columnas[columna] = _hash_mapa(*partes)
+    columnas['ambiciones'] = _hash_valores(_niveles_aspiracion(talent_df))
+    return pd.util.hash_pandas_object(pd.DataFrame(columnas), index=False).to_numpy()
+
+def _huella_corpus(docs_candidatos, docs_roles):
+    suma = _hash_valores(docs_candidatos).sum(dtype=np.uint64) if docs_candidatos else np.uint64(0)
+    return int(pd.util.hash_array(np.array([suma], dtype=np.uint64))[0] ^ _huella_json(docs_roles))
+
+def _huella_json(valor):
+    return int.from_bytes(hashlib.sha1(json.dumps(valor, sort_keys=True, ensure_ascii=False).encode('utf-8')).digest()[:8], 'little')
+
+def huellas_roles(roles_futuros, roles_lookup):
+    """
+    Huella de cada rol futuro: su entrada en vision_futura.json y su
+    definición en org_config.json.
+    """
+    return [_huella_json([rol, roles_lookup.get(rol['id'])]) for rol in roles_futuros]
+
+class _Huellas:
+    """
+    Huellas de las filas de un bloque, en orden de inserción, con su índice
+    ordenado. Las que se añaden después van a una cola (huella -> posición)
+    que se funde con el índice al pasar de MIN_COLA o de 1/8 del bloque: una
+    alta no reordena el bloque entero.
+    """
+    MIN_COLA = 1024
+
+    def __init__(self, valores):
+        self._valores = ArrayCreciente(valores)
+        self._indexar()
+
+    def _indexar(self):
+        self.orden = np.argsort(self.valores, kind='stable')
+        self.ordenadas = self.valores[self.orden]
+        self._cola = {}
+
+    @property
+    def valores(self):
+        return self._valores.array
+
+    def nbytes(self):
+        return self.valores.nbytes + self.orden.nbytes + self.ordenadas.nbytes
+
+    def añadir(self, huellas):
+        """
+        Añade huellas al final (en sitio).
+        """
+        n = len(self.valores)
+        self._valores = self._valores.añadir(huellas)
+        if len(self._cola) + len(huellas) > max(self.MIN_COLA, n // 8):
+            self._indexar()
+        else:
+            for i, huella in enumerate(huellas.tolist()):
+                self._cola.setdefault(huella, n + i)
+
+    def posiciones(self, huellas):
+        """
+        Posición de cada huella en el bloque (-1 si no está), o None si el
+        bloque empieza exactamente por esas huellas.
+        """
+        if len(huellas) <= len(self.valores) and np.array_equal(self.valores[:len(huellas)], huellas):
+            return None
+        if len(self.ordenadas):
+            i = np.searchsorted(self.ordenadas, huellas).clip(max=len(self.ordenadas) - 1)
+            posiciones = np.where(self.ordenadas[i] == huellas, self.orden[i], -1)
+        else:
+            posiciones = np.full(len(huellas), -1)
+        if self._cola:
+            faltan = np.flatnonzero(posiciones < 0)
+            posiciones[faltan] = [self._cola.get(huella, -1) for huella in huellas[faltan].tolist()]
+        return posiciones
+
+    def ausentes(self, huellas):
+        """
+        Máscara de las huellas que no están en el bloque.
+        """
+        posiciones = self.posiciones(huellas)
+        return np.zeros(len(huellas), dtype=bool) if posiciones is None else posiciones < 0
+
+class CacheScores:
+    """
+    Caché LRU de los componentes de score por (rol, candidato), con límite de
+    memoria (max_bytes) y, si se pasa 'ruta', persistencia en un .npz para
+    reutilizarla entre reinicios. estadisticas() da aciertos y fallos (en pares).
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES_CACHE_SCORES, ruta=None):
+        self.max_bytes = max_bytes
+        self.ruta = ruta
+        # (rol_id, huella_rol, huella_corpus) -> (_Huellas, ArrayCreciente m x 4); los
+        # bloques guardados a la vez comparten el mismo objeto _Huellas y crecen juntos
+        self._bloques = OrderedDict()
+        self.aciertos = self.fallos = self.desalojos = 0
+        self.modificada = False
+        if ruta:
+            self._leer()
+
+    def __len__(self):
+        return sum(len(huellas.valores) for huellas, _ in self._bloques.values())
+
+    def obtener(self, claves, huellas):
+        """
+        Componentes guardados para las filas 'huellas' en cada bloque de 'claves'.
+        Devuelve (valores 4 x filas x roles, máscara de aciertos filas x roles).
+        """
+        # Se rellena por rol (escritura contigua) y se transpone al final
+        valores = np.zeros((len(PESOS_COMPONENTES), len(claves), len(huellas)))
+        acierto = np.zeros((len(claves), len(huellas)), dtype=bool)
+        posiciones = {}
+        for j, clave in enumerate(claves):
+            bloque = self._bloques.get(clave)
+            if bloque is None:
+                continue
+            self._bloques.move_to_end(clave)
+            guardadas, datos = bloque[0], bloque[1].array.T
+            if id(guardadas) not in posiciones:
+                posiciones[id(guardadas)] = guardadas.posiciones(huellas)
+            pos = posiciones[id(guardadas)]
+            if pos is None: # Mismas filas y en el mismo orden: sin gather
+                acierto[j] = True
+                valores[:, j] = datos[:, :len(huellas)]
+            else:
+                encontradas = pos >= 0
+                acierto[j] = encontradas
+                valores[:, j, encontradas] = datos[:, pos[encontradas]]
+        n_aciertos = int(acierto.sum())
+        self.aciertos += n_aciertos
+        self.fallos += acierto.size - n_aciertos
+        return np.ascontiguousarray(valores.transpose(0, 2, 1)), acierto.T
+
+    def guardar(self, claves, huellas, valores):
+        """
+        Guarda 'valores' (4 x filas x roles) de las filas 'huellas' en cada
+        bloque. Las filas nuevas se añaden al final (en sitio, sin copiar el
+        bloque), así una consulta con las mismas filas en el mismo orden (p.ej.
+        al reiniciar) no necesita reordenar.
+        """
+        # Huellas que también usan bloques fuera de 'claves': esos no reciben las filas nuevas, así que se separan
+        usos = Counter(id(guardadas) for guardadas, _ in self._bloques.values())
+        usos.subtract(id(self._bloques[clave][0]) for clave in set(claves) if clave in self._bloques)
+        fusiones = {}
+        for j, clave in enumerate(claves):
+            guardadas, datos = self._bloques.pop(clave, (None, None))
+            if id(guardadas) not in fusiones:
+                if guardadas is None:
+                    unidas, nuevas = _Huellas(huellas), slice(None)
+                else:
+                    # Una huella ya guardada tiene los mismos scores: solo se añaden las que faltan
+                    nuevas = np.flatnonzero(guardadas.ausentes(huellas))
+                    if usos[id(guardadas)] > 0:
+                        unidas = _Huellas(np.concatenate([guardadas.valores, huellas[nuevas]]))
+                    else:
+                        unidas = guardadas
+                        unidas.añadir(huellas[nuevas])
+                fusiones[id(guardadas)] = (unidas, nuevas)
+            unidas, nuevas = fusiones[id(guardadas)]
+            filas = valores[:, nuevas, j].T
+            self._bloques[clave] = (unidas, ArrayCreciente(np.ascontiguousarray(filas)) if datos is None else datos.añadir(filas))
+        self.modificada = True
+        while len(self._bloques) > 1 and self.memoria_bytes() > self.max_bytes:
+            self._bloques.popitem(last=False)
+            self.desalojos += 1
+
+    def memoria_bytes(self):
+        compartidas = {id(huellas): huellas.nbytes() for huellas, _ in self._bloques.values()}
+        return sum(compartidas.values()) + sum(datos.array.nbytes for _, datos in self._bloques.values())
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            'aciertos': self.aciertos, 'fallos': self.fallos,
+            'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+            'desalojos': self.desalojos, 'bloques': len(self._bloques), 'pares': len(self),
+            'memoria_mb': round(self.memoria_bytes() / 2**20, 2),
+        }
+
+    def guardar_en_disco(self):
+        """
+        Vuelca la caché a 'ruta' (escritura atómica). No hace nada sin ruta.
+        """
+        if not self.ruta:
+            return
+        arrays, manifiesto, indices = {}, [], {}
+        for (rol_id, huella_rol, huella_corpus), (huellas, datos) in self._bloques.items():
+            if id(huellas) not in indices:
+                indices[id(huellas)] = len(indices)
+                arrays[f"huellas_{indices[id(huellas)]}"] = huellas.valores
+            arrays[f"valores_{len(manifiesto)}"] = datos.array.T
+            manifiesto.append([rol_id, huella_rol, huella_corpus, indices[id(huellas)]])
+        arrays['manifiesto'] = np.array(json.dumps({'version': VERSION_CACHE_SCORES, 'bloques': manifiesto}))
+        try:
+            os.makedirs(os.path.dirname(self.ruta) or '.', exist_ok=True)
+            temporal = f"{self.ruta}.{os.getpid()}.tmp.npz" # Varios workers pueden guardar a la vez
+            np.savez(temporal, **arrays)
+            os.replace(temporal, self.ruta)
+            self.modificada = False
+        except OSError as e:
+            print(f"Advertencia: no se pudo guardar la caché de scores: {e}")
+
+    def _leer(self):
+        try:
+            with np.load(self.ruta) as datos:
+                manifiesto = json.loads(str(datos['manifiesto']))
+                if manifiesto.get('version') != VERSION_CACHE_SCORES:
+                    return
+                huellas = {}
+                for i, (rol_id, huella_rol, huella_corpus, k) in enumerate(manifiesto['bloques']):
+                    if k not in huellas:
+                        huellas[k] = _Huellas(datos[f"huellas_{k}"])
+                    self._bloques[(rol_id, huella_rol, huella_corpus)] = (huellas[k], ArrayCreciente(datos[f"valores_{i}"].T))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Advertencia: caché de scores ilegible ({e}); se empieza vacía.")
+            self._bloques.clear()
+
+def _calcular_matriz_con_cache(talent_df, roles_futuros, roles_lookup, indice_resp, filas_resp, cache):
+    huellas = huellas_registros(talent_df)
+    # Sin índice global, responsabilidades es TF-IDF por pares: no depende del corpus
+    corpus = indice_resp.huella if indice_resp is not None else 0
+    claves = [(rol['id'], huella, corpus) for rol, huella in zip(roles_futuros, huellas_roles(roles_futuros, roles_lookup))]
+    valores, acierto = cache.obtener(claves, huellas)
+
+    faltan = np.flatnonzero(~acierto.all(axis=1))
+    if len(faltan):
+        if len(faltan) == len(talent_df):
+            subconjunto, filas_indice = talent_df, filas_resp
+        else:
+            subconjunto = talent_df[faltan] if isinstance(talent_df, TalentoCompacto) else talent_df.iloc[faltan].reset_index(drop=True)
+            filas_indice = faltan if filas_resp is None else np.asarray(filas_resp)[faltan]
+        nuevas = calcular_matriz_compatibilidad(
+            subconjunto, roles_futuros, roles_lookup, indice_resp, filas_indice if indice_resp is not None else None
+        )
+        valores[:, faltan] = np.stack([nuevas[c] for c in PESOS_COMPONENTES])
+        cache.guardar(claves, huellas[faltan], valores[:, faltan])
+
+    s_skills, s_resp, s_amb, s_ded = valores
+    # Mismo orden de suma que el cálculo directo (resultado idéntico)
+    total = s_skills + s_resp + s_amb + s_ded
+    return {
+        'total': total,
+        'skills': s_skills,
+        'responsabilidades': s_resp,
+        'ambiciones': s_amb,
+        'dedicacion': s_ded,
+        'ids_empleado': talent_df['id_empleado'].to_numpy(),
+        'ids_rol': [rol['id'] for rol in roles_futuros],
+    }
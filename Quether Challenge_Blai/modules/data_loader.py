@@ -1,6 +1,46 @@
+import numpy as np
 import pandas as pd
 import json
 import ast # Necesario para el CSV
+import hashlib
+import os
+import csv
+from contextlib import contextmanager
+try:
+    import fcntl # Bloqueo de archivos (solo POSIX)
+except ImportError:
+    fcntl = None
+
+COLUMNAS_TALENTO = [
+    "id_empleado","nombre","email","chapter","rol_actual","manager",
+    "antigüedad","habilidades","responsabilidades_actuales",
+    "dedicación_actual","ambiciones","metadata"
+]
+
+# Columnas que necesitan conversión
+COLUMNAS_LITERALES = ['habilidades', 'responsabilidades_actuales',
+                      'dedicación_actual', 'ambiciones', 'metadata']
+
+# CSVs de talento dentro de la carpeta de datos (internos y externos)
+TALENT_FILES = ['talento_actual.csv', 'candidatos_externos.csv']
+
+# Journal de cambios de talento ya existente (dentro de la carpeta de datos)
+ARCHIVO_CAMBIOS = 'cambios_talento.journal.jsonl'
+
+# Tamaño del journal de un CSV a partir del cual load_all_data lo compacta
+# (volcarlo al CSV obliga a reparsear el CSV una vez, pero las cargas
+# siguientes ya no releen las altas desde JSON)
+MAX_BYTES_JOURNAL = 1 << 20
+
+# ID asignado al primer talento si aún no hay ninguno
+PRIMER_ID = 1001
+
+# Versión del formato de la caché columnar (subirla si cambian las tablas)
+VERSION_CACHE = 2
+
+# Solo las celdas vacías son nulas: 'N/A' (el valor por defecto del formulario
+# y de la API) se lee tal cual, igual que desde el journal
+OPCIONES_CSV = {'keep_default_na': False, 'na_values': ['']}
 
 def load_json_file(filepath):
     """
@@ -13,54 +53,442 @@ def load_json_file(filepath):
         print(f"Error cargando JSON {filepath}: {e}")
         raise e
 
-def load_talent_data(filepath):
+def _parsear_columna(serie):
     """
-    Carga un CUALQUIER CSV de talento (interno o externo)
-    y convierte las columnas de texto en objetos Python.
+    Convierte una columna de texto en objetos Python.
+    Intenta parsear la columna entera como un único array JSON (una sola
+    llamada, muy rápida) y, si alguna celda no es JSON válido (p.ej. dicts con
+    comillas simples) o una celda se lee como varios valores (p.ej. "1, 2"),
+    cae a json/ast.literal_eval celda a celda. Las celdas vacías valen como
+    nulas ({}); una celda que no se puede leer da ValueError.
     """
+    celdas = [celda if celda.strip() else '{}' for celda in serie.fillna('{}').astype(str).tolist()]
     try:
-        df = pd.read_csv(filepath)
+        valores = json.loads("[" + ",".join(celdas) + "]")
+        if len(valores) == len(celdas):
+            return valores
+    except ValueError:
+        pass
+
+    valores = []
+    for fila, celda in enumerate(celdas):
+        try:
+            valores.append(json.loads(celda))
+        except ValueError:
+            try:
+                valores.append(ast.literal_eval(celda))
+            except (ValueError, SyntaxError) as e:
+                raise ValueError(f"columna '{serie.name}', fila {fila}: valor no válido {celda!r}") from e
+    return valores
+
+def _hash_archivo(filepath):
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+def _directorio_cache(filepath):
+    """
+    La caché vive junto a data/: data/.cache/<nombre_del_csv>/
+    """
+    carpeta, nombre = os.path.split(os.path.abspath(filepath))
+    return os.path.join(carpeta, '.cache', os.path.splitext(nombre)[0])
+
+def parsear_talento_columnar(df):
+    """
+    Normaliza un DataFrame de talento (columnas literales en texto) a tablas
+    columnares:
+    - 'base': columnas simples + campos de 'ambiciones' (amb_*) y 'metadata' (meta_*) aplanados.
+    - 'habilidades': formato largo (fila, skill_id, nivel).
+    - 'responsabilidades': (fila, orden, responsabilidad).
+    - 'dedicacion': (fila, proyecto, dedicacion).
+    'fila' es la posición de la persona en 'base'.
+    """
+    for col in COLUMNAS_LITERALES:
+        if col not in df.columns:
+            raise ValueError(f"El archivo no tiene la columna requerida: '{col}'")
+
+    parsed = {col: _parsear_columna(df[col]) for col in COLUMNAS_LITERALES}
+    base = df.drop(columns=COLUMNAS_LITERALES).reset_index(drop=True)
+    return _tablas_desde_valores(base, parsed)
+
+def tablas_a_partir_de_registros(registros):
+    """
+    Mismas tablas que parsear_talento_columnar, a partir de registros ya
+    parseados (dicts con listas/dicts en las columnas literales, como los del journal).
+    """
+    df = pd.DataFrame(registros, columns=COLUMNAS_TALENTO)
+    parsed = {col: df[col].tolist() for col in COLUMNAS_LITERALES}
+    return _tablas_desde_valores(df.drop(columns=COLUMNAS_LITERALES), parsed)
+
+def _tablas_desde_valores(base, parsed):
+    skills_rows, resp_rows, ded_rows = [], [], []
+    for fila in range(len(base)):
+        habilidades = parsed['habilidades'][fila]
+        if isinstance(habilidades, dict):
+            skills_rows.extend((fila, skill_id, nivel) for skill_id, nivel in habilidades.items())
+        responsabilidades = parsed['responsabilidades_actuales'][fila]
+        if isinstance(responsabilidades, list):
+            resp_rows.extend((fila, orden, texto) for orden, texto in enumerate(responsabilidades))
+        dedicacion = parsed['dedicación_actual'][fila]
+        if isinstance(dedicacion, dict):
+            ded_rows.extend((fila, proyecto, carga) for proyecto, carga in dedicacion.items())
+
+    for col, prefijo in (('ambiciones', 'amb_'), ('metadata', 'meta_')):
+        campos = pd.DataFrame([d if isinstance(d, dict) else {} for d in parsed[col]])
+        for campo in campos.columns:
+            base[prefijo + campo] = campos[campo].to_numpy()
+
+    return {
+        'base': base,
+        'habilidades': pd.DataFrame(skills_rows, columns=['fila', 'skill_id', 'nivel']),
+        'responsabilidades': pd.DataFrame(resp_rows, columns=['fila', 'orden', 'responsabilidad']),
+        'dedicacion': pd.DataFrame(ded_rows, columns=['fila', 'proyecto', 'dedicacion']),
+    }
+
+def concatenar_tablas(lista_tablas):
+    """
+    Une varios juegos de tablas columnares desplazando 'fila' de cada uno.
+    """
+    desplazamiento, partes = 0, {nombre: [] for nombre in ('base', 'habilidades', 'responsabilidades', 'dedicacion')}
+    for tablas in lista_tablas:
+        partes['base'].append(tablas['base'])
+        for nombre in ('habilidades', 'responsabilidades', 'dedicacion'):
+            partes[nombre].append(tablas[nombre].assign(fila=tablas[nombre]['fila'] + desplazamiento))
+        desplazamiento += len(tablas['base'])
+    return {nombre: pd.concat(tablas, ignore_index=True) for nombre, tablas in partes.items()}
+
+def _guardar_cache(tablas, carpeta, manifiesto):
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        for nombre, tabla in tablas.items():
+            tabla.to_parquet(os.path.join(carpeta, f"{nombre}.parquet"), index=False)
+        with open(os.path.join(carpeta, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f)
+    except Exception as e:
+        # La caché es opcional: si no se puede escribir seguimos sin ella
+        print(f"Advertencia: no se pudo guardar la caché en {carpeta}: {e}")
+
+def _leer_cache(carpeta):
+    return {
+        nombre: pd.read_parquet(os.path.join(carpeta, f"{nombre}.parquet"))
+        for nombre in ('base', 'habilidades', 'responsabilidades', 'dedicacion')
+    }
+
+def cargar_talento_columnar(filepath):
+    """
+    Carga un CSV de talento en forma columnar, usando la caché Parquet de
+    data/.cache/ mientras el CSV no cambie (mismo mtime y tamaño, o mismo hash
+    si el mtime ha cambiado). Devuelve None si el CSV no existe.
+    """
+    try:
+        stat = os.stat(filepath)
     except FileNotFoundError:
-        # Si no se encuentra el archivo, crea un dataframe vacío
-        print(f"Advertencia: No se encontró {filepath}. Se creará uno vacío en memoria.")
-        return pd.DataFrame(columns=[
-            "id_empleado","nombre","email","chapter","rol_actual","manager",
-            "antigüedad","habilidades","responsabilidades_actuales",
-            "dedicación_actual","ambiciones","metadata"
-        ])
+        return None
+
+    carpeta = _directorio_cache(filepath)
+    ruta_manifiesto = os.path.join(carpeta, 'manifest.json')
+    manifiesto = None
+    try:
+        with open(ruta_manifiesto, 'r', encoding='utf-8') as f:
+            manifiesto = json.load(f)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    if manifiesto and manifiesto.get('version') == VERSION_CACHE and manifiesto.get('size') == stat.st_size:
+        try:
+            # Caché caliente: ni siquiera hace falta leer el CSV
+            if manifiesto.get('mtime_ns') == stat.st_mtime_ns:
+                return _leer_cache(carpeta)
+            # El mtime ha cambiado (p.ej. un checkout): comprobamos el contenido
+            if manifiesto.get('sha256') == _hash_archivo(filepath):
+                tablas = _leer_cache(carpeta)
+                manifiesto['mtime_ns'] = stat.st_mtime_ns
+                _guardar_cache({}, carpeta, manifiesto)
+                return tablas
+        except Exception as e:
+            print(f"Advertencia: caché inválida en {carpeta}, se regenera: {e}")
+
+    try:
+        df = pd.read_csv(filepath, **OPCIONES_CSV)
     except Exception as e:
         print(f"Error cargando CSV {filepath}: {e}")
         raise e
-        
-    # Columnas que necesitan conversión
-    cols_to_parse = ['habilidades', 'responsabilidades_actuales', 
-                       'dedicación_actual', 'ambiciones', 'metadata']
-    
-    for col in cols_to_parse:
-        if col not in df.columns:
-            raise ValueError(f"El archivo '{filepath}' no tiene la columna requerida: '{col}'")
-        
-        # Asegurarse de que los datos no sean nulos antes de parsear
-        df[col] = df[col].fillna('{}').apply(ast.literal_eval)
-        
+    try:
+        tablas = parsear_talento_columnar(df)
+    except ValueError as e:
+        raise ValueError(f"El archivo '{filepath}': {e}")
+
+    _guardar_cache(tablas, carpeta, {
+        'version': VERSION_CACHE,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': _hash_archivo(filepath),
+    })
+    return tablas
+
+def _es_nulo(valor):
+    return valor is None or (isinstance(valor, float) and valor != valor)
+
+def _agrupar_dicts(tabla, n, clave, valor):
+    resultado = [{} for _ in range(n)]
+    for fila, k, v in zip(tabla['fila'].tolist(), tabla[clave].tolist(), tabla[valor].tolist()):
+        resultado[fila][k] = v
+    return resultado
+
+def tablas_a_dataframe(tablas):
+    """
+    Reconstruye el DataFrame de talento (con dicts/listas en las columnas
+    literales) a partir de las tablas columnares.
+    """
+    base = tablas['base']
+    n = len(base)
+    df = base[[c for c in base.columns if not c.startswith(('amb_', 'meta_'))]].copy()
+
+    responsabilidades = [[] for _ in range(n)]
+    resp = tablas['responsabilidades'].sort_values(['fila', 'orden'], kind='stable')
+    for fila, texto in zip(resp['fila'].tolist(), resp['responsabilidad'].tolist()):
+        responsabilidades[fila].append(texto)
+
+    df['habilidades'] = _agrupar_dicts(tablas['habilidades'], n, 'skill_id', 'nivel')
+    df['responsabilidades_actuales'] = responsabilidades
+    df['dedicación_actual'] = _agrupar_dicts(tablas['dedicacion'], n, 'proyecto', 'dedicacion')
+
+    for col, prefijo in (('ambiciones', 'amb_'), ('metadata', 'meta_')):
+        campos = [c for c in base.columns if c.startswith(prefijo)]
+        valores = [base[c].tolist() for c in campos]
+        dicts = []
+        for fila in range(n):
+            d = {}
+            for campo, columna in zip(campos, valores):
+                v = columna[fila]
+                if not _es_nulo(v):
+                    d[campo[len(prefijo):]] = list(v) if hasattr(v, 'tolist') else v
+            dicts.append(d)
+        df[col] = dicts
+
+    return df[[c for c in COLUMNAS_TALENTO if c in df.columns] + [c for c in df.columns if c not in COLUMNAS_TALENTO]]
+
+# --- Ingesta Incremental (Journal) ---
+# Las altas del formulario no reescriben el CSV: se añaden como una línea JSON
+# a un journal junto al CSV (<csv>.journal.jsonl). load_talent_data lee el CSV
+# (cacheado) y después aplica el journal. compactar_journal lo vuelca al CSV.
+# Los cambios de personas ya existentes van a otro journal (ARCHIVO_CAMBIOS)
+# que load_all_data aplica al final: cada persona conserva su posición y
+# se queda con su último registro.
+
+def ruta_journal(filepath):
+    return os.path.splitext(filepath)[0] + '.journal.jsonl'
+
+@contextmanager
+def _bloqueo(ruta):
+    """
+    Bloqueo exclusivo entre procesos (varios recruiters guardando a la vez).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(ruta, 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def leer_journal(filepath):
+    """
+    Devuelve los registros del journal de un CSV (lista de dicts, ya parseados).
+    """
+    try:
+        with open(ruta_journal(filepath), 'r', encoding='utf-8') as f:
+            return [json.loads(linea) for linea in f if linea.strip()]
+    except FileNotFoundError:
+        return []
+
+def _max_id_existente(data_dir):
+    max_id = None
+    for nombre in TALENT_FILES:
+        filepath = os.path.join(data_dir, nombre)
+        ids = [r['id_empleado'] for r in leer_journal(filepath)]
+        try:
+            ids += pd.read_csv(filepath, usecols=['id_empleado'])['id_empleado'].tolist()
+        except FileNotFoundError:
+            pass
+        if ids:
+            max_id = max(ids) if max_id is None else max(max_id, max(ids))
+    return max_id
+
+def siguiente_id(data_dir='data'):
+    """
+    Reserva el siguiente id_empleado con una secuencia persistente
+    (data/.cache/secuencia_ids.json), sin recorrer el talento existente.
+    Solo la primera vez (o si se borra la caché) se inicializa desde los datos.
+    """
+    ruta = os.path.join(data_dir, '.cache', 'secuencia_ids.json')
+    with _bloqueo(ruta + '.lock'):
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                nuevo_id = json.load(f)['siguiente']
+        except (FileNotFoundError, ValueError, KeyError):
+            max_id = _max_id_existente(data_dir)
+            nuevo_id = PRIMER_ID if max_id is None else int(max_id) + 1
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({'siguiente': nuevo_id + 1}, f)
+    return nuevo_id
+
+def registrar_talento(filepath, registro):
+    """
+    Alta de un nuevo talento con coste O(1): asigna un id y añade el registro
+    al journal del CSV. 'registro' usa objetos Python en las columnas literales
+    (dicts/listas). Devuelve el registro completo, listo para aplicarlo como
+    delta al dataset en memoria.
+    """
+    data_dir = os.path.dirname(filepath) or '.'
+    registro = dict(registro)
+    registro['id_empleado'] = siguiente_id(data_dir)
+    registro = {col: registro.get(col) for col in COLUMNAS_TALENTO}
+
+    ruta = ruta_journal(filepath)
+    with _bloqueo(ruta + '.lock'):
+        with open(ruta, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    return registro
+
+def registrar_cambio_talento(data_dir, registro):
+    """
+    Cambio de un talento existente (mismo 'id_empleado'), con coste O(1): se
+    añade el registro completo al journal de cambios. Devuelve el registro,
+    listo para aplicarlo al dataset en memoria.
+    """
+    registro = {col: registro.get(col) for col in COLUMNAS_TALENTO}
+    registro['id_empleado'] = int(registro['id_empleado'])
+    ruta = os.path.join(data_dir, ARCHIVO_CAMBIOS)
+    with _bloqueo(ruta + '.lock'):
+        with open(ruta, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    return registro
+
+def leer_cambios(data_dir):
+    """
+    Último registro de cada persona cambiada (id_empleado -> registro).
+    """
+    try:
+        with open(os.path.join(data_dir, ARCHIVO_CAMBIOS), 'r', encoding='utf-8') as f:
+            registros = [json.loads(linea) for linea in f if linea.strip()]
+    except FileNotFoundError:
+        return {}
+    return {registro['id_empleado']: registro for registro in registros}
+
+def filas_con_cambios(ids, cambios):
+    """
+    Para aplicar 'cambios' a un talento con esos ids: (filas a tomar de
+    talento + registros cambiados, registros a añadir). Cada persona cambiada
+    se toma de su registro nuevo en su misma posición; los ids que no están
+    en el talento se ignoran.
+    """
+    posicion = {emp_id: fila for fila, emp_id in enumerate(ids)}
+    registros = [registro for emp_id, registro in cambios.items() if emp_id in posicion]
+    filas = np.arange(len(ids))
+    for i, registro in enumerate(registros):
+        filas[posicion[registro['id_empleado']]] = len(ids) + i
+    return filas, registros
+
+def compactar_journal(filepath):
+    """
+    Vuelca el journal al final del CSV (sin reescribirlo) y lo vacía.
+    """
+    ruta = ruta_journal(filepath)
+    with _bloqueo(ruta + '.lock'):
+        registros = leer_journal(filepath)
+        if not registros:
+            return 0
+        nuevo = not os.path.exists(filepath)
+        with open(filepath, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            if nuevo:
+                writer.writerow(COLUMNAS_TALENTO)
+            for registro in registros:
+                writer.writerow([
+                    json.dumps(registro[col], ensure_ascii=False) if col in COLUMNAS_LITERALES else registro[col]
+                    for col in COLUMNAS_TALENTO
+                ])
+        os.remove(ruta)
+    return len(registros)
+
+def load_talent_data(filepath):
+    """
+    Carga un CUALQUIER CSV de talento (interno o externo)
+    y convierte las columnas de texto en objetos Python.
+    El parseo se hace una vez y se cachea en Parquet (ver cargar_talento_columnar).
+    Las altas pendientes del journal se añaden al final.
+    """
+    tablas = cargar_talento_columnar(filepath)
+    journal = leer_journal(filepath)
+    if tablas is None:
+        if not journal:
+            # Si no se encuentra el archivo, crea un dataframe vacío
+            print(f"Advertencia: No se encontró {filepath}. Se creará uno vacío en memoria.")
+        df = pd.DataFrame(columns=COLUMNAS_TALENTO)
+    else:
+        df = tablas_a_dataframe(tablas)
+    if journal:
+        df = pd.concat([df, pd.DataFrame(journal, columns=COLUMNAS_TALENTO)], ignore_index=True)
     return df
 
-def load_all_data():
+def load_all_data(data_dir='data', compacto=False):
     """
     Función principal para cargar todo en la app.
     Ahora carga internos y externos y los une.
+    Con compacto=True el talento se devuelve como TalentoCompacto (ver
+    talent_store), construido directamente desde las tablas columnares.
+    Los cambios del journal de cambios se aplican al final. Los journals de
+    altas de más de MAX_BYTES_JOURNAL se compactan antes de leerlos.
     """
-    config = load_json_file('data/org_config.json')
-    vision = load_json_file('data/vision_futura.json')
+    config = load_json_file(os.path.join(data_dir, 'org_config.json'))
+    vision = load_json_file(os.path.join(data_dir, 'vision_futura.json'))
+    cambios = leer_cambios(data_dir)
+    for f in TALENT_FILES:
+        filepath = os.path.join(data_dir, f)
+        try:
+            if os.path.getsize(ruta_journal(filepath)) > MAX_BYTES_JOURNAL:
+                compactar_journal(filepath)
+        except FileNotFoundError:
+            pass
+
+    if compacto:
+        from modules.talent_store import TalentoCompacto
+
+        partes = []
+        for f in TALENT_FILES:
+            filepath = os.path.join(data_dir, f)
+            tablas = cargar_talento_columnar(filepath)
+            journal = leer_journal(filepath)
+            if tablas is not None:
+                partes.append(tablas)
+            elif not journal:
+                print(f"Advertencia: No se encontró {filepath}. Se creará uno vacío en memoria.")
+            if journal:
+                partes.append(tablas_a_partir_de_registros(journal))
+        tablas = concatenar_tablas(partes) if partes else tablas_a_partir_de_registros([])
+        talento = TalentoCompacto.desde_tablas(tablas)
+        if cambios:
+            filas, registros = filas_con_cambios(talento.ids.tolist(), cambios)
+            talento = talento.concatenar(TalentoCompacto.desde_registros(registros, talento.vocabularios)).tomar(filas)
+        return config, vision, talento
     
     # Cargar ambos CSVs de talento
-    internal_df = load_talent_data('data/talento_actual.csv')
-    external_df = load_talent_data('data/candidatos_externos.csv')
+    internal_df, external_df = [load_talent_data(os.path.join(data_dir, f)) for f in TALENT_FILES]
     
     # Unir los dos DataFrames en uno solo
     talent_df = pd.concat([internal_df, external_df], ignore_index=True)
     
-    # Asegurar que el ID sea numérico para poder hacer .max()
+    # Asegurar que el ID sea numérico
     talent_df['id_empleado'] = pd.to_numeric(talent_df['id_empleado'])
+
+    if cambios:
+        filas, registros = filas_con_cambios(talent_df['id_empleado'].tolist(), cambios)
+        talent_df = pd.concat([talent_df, pd.DataFrame(registros, columns=COLUMNAS_TALENTO)],
+                              ignore_index=True).iloc[filas].reset_index(drop=True)
     
-    return config, vision, talent_df
\ No newline at end of file
+    return config, vision, talent_df
@@ -0,0 +1,297 @@
+import os
+import threading
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from modules.data_loader import load_all_data
+from modules.compatibility import CacheScores, calcular_matriz_compatibilidad, construir_indice_responsabilidades
+from modules.kpis import SnapshotKPIs
+from modules.talent_store import ArrayCreciente, TalentoCompacto
+
+# Submatrices de la matriz de scores que crecen con cada candidato nuevo
+COMPONENTES_SCORE = ['total', 'skills', 'responsabilidades', 'ambiciones', 'dedicacion']
+
+class FilasPorId:
+    """
+    id_empleado -> fila de una foto. Todas las fotos comparten el mismo dict
+    (las altas solo añaden claves, sin copiarlo) y cada una oculta las filas
+    que aún no tenía.
+    """
+    __slots__ = ('_filas', 'n')
+
+    def __init__(self, filas, n):
+        self._filas = filas
+        self.n = n
+
+    def __getitem__(self, id_empleado):
+        fila = self._filas[id_empleado]
+        if fila >= self.n:
+            raise KeyError(id_empleado)
+        return fila
+
+    def __contains__(self, id_empleado):
+        return self._filas.get(id_empleado, self.n) < self.n
+
+    def get(self, id_empleado, defecto=None):
+        return self[id_empleado] if id_empleado in self else defecto
+
+# Lo que cambia con cada alta, publicado de una vez (un solo cambio de atributo):
+# quien lea 'estado' una vez ve talento, filas y scores de la misma versión
+EstadoDatos = namedtuple('EstadoDatos', ['talent_df', 'fila_por_id', 'score_matrix', 'version'])
+
+class DatasetTalento:
+    """
+    Estado en memoria de la app: config, visión, talento, lookups, índice
+    TF-IDF, matriz de scores, snapshot de KPIs, brechas,
+    plan de capacidad y analítica por chapter. Se construye una vez y las
+    altas nuevas se aplican como deltas: solo se puntúa la fila nueva contra
+    los roles y se escribe al final de los arrays (ver ArrayCreciente). Los
+    KPIs, las brechas, la capacidad y la analítica (y sus
+    módulos) se construyen la primera vez que se usan.
+    talent_df puede ser un DataFrame o un TalentoCompacto (ver talent_store).
+    'version' sube con cada cambio, para invalidar lo que dependa de los datos.
+    Los lectores concurrentes (p.ej. los endpoints de la API) deben leer
+    'estado' una sola vez y trabajar con esa foto; los KPIs se actualizan en
+    sitio, así que se consultan con kpis_dataframes(), que toma el lock.
+    Con 'cache_scores' (un CacheScores) solo se puntúan los pares que hayan
+    cambiado desde la última carga. Con 'backend_resp' (ver similarity) el
+    componente de responsabilidades usa ese backend, con sus vectores en
+    'dir_vectores'. Con 'ruta_tfidf' el ajuste del TF-IDF se guarda y se
+    reutiliza entre cargas (ver IndiceResponsabilidades).
+    """
+
+    def __init__(self, config, vision, talent_df, cache_scores=None, backend_resp=None, dir_vectores=None,
+                 ruta_tfidf=None):
+        self.config = config
+        self.vision = vision
+        self.roles_lookup = {rol['id']: rol for rol in config['roles']}
+        self.skills_lookup = {skill['id']: skill['nombre'] for skill in config['skills']}
+        if backend_resp is None:
+            self.indice_resp = construir_indice_responsabilidades(talent_df, vision['roles_necesarios'], self.roles_lookup,
+                                                                  ruta_tfidf)
+        else:
+            from modules.similarity import construir_indice_vectorial
+            self.indice_resp = construir_indice_vectorial(backend_resp, talent_df, vision['roles_necesarios'],
+                                                          self.roles_lookup, dir_vectores)
+        self.cache_scores = cache_scores
+        score_matrix = calcular_matriz_compatibilidad(
+            talent_df, vision['roles_necesarios'], self.roles_lookup, self.indice_resp, cache=cache_scores
+        )
+        if cache_scores is not None and cache_scores.modificada:
+            cache_scores.guardar_en_disco()
+        # Los KPIs se construyen en el primer uso (ver propiedades)
+        self._kpis = None
+        self._filas_por_id = {emp_id: fila for fila, emp_id in enumerate(talent_df['id_empleado'].tolist())}
+        fila_por_id = FilasPorId(self._filas_por_id, len(talent_df))
+        # Buffers de la matriz de scores: las altas escriben solo su fila (ver ArrayCreciente)
+        self._crecientes = {clave: ArrayCreciente(score_matrix[clave]) for clave in COMPONENTES_SCORE + ['ids_empleado']}
+        self.estado = EstadoDatos(talent_df, fila_por_id, score_matrix, 0)
+        self._brechas = None
+        self._capacidad = (None, {})
+        self._staffing = (None, {})
+        self._analitica = None
+        # Reentrante: kpis_dataframes() usa las propiedades, que también lo toman
+        self._lock = threading.RLock()
+
+    # Atajos de lectura sobre la foto actual (para usos sin concurrencia, como la app)
+    @property
+    def talent_df(self):
+        return self.estado.talent_df
+
+    @property
+    def fila_por_id(self):
+        return self.estado.fila_por_id
+
+    @property
+    def score_matrix(self):
+        return self.estado.score_matrix
+
+    @property
+    def version(self):
+        return self.estado.version
+
+    @property
+    def kpis(self):
+        with self._lock:
+            if self._kpis is None:
+                self._kpis = SnapshotKPIs(self.talent_df, self.vision, self.score_matrix)
+            return self._kpis
+
+    def kpis_dataframes(self):
+        """
+        DataFrames de KPIs (ver SnapshotKPIs.a_dataframes) del estado actual.
+        """
+        with self._lock:
+            return self.kpis.a_dataframes(self.talent_df)
+
+    def brechas(self):
+        """
+        Matriz de brechas de toda la organización (ver skill_gaps), construida
+        bajo demanda y reconstruida solo si el dataset ha cambiado de versión.
+        """
+        with self._lock:
+            if self._brechas is None or self._brechas[0] != self.version:
+                from modules.skill_gaps import MatrizBrechas
+                self._brechas = (self.version, MatrizBrechas(
+                    self.talent_df, self.vision['roles_necesarios'], self.roles_lookup, self.skills_lookup
+                ))
+            return self._brechas[1]
+
+    def analitica_chapters(self):
+        """
+        Medias, distribución de niveles y plantilla por chapter de los internos
+        (ver chapter_analytics), reconstruida solo si cambia la versión.
+        """
+        with self._lock:
+            if self._analitica is None or self._analitica[0] != self.version:
+                from modules.chapter_analytics import AnaliticaChapters
+                self._analitica = (self.version, AnaliticaChapters(self.talent_df, self.skills_lookup))
+            return self._analitica[1]
+
+    def capacidad(self, horizonte=None, inicio='temprano'):
+        """
+        Plan de capacidad por meses (ver capacity) de los internos, cacheado
+        por versión del dataset. Para simular cambios, usar su copia().
+        """
+        with self._lock:
+            version, planes = self._capacidad
+            if version != self.version:
+                planes = {}
+                self._capacidad = (self.version, planes)
+            if (horizonte, inicio) not in planes:
+                from modules.capacity import PlanCapacidad
+                planes[(horizonte, inicio)] = PlanCapacidad(self.talent_df, self.vision, horizonte, inicio=inicio)
+            return planes[(horizonte, inicio)]
+
+    def plan_staffing(self, incluir_externos=False, considerar_dedicacion_actual=False):
+        """
+        Plan de staffing óptimo (ver staffing) de la foto actual, cacheado por
+        versión del dataset y opciones. Sin 'incluir_externos' solo se asignan
+        internos; con 'considerar_dedicacion_actual' se descuenta la
+        dedicación actual a proyectos de la capacidad de cada persona.
+        """
+        with self._lock:
+            version, planes = self._staffing
+            if version != self.version:
+                planes = {}
+                self._staffing = (self.version, planes)
+            clave = (incluir_externos, considerar_dedicacion_actual)
+            if clave not in planes:
+                from modules.staffing import capacidad_restante, resolver_plan_staffing
+                from modules.talent_store import tipos_talento
+                planes[clave] = resolver_plan_staffing(
+                    self.score_matrix['total'], self.vision['roles_necesarios'],
+                    capacidad_restante(self.talent_df, considerar_dedicacion_actual=considerar_dedicacion_actual),
+                    candidatos=None if incluir_externos else (tipos_talento(self.talent_df) == 'Interno')
+                )
+            return planes[clave]
+
+    def añadir_talento(self, registro):
+        """
+        Aplica un alta (ver data_loader.registrar_talento) al dataset en memoria.
+        Devuelve su fila.
+        """
+        return self.añadir_talentos([registro])[0]
+
+    def añadir_talentos(self, registros):
+        """
+        Aplica varias altas de una vez (una sola versión nueva) y devuelve sus
+        filas. Con el modelo compacto el coste no depende del tamaño del pool:
+        se puntúan las filas nuevas y se escriben al final de cada array.
+        """
+        if not registros:
+            return []
+        with self._lock:
+            # Las filas nuevas se construyen una vez: se puntúan y se unen tal cual al talento
+            if isinstance(self.talent_df, TalentoCompacto):
+                nuevo_df = TalentoCompacto.desde_registros(registros, self.talent_df.vocabularios)
+            else:
+                nuevo_df = pd.DataFrame(registros)
+            filas = [self.indice_resp.añadir_candidato(registro.get('responsabilidades_actuales')) for registro in registros]
+            scores = calcular_matriz_compatibilidad(
+                nuevo_df, self.vision['roles_necesarios'], self.roles_lookup, self.indice_resp, filas_resp=filas,
+                cache=self.cache_scores
+            )
+
+            # No se muta nada de la foto publicada: las filas nuevas se escriben detrás
+            # de sus arrays (sin copiarlos) y la foto nueva se publica de una vez
+            score_matrix = dict(self.score_matrix)
+            for clave in COMPONENTES_SCORE + ['ids_empleado']:
+                self._crecientes[clave] = self._crecientes[clave].añadir(scores[clave])
+                score_matrix[clave] = self._crecientes[clave].array
+
+            if isinstance(self.talent_df, TalentoCompacto):
+                talent_df = self.talent_df.concatenar(nuevo_df)
+            else:
+                talent_df = pd.concat([self.talent_df, nuevo_df], ignore_index=True)
+            for fila, registro in zip(filas, registros):
+                self._filas_por_id[registro['id_empleado']] = fila
+            fila_por_id = FilasPorId(self._filas_por_id, len(talent_df))
+            # Si aún no se han construido, al hacerlo ya incluirán las altas
+            if self._kpis is not None:
+                for i, (fila, registro) in enumerate(zip(filas, registros)):
+                    self._kpis.aplicar_alta(fila, registro, scores['total'][i])
+            self.estado = EstadoDatos(talent_df, fila_por_id, score_matrix, self.version + 1)
+        return filas
+
+    def actualizar_talento(self, registro):
+        """
+        Aplica un cambio de una persona existente (ver
+        data_loader.registrar_cambio_talento) y devuelve su fila, que no
+        cambia. A diferencia de las altas, copia la matriz de scores y el
+        talento (la foto publicada no cambia). Lanza KeyError si el id no existe.
+        """
+        with self._lock:
+            fila = self.fila_por_id[registro['id_empleado']]
+            anterior = self.talent_df.iloc[fila]
+            anterior = {columna: anterior[columna] for columna in ('metadata', 'dedicación_actual')}
+            if isinstance(self.talent_df, TalentoCompacto):
+                nuevo_df = TalentoCompacto.desde_registros([registro], self.talent_df.vocabularios)
+                talent_df = self.talent_df.reemplazar(fila, nuevo_df)
+            else:
+                nuevo_df = pd.DataFrame([registro])
+                filas = np.arange(len(self.talent_df))
+                filas[fila] = len(filas)
+                talent_df = pd.concat([self.talent_df, nuevo_df], ignore_index=True).iloc[filas].reset_index(drop=True)
+            self.indice_resp.actualizar_candidato(fila, registro.get('responsabilidades_actuales'))
+            scores = calcular_matriz_compatibilidad(
+                nuevo_df, self.vision['roles_necesarios'], self.roles_lookup, self.indice_resp, filas_resp=[fila],
+                cache=self.cache_scores
+            )
+
+            score_matrix = dict(self.score_matrix)
+            for clave in COMPONENTES_SCORE:
+                componente = score_matrix[clave].copy()
+                componente[fila] = scores[clave][0]
+                self._crecientes[clave] = ArrayCreciente(componente)
+                score_matrix[clave] = componente
+            if self._kpis is not None:
+                self._kpis.aplicar_cambio(fila, anterior, registro, score_matrix['total'])
+            self.estado = EstadoDatos(talent_df, FilasPorId(self._filas_por_id, len(talent_df)), score_matrix,
+                                      self.version + 1)
+        return fila
+
+def ruta_ajuste_tfidf(data_dir='data'):
+    """
+    Donde se guarda el ajuste del TF-IDF de responsabilidades de una carpeta de datos.
+    """
+    return os.path.join(data_dir, '.cache', 'tfidf.npz')
+
+def cargar_dataset(data_dir='data', compacto=True, cache_scores=False, backend_resp=None):
+    """
+    Carga todos los datos y prepara el estado en memoria. Por defecto el
+    talento se guarda en el modelo compacto (TalentoCompacto).
+    cache_scores=True usa una caché de scores persistida en data/.cache/scores.npz
+    (también se puede pasar un CacheScores ya creado).
+    backend_resp ('tfidf', 'hashing', 'denso' o un BackendSimilitud) cambia el
+    TF-IDF en memoria por ese backend, con los vectores en data/.cache/vectores.
+    El ajuste del TF-IDF se guarda en data/.cache/tfidf.npz, para que al
+    recargar se puntúe igual que en la sesión que recibió las altas.
+    """
+    config, vision, talent_df = load_all_data(data_dir, compacto=compacto)
+    if cache_scores is True:
+        cache_scores = CacheScores(ruta=os.path.join(data_dir, '.cache', 'scores.npz'))
+    elif cache_scores is False:
+        cache_scores = None
+    return DatasetTalento(config, vision, talent_df, cache_scores, backend_resp,
+                          os.path.join(data_dir, '.cache', 'vectores'), ruta_ajuste_tfidf(data_dir))
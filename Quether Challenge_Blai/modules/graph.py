@@ -0,0 +1,141 @@
+import math
+from collections import OrderedDict
+import numpy as np
+import scipy.sparse as sp
+from modules.compatibility import _como_dict
+from modules.instrumentation import instrumentar
+
+# Por encima de este nº de empleados el grafo se agrupa (nivel de detalle)
+MAX_EMPLEADOS_DETALLE = 200
+
+# Nº máximo de HTML de grafos que se guardan en memoria
+MAX_GRAFOS_CACHE = 32
+
+COLOR_EMPLEADO = '#1E90FF' # Azul
+COLOR_HABILIDAD = '#32CD32' # Verde
+COLOR_GRUPO = '#FFA500' # Naranja
+
+_cache_html = OrderedDict()
+
+def construir_adyacencia(display_df, skills_lookup):
+    """
+    Matriz dispersa empleado x skill con los niveles, construida en una sola
+    pasada. Solo se incluyen las skills definidas en skills_lookup.
+    Devuelve (matriz CSR, lista de skill_ids de las columnas).
+    """
+    skill_ids = list(skills_lookup)
+    columna = {skill_id: j for j, skill_id in enumerate(skill_ids)}
+    filas, columnas, niveles = [], [], []
+    for i, habilidades in enumerate(display_df['habilidades']):
+        for skill_id, nivel in _como_dict(habilidades).items():
+            j = columna.get(skill_id)
+            if j is not None:
+                filas.append(i)
+                columnas.append(j)
+                niveles.append(nivel)
+    matriz = sp.csr_matrix((np.array(niveles, dtype=float), (filas, columnas)), shape=(len(display_df), len(skill_ids)))
+    return matriz, skill_ids
+
+def _top_n_por_fila(matriz, top_n):
+    """
+    Deja en cada fila solo sus top_n valores más altos.
+    """
+    matriz = matriz.tocsr(copy=True)
+    for i in range(matriz.shape[0]):
+        inicio, fin = matriz.indptr[i], matriz.indptr[i + 1]
+        if fin - inicio > top_n:
+            valores = matriz.data[inicio:fin]
+            valores[np.argsort(-valores, kind='stable')[top_n:]] = 0
+    matriz.eliminate_zeros()
+    return matriz
+
+def construir_grafo(display_df, skills_lookup, umbral_nivel=4, top_n=None, agrupar_por=None):
+    """
+    Grafo bipartito empleados-skills (networkx).
+    - umbral_nivel: solo hay arista si el nivel es > umbral_nivel.
+    - top_n: máximo de aristas por empleado (o por grupo), las de mayor peso.
+    - agrupar_por: None (un nodo por empleado) o una columna ('chapter',
+      'rol_actual') para agrupar empleados en un nodo por grupo; la arista
+      grupo-skill pesa el nº de miembros que superan el umbral.
+    """
+    import networkx as nx
+
+    matriz, skill_ids = construir_adyacencia(display_df, skills_lookup)
+    fuertes = matriz.multiply(matriz > umbral_nivel).tocsr()
+    G = nx.Graph()
+
+    if agrupar_por is None:
+        nombres = display_df['nombre'].tolist()
+        for nombre, rol in zip(nombres, display_df['rol_actual'].tolist()):
+            G.add_node(nombre, type='empleado', title=rol, color=COLOR_EMPLEADO)
+        en_uso = np.flatnonzero(matriz.getnnz(axis=0))
+        for j in en_uso:
+            G.add_node(skills_lookup[skill_ids[j]], type='habilidad', title=skills_lookup[skill_ids[j]], color=COLOR_HABILIDAD)
+        if top_n:
+            fuertes = _top_n_por_fila(fuertes, top_n)
+        coo = fuertes.tocoo()
+        for i, j, nivel in zip(coo.row.tolist(), coo.col.tolist(), coo.data.tolist()):
+            nivel = int(nivel) if nivel.is_integer() else nivel
+            G.add_edge(nombres[i], skills_lookup[skill_ids[j]], value=nivel/2, title=f"Nivel: {nivel}")
+        return G
+
+    # Nivel de detalle agrupado: una matriz one-hot grupo x empleado
+    grupos, codigos = np.unique(display_df[agrupar_por].fillna('N/A').astype(str).to_numpy(), return_inverse=True)
+    pertenencia = sp.csr_matrix((np.ones(len(codigos)), (codigos, np.arange(len(codigos)))), shape=(len(grupos), len(codigos)))
+    conteos = (pertenencia @ (fuertes > 0).astype(float)).tocsr()
+    sumas = (pertenencia @ fuertes).tocsr()
+    miembros = np.bincount(codigos, minlength=len(grupos))
+    if top_n:
+        conteos = _top_n_por_fila(conteos, top_n)
+
+    for g, grupo in enumerate(grupos):
+        G.add_node(f"{grupo} ({miembros[g]})", type='grupo', title=f"{miembros[g]} empleados", color=COLOR_GRUPO,
+                   size=10 + 5 * math.sqrt(miembros[g]))
+    coo = conteos.tocoo()
+    for g, j, n in zip(coo.row.tolist(), coo.col.tolist(), coo.data.tolist()):
+        skill_name = skills_lookup[skill_ids[j]]
+        if not G.has_node(skill_name):
+            G.add_node(skill_name, type='habilidad', title=skill_name, color=COLOR_HABILIDAD)
+        nivel_medio = sumas[g, j] / n
+        G.add_edge(f"{grupos[g]} ({miembros[g]})", skill_name, value=n,
+                   title=f"{int(n)} personas · Nivel medio: {nivel_medio:.1f}")
+    return G
+
+def modo_detalle(display_df, agrupar_por='auto', filtro='Todos'):
+    """
+    Resuelve el modo 'auto': detalle si hay pocos empleados; si no, se agrupa
+    por chapter (vista 'Todos') o por rol (un chapter concreto).
+    """
+    if agrupar_por != 'auto':
+        return agrupar_por
+    if len(display_df) <= MAX_EMPLEADOS_DETALLE:
+        return None
+    return 'chapter' if filtro == 'Todos' else 'rol_actual'
+
+@instrumentar(filas=lambda display_df, *args, **kwargs: len(display_df))
+def generar_html_grafo(display_df, skills_lookup, clave_cache=None, umbral_nivel=4, top_n=None,
+                       agrupar_por=None, cdn_resources='remote'):
+    """
+    HTML del grafo (pyvis). Si se pasa clave_cache (p.ej. (filtro de chapter,
+    versión del dataset)), el resultado se guarda junto con las opciones y se
+    reutiliza en los reruns siguientes. La física solo se activa en grafos
+    pequeños; los recursos JS se cargan del CDN en vez de ir en línea.
+    """
+    from pyvis.network import Network
+
+    clave = None if clave_cache is None else (clave_cache, umbral_nivel, top_n, agrupar_por, cdn_resources)
+    if clave is not None and clave in _cache_html:
+        _cache_html.move_to_end(clave)
+        return _cache_html[clave]
+
+    G = construir_grafo(display_df, skills_lookup, umbral_nivel, top_n, agrupar_por)
+    net = Network(height='750px', width='100%', bgcolor='#222222', font_color='white', notebook=True, cdn_resources=cdn_resources)
+    net.from_nx(G)
+    net.toggle_physics(G.number_of_nodes() <= MAX_EMPLEADOS_DETALLE)
+    html = net.generate_html()
+
+    if clave is not None:
+        _cache_html[clave] = html
+        while len(_cache_html) > MAX_GRAFOS_CACHE:
+            _cache_html.popitem(last=False)
+    return html
@@ -0,0 +1,245 @@
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Medir también memoria (tracemalloc) desde el arranque. Tiene coste, por eso es opcional.
+MEDIR_MEMORIA = os.getenv('INSTRUMENTACION_MEMORIA', '0') == '1'
+
+# Nº de ejecuciones (reruns) que se guardan en el historial
+MAX_HISTORIAL = 50
+
+class Instrumentacion:
+    """
+    Registro ligero de tiempos por etapa.
+    Cada ejecución del script (rerun de Streamlit o petición de la API) va en
+    su propio hilo, así que las medidas de la ejecución en curso son por hilo;
+    los acumulados (para Prometheus) son globales.
+    Por etapa se guarda: tiempo de pared, nº de llamadas, filas procesadas y,
+    si la medición de memoria está activa, el pico de memoria (tracemalloc).
+    """
+
+    def __init__(self, medir_memoria=MEDIR_MEMORIA):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.acumulado = defaultdict(lambda: {'segundos': 0.0, 'llamadas': 0, 'filas': 0, 'pico_bytes': 0})
+        self.ultimo = {} # etapa -> última duración (segundos)
+        self.historial = []
+        self.medir_memoria = False
+        if medir_memoria:
+            self.activar_memoria()
+
+    def activar_memoria(self, activar=True):
+        if activar and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not activar and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.medir_memoria = activar
+
+    def _ejecucion(self):
+        if not hasattr(self._local, 'ejecucion'):
+            self._local.ejecucion = {'inicio': time.time(), 'etapas': {}}
+            self._local.pila = []
+        return self._local.ejecucion
+
+    def iniciar_ejecucion(self):
+        """
+        Empieza una ejecución nueva (p.ej. al principio de cada rerun) y
+        devuelve la anterior, que queda guardada en el historial.
+        """
+        anterior = getattr(self._local, 'ejecucion', None)
+        if anterior is not None and anterior['etapas']:
+            anterior['duracion'] = time.time() - anterior['inicio']
+            with self._lock:
+                self.historial.append(anterior)
+                del self.historial[:-MAX_HISTORIAL]
+        self._local.ejecucion = {'inicio': time.time(), 'etapas': {}}
+        self._local.pila = []
+        return anterior
+
+    def ejecucion_actual(self):
+        return self._ejecucion()
+
+    def ultima_ejecucion(self):
+        with self._lock:
+            return self.historial[-1] if self.historial else None
+
+    @contextmanager
+    def etapa(self, nombre, filas=None):
+        """
+        Mide un bloque de código: with etapa('kpis', filas=len(df)): ...
+        """
+        ejecucion = self._ejecucion()
+        pila = self._local.pila
+        medir_memoria = self.medir_memoria and tracemalloc.is_tracing()
+        marco = {'pico_hijos': 0}
+        if medir_memoria:
+            memoria_inicial = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        pila.append(marco)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracion = time.perf_counter() - inicio
+            pila.pop()
+            pico = 0
+            if medir_memoria:
+                pico = max(tracemalloc.get_traced_memory()[1], marco['pico_hijos']) - memoria_inicial
+                if pila:
+                    # El reset_peak de esta etapa borra el pico de la etapa padre: se lo pasamos
+                    pila[-1]['pico_hijos'] = max(pila[-1]['pico_hijos'], pico + memoria_inicial)
+            self._registrar(ejecucion, nombre, duracion, filas or 0, max(pico, 0))
+
+    def registrar_medida(self, nombre, segundos, filas=0):
+        """
+        Registra una medida tomada fuera de etapa() (p.ej. en un middleware).
+        """
+        self._registrar(self._ejecucion(), nombre, segundos, filas, 0)
+
+    def _registrar(self, ejecucion, nombre, duracion, filas, pico):
+        medida = ejecucion['etapas'].setdefault(nombre, {'segundos': 0.0, 'llamadas': 0, 'filas': 0, 'pico_bytes': 0})
+        medida['segundos'] += duracion
+        medida['llamadas'] += 1
+        medida['filas'] += filas
+        medida['pico_bytes'] = max(medida['pico_bytes'], pico)
+        with self._lock:
+            total = self.acumulado[nombre]
+            total['segundos'] += duracion
+            total['llamadas'] += 1
+            total['filas'] += filas
+            total['pico_bytes'] = max(total['pico_bytes'], pico)
+            self.ultimo[nombre] = duracion
+
+    def instrumentar(self, nombre=None, filas=None):
+        """
+        Decorador para los puntos de entrada de los módulos. 'filas' es una
+        función opcional que recibe los mismos argumentos que la función
+        decorada y devuelve el nº de filas procesadas. En funciones
+        generadoras (streaming) se mide la iteración completa.
+        """
+        def decorador(funcion):
+            etiqueta = nombre or f"{funcion.__module__.split('.')[-1]}.{funcion.__name__}"
+
+            def contar(args, kwargs):
+                try:
+                    return filas(*args, **kwargs) if filas else None
+                except Exception:
+                    return None
+
+            if inspect.isgeneratorfunction(funcion):
+                @functools.wraps(funcion)
+                def envoltorio_gen(*args, **kwargs):
+                    with self.etapa(etiqueta, contar(args, kwargs)):
+                        yield from funcion(*args, **kwargs)
+                return envoltorio_gen
+
+            @functools.wraps(funcion)
+            def envoltorio(*args, **kwargs):
+                with self.etapa(etiqueta, contar(args, kwargs)):
+                    return funcion(*args, **kwargs)
+            return envoltorio
+        return decorador
+
+    # --- Exportación ---
+
+    def a_json(self, ejecucion=None):
+        ejecucion = ejecucion or self._ejecucion()
+        with self._lock:
+            datos = {'ejecucion': ejecucion, 'acumulado': dict(self.acumulado)}
+        return json.dumps(datos, indent=2, ensure_ascii=False, default=str)
+
+    def a_prometheus(self, prefijo='talent'):
+        """
+        Métricas acumuladas en formato de texto de Prometheus.
+        """
+        with self._lock:
+            acumulado = {k: dict(v) for k, v in self.acumulado.items()}
+            ultimo = dict(self.ultimo)
+        metricas = [
+            ('etapa_segundos_total', 'counter', "Tiempo acumulado por etapa (s).", lambda e: acumulado[e]['segundos']),
+            ('etapa_llamadas_total', 'counter', "Llamadas acumuladas por etapa.", lambda e: acumulado[e]['llamadas']),
+            ('etapa_filas_total', 'counter', "Filas procesadas acumuladas por etapa.", lambda e: acumulado[e]['filas']),
+            ('etapa_ultima_segundos', 'gauge', "Duración de la última llamada (s).", lambda e: ultimo.get(e, 0.0)),
+            ('etapa_pico_memoria_bytes', 'gauge', "Pico de memoria observado por etapa (bytes).", lambda e: acumulado[e]['pico_bytes']),
+        ]
+        lineas = []
+        for nombre, tipo, ayuda, valor in metricas:
+            lineas.append(f"# HELP {prefijo}_{nombre} {ayuda}")
+            lineas.append(f"# TYPE {prefijo}_{nombre} {tipo}")
+            for etapa in sorted(acumulado):
+                etiqueta = etapa.replace('\\', '\\\\').replace('"', '\\"')
+                lineas.append(f'{prefijo}_{nombre}{{etapa="{etiqueta}"}} {valor(etapa)}')
+        return "\n".join(lineas) + "\n"
+
+class ProfilerMuestreo:
+    """
+    Profiler por muestreo bajo demanda: un hilo toma cada 'intervalo'
+    segundos la pila del hilo objetivo y cuenta las pilas más frecuentes.
+    Sin dependencias externas; el formato de pila es el "colapsado" de los
+    flamegraphs (funciones separadas por ';').
+    """
+
+    def __init__(self, intervalo=0.005, hilo_objetivo=None):
+        self.intervalo = intervalo
+        self.hilo_objetivo = hilo_objetivo or threading.get_ident()
+        self.muestras = Counter()
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def _muestrear(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_objetivo)
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if pila:
+                self.muestras[";".join(reversed(pila))] += 1
+
+    def iniciar(self):
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True, name="profiler-muestreo")
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+        return self
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    def pilas_calientes(self, n=20):
+        """
+        Las n pilas más frecuentes como lista de (pila, muestras, fracción).
+        """
+        total = sum(self.muestras.values()) or 1
+        return [(pila, cuenta, cuenta / total) for pila, cuenta in self.muestras.most_common(n)]
+
+    def funciones_calientes(self, n=20):
+        """
+        Tiempo "propio" por función (la hoja de cada pila muestreada).
+        """
+        propias = Counter()
+        for pila, cuenta in self.muestras.items():
+            propias[pila.rsplit(";", 1)[-1]] += cuenta
+        total = sum(propias.values()) or 1
+        return [(funcion, cuenta, cuenta / total) for funcion, cuenta in propias.most_common(n)]
+
+# Instancia compartida por la app, la API y los módulos
+instrumentacion = Instrumentacion()
+etapa = instrumentacion.etapa
+instrumentar = instrumentacion.instrumentar
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from modules.compatibility import _como_dict
+
+def get_strategic_kpis(talent_df, vision_df, roles_lookup, score_matrix):
+    """
+    KPIs del Dashboard Estratégico: talento en riesgo, empleados
+    sobre-asignados, vacíos por rol futuro (mejor score interno) y carga por proyecto.
+    """
+    internal_mask = talent_df['metadata'].apply(lambda x: x.get('tipo', 'Interno') == 'Interno').to_numpy()
+    internal_df = talent_df[internal_mask].copy()
+    riesgo_df = internal_df[internal_df['metadata'].apply(lambda x: x.get('retention_risk') == 'Media')]
+    internal_df['dedicacion_total'] = internal_df['dedicación_actual'].apply(lambda x: sum(x.values()) if isinstance(x, dict) else 0)
+    capacidad_df = internal_df[internal_df['dedicacion_total'] > 95][['nombre', 'rol_actual', 'dedicacion_total']]
+    project_load = defaultdict(int)
+    for projects_dict in internal_df['dedicación_actual']:
+        if isinstance(projects_dict, dict):
+            for project, load in projects_dict.items():
+                project_load[project] += load
+    project_load_df = pd.DataFrame(project_load.items(), columns=['Proyecto', 'Carga Total (%)']).sort_values(by='Carga Total (%)', ascending=False)
+    roles_futuros = vision_df['roles_necesarios']
+    internal_scores = score_matrix['total'][internal_mask]
+    gaps_data = []
+    for j, rol in enumerate(roles_futuros):
+        best_score = max(0, internal_scores[:, j].max()) if len(internal_scores) else 0
+        gaps_data.append({'Rol Futuro': rol['título'], 'Mejor Score (%)': int(best_score)})
+    gaps_df = pd.DataFrame(gaps_data).sort_values(by='Mejor Score (%)', ascending=True)
+    return riesgo_df, capacidad_df, gaps_df, project_load_df
+
+# --- Snapshot Materializado de KPIs ---
+# get_strategic_kpis recalcula todo en cada rerun. El snapshot guarda los
+# agregados una vez por versión del dataset y los mantiene por deltas.
+
+# Umbral de sobre-asignación (% de dedicación total)
+UMBRAL_SOBRE_ASIGNACION = 95
+
+def _es_interno(registro):
+    return _como_dict(registro.get('metadata')).get('tipo', 'Interno') == 'Interno'
+
+class SnapshotKPIs:
+    """
+    KPIs estratégicos materializados: filas en riesgo, sobre-asignados, carga
+    por proyecto y, por rol futuro, el mejor score interno y su candidato.
+    Las altas y cambios de talento actualizan solo los agregados afectados.
+    a_dataframes() devuelve lo mismo que get_strategic_kpis.
+    """
+
+    def __init__(self, talent_df, vision, score_matrix):
+        self.titulos = [rol['título'] for rol in vision['roles_necesarios']]
+        self.internos = []
+        self.riesgo = {} # fila -> None (conjunto ordenado)
+        self.sobre_asignados = {} # fila -> dedicación total
+        self.carga_proyectos = {}
+        self._aportaciones = defaultdict(int) # nº de personas con carga en cada proyecto
+
+        columnas = ['metadata', 'dedicación_actual']
+        for fila, (metadata, dedicacion) in enumerate(zip(*(talent_df[c] for c in columnas))):
+            registro = {'metadata': metadata, 'dedicación_actual': dedicacion}
+            self.internos.append(_es_interno(registro))
+            if self.internos[-1]:
+                self._sumar(fila, registro)
+
+        # Mejor score interno por rol (0 si nadie lo supera, como get_strategic_kpis)
+        n_roles = len(self.titulos)
+        self.mejor_score = np.zeros(n_roles)
+        self.mejor_fila = np.full(n_roles, -1)
+        internos = np.flatnonzero(self.internos)
+        if len(internos) and n_roles:
+            scores = score_matrix['total'][internos]
+            mejores = scores.argmax(axis=0)
+            maximos = scores[mejores, np.arange(n_roles)]
+            supera = maximos > 0
+            self.mejor_score[supera] = maximos[supera]
+            self.mejor_fila[supera] = internos[mejores[supera]]
+        self.version = 0
+        self._dataframes = None
+
+    def _sumar(self, fila, registro, signo=1):
+        metadata = _como_dict(registro.get('metadata'))
+        dedicacion = _como_dict(registro.get('dedicación_actual'))
+        if metadata.get('retention_risk') == 'Media':
+            if signo > 0:
+                self.riesgo[fila] = None
+            else:
+                self.riesgo.pop(fila, None)
+        total = sum(dedicacion.values())
+        if signo > 0 and total > UMBRAL_SOBRE_ASIGNACION:
+            self.sobre_asignados[fila] = total
+        elif signo < 0:
+            self.sobre_asignados.pop(fila, None)
+        for proyecto, carga in dedicacion.items():
+            self.carga_proyectos[proyecto] = self.carga_proyectos.get(proyecto, 0) + signo * carga
+            self._aportaciones[proyecto] += signo
+            if self._aportaciones[proyecto] == 0:
+                del self.carga_proyectos[proyecto], self._aportaciones[proyecto]
+
+    def _invalidar(self):
+        self.version += 1
+        self._dataframes = None
+
+    def aplicar_alta(self, fila, registro, scores_fila):
+        """
+        Nueva persona en 'fila' con sus scores contra cada rol futuro.
+        """
+        self.internos.append(_es_interno(registro))
+        if self.internos[fila]:
+            self._sumar(fila, registro)
+            mejora = scores_fila > self.mejor_score
+            self.mejor_score[mejora] = scores_fila[mejora]
+            self.mejor_fila[mejora] = fila
+        self._invalidar()
+
+    def aplicar_cambio(self, fila, registro_anterior, registro_nuevo, score_total):
+        """
+        Cambio de una persona existente. 'score_total' es la matriz de scores
+        ya actualizada; solo se reescanean los roles cuyo mejor candidato era
+        esta fila y ha empeorado.
+        """
+        if self.internos[fila]:
+            self._sumar(fila, registro_anterior, signo=-1)
+        self.internos[fila] = _es_interno(registro_nuevo)
+        if self.internos[fila]:
+            self._sumar(fila, registro_nuevo)
+
+        scores_fila = score_total[fila] if self.internos[fila] else np.zeros(len(self.titulos))
+        mejora = scores_fila > self.mejor_score
+        self.mejor_score[mejora] = scores_fila[mejora]
+        self.mejor_fila[mejora] = fila
+        empeora = np.flatnonzero((self.mejor_fila == fila) & (scores_fila < self.mejor_score))
+        if len(empeora):
+            internos = np.flatnonzero(self.internos)
+            for j in empeora:
+                columna = score_total[internos, j]
+                k = columna.argmax() if len(internos) else -1
+                if k >= 0 and columna[k] > 0:
+                    self.mejor_score[j], self.mejor_fila[j] = columna[k], internos[k]
+                else:
+                    self.mejor_score[j], self.mejor_fila[j] = 0.0, -1
+        self._invalidar()
+
+    def a_dataframes(self, talent_df):
+        """
+        (riesgo_df, capacidad_df, gaps_df, project_load_df), igual que
+        get_strategic_kpis; se construyen una vez por versión del snapshot.
+        """
+        if self._dataframes is None:
+            riesgo_df = talent_df.iloc[sorted(self.riesgo)]
+            filas_cap = sorted(self.sobre_asignados)
+            capacidad_df = talent_df.iloc[filas_cap][['nombre', 'rol_actual']].assign(
+                dedicacion_total=[self.sobre_asignados[f] for f in filas_cap]
+            )
+            project_load_df = pd.DataFrame(self.carga_proyectos.items(), columns=['Proyecto', 'Carga Total (%)']).sort_values(by='Carga Total (%)', ascending=False)
+            validas = self.mejor_fila >= 0
+            nombres = np.full(len(self.mejor_fila), None, dtype=object)
+            nombres[validas] = np.asarray(talent_df['nombre'].take(self.mejor_fila[validas]))
+            gaps_df = pd.DataFrame({
+                'Rol Futuro': self.titulos,
+                'Mejor Score (%)': self.mejor_score.astype(int),
+                'Mejor Candidato': nombres,
+            }).sort_values(by='Mejor Score (%)', ascending=True)
+            self._dataframes = (riesgo_df, capacidad_df, gaps_df, project_load_df)
+        riesgo_df, capacidad_df, gaps_df, project_load_df = self._dataframes
+        # Copias: el dashboard añade columnas (p.ej. 'Color') a gaps_df
+        return riesgo_df, capacidad_df, gaps_df.copy(), project_load_df
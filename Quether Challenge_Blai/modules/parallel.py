@@ -0,0 +1,260 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import scipy.sparse as sp
+from modules.compatibility import (DEDICACION_POR_MODALIDAD, construir_indice_responsabilidades,
+                                   dedicacion_total, _indices_skills_roles, _niveles_aspiracion, _sumar_skills)
+from modules.instrumentation import instrumentar
+from modules.similarity import IndiceVectorial, similitud_densa
+from modules.staffing import UMBRAL_COBERTURA
+from modules.talent_store import TalentoCompacto, tipos_talento
+
+# --- Scoring Paralelo por Shards ---
+# Reparte los candidatos en shards contiguos entre un pool de procesos. Los
+# arrays de solo lectura (codificación de los roles, skills CSR, vectores
+# TF-IDF, ambiciones y dedicación) se publican una vez en memoria compartida:
+# cada tarea solo recibe su rango de filas. Los vectores de un IndiceVectorial
+# ya están en un fichero memmap: los workers lo abren en vez de copiarlo. Cada shard devuelve su top-K por
+# rol y sus agregados de KPIs, que se combinan en orden de shard (resultado
+# determinista, independiente del orden en que terminen los workers).
+
+TAMANO_SHARD = 20_000
+
+_estado_worker = {}
+
+def _a_memoria_compartida(arrays):
+    """
+    Copia cada array a un bloque de memoria compartida (los np.memmap de
+    fichero no se copian). Devuelve (bloques, descriptor {nombre: (bloque o
+    None, shape, dtype, fichero o None)}).
+    """
+    bloques, descriptor = [], {}
+    for nombre, array in arrays.items():
+        if isinstance(array, np.memmap) and array.filename:
+            descriptor[nombre] = (None, array.shape, array.dtype.str, array.filename)
+            continue
+        array = np.ascontiguousarray(array)
+        bloque = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=bloque.buf)[...] = array
+        bloques.append(bloque)
+        descriptor[nombre] = (bloque.name, array.shape, array.dtype.str, None)
+    return bloques, descriptor
+
+def _inicializar_worker(descriptor):
+    # Una vez por proceso: se enlazan los bloques compartidos (sin copiarlos)
+    _estado_worker.clear()
+    for nombre, (bloque_nombre, shape, dtype, fichero) in descriptor.items():
+        if fichero is not None:
+            _estado_worker[nombre] = np.memmap(fichero, dtype=np.dtype(dtype), mode='r', shape=shape)
+            continue
+        bloque = shared_memory.SharedMemory(name=bloque_nombre)
+        _estado_worker[nombre] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=bloque.buf)
+        _estado_worker['_bloque_' + nombre] = bloque
+
+def _preparar_arrays(talento, roles_futuros, roles_lookup, indice_resp):
+    """
+    Arrays de solo lectura que necesita cada shard.
+    """
+    roles_defs = [roles_lookup.get(rol['id']) for rol in roles_futuros]
+
+    # Skills: columna global de cada código del vocabulario + codificación de los roles
+    indptr, claves, valores, vocabulario = talento.mapa('habilidades')
+    skill_ids = sorted({vocabulario[c] for c in np.unique(claves)})
+    skill_index = {skill_id: j for j, skill_id in enumerate(skill_ids)}
+    columna_por_codigo = np.array([skill_index.get(v, -1) for v in vocabulario] + [-1], dtype=np.intp)
+    indices_roles, n_req = _indices_skills_roles(skill_index, roles_defs, relleno=len(skill_ids))
+
+    # Ambiciones: códigos comunes para niveles de candidatos y roles
+    niveles_emp = _niveles_aspiracion(talento)
+    niveles_rol = [rol_def.get('nivel', 'N/A').lower() if rol_def else '' for rol_def in roles_defs]
+    codigos = {nivel: k for k, nivel in enumerate(sorted(set(niveles_emp) | set(niveles_rol)))}
+
+    if isinstance(indice_resp, IndiceVectorial):
+        resp = {
+            'resp_vectores': indice_resp.almacen.vectores,
+            'resp_filas_cand': indice_resp.filas_candidatos[:len(talento)], 'resp_filas_rol': indice_resp.filas_roles,
+        }
+    else:
+        indice_resp._consolidar()
+        cand, roles = indice_resp.matriz_candidatos, indice_resp.matriz_roles
+        resp = {
+            'resp_data': cand.data, 'resp_indices': cand.indices, 'resp_indptr': cand.indptr,
+            'resp_roles_data': roles.data, 'resp_roles_indices': roles.indices, 'resp_roles_indptr': roles.indptr,
+            'n_terminos': np.array([roles.shape[1]]),
+        }
+    return {
+        'skills_indptr': indptr, 'skills_columnas': columna_por_codigo[claves], 'skills_niveles': valores.astype(float),
+        'n_columnas_skills': np.array([len(skill_ids) + 1]),
+        'roles_indices': indices_roles, 'roles_n_req': n_req,
+        'amb_emp': np.array([codigos[n] for n in niveles_emp], dtype=np.intp),
+        'amb_rol': np.array([codigos[n] for n in niveles_rol], dtype=np.intp),
+        'dedicacion': dedicacion_total(talento),
+        'dedicacion_requerida': np.array([DEDICACION_POR_MODALIDAD.get(rol.get('modalidad', 'FT'), 100) for rol in roles_futuros], dtype=float),
+        **resp,
+        'resp_vacios_cand': indice_resp.candidatos_vacios()[:len(talento)],
+        'resp_vacios_rol': np.array(indice_resp._vacios_rol, dtype=bool),
+        'sin_definicion': np.array([rol_def is None for rol_def in roles_defs], dtype=bool),
+        'internos': tipos_talento(talento) == 'Interno',
+    }
+
+def _puntuar_rango(a, inicio, fin):
+    """
+    Matriz de scores (filas inicio:fin x roles), con las mismas operaciones
+    que calcular_matriz_compatibilidad.
+    """
+    n = fin - inicio
+    indptr = a['skills_indptr']
+    desde, hasta = indptr[inicio], indptr[fin]
+    matriz_niveles = np.zeros((n, int(a['n_columnas_skills'][0])))
+    filas = np.repeat(np.arange(n), np.diff(indptr[inicio:fin + 1]))
+    columnas = a['skills_columnas'][desde:hasta]
+    validas = columnas >= 0
+    matriz_niveles[filas[validas], columnas[validas]] = a['skills_niveles'][desde:hasta][validas]
+    s_skills = _sumar_skills(matriz_niveles, a['roles_indices'], a['roles_n_req'])
+
+    if 'resp_vectores' in a:
+        # Mismo cálculo que IndiceVectorial.similitudes
+        s_resp = similitud_densa(a['resp_vectores'], a['resp_filas_cand'][inicio:fin], a['resp_filas_rol']) * 25
+    else:
+        # Mismo producto disperso que IndiceResponsabilidades.similitudes, sobre las filas del shard
+        n_terminos = int(a['n_terminos'][0])
+        r_indptr = a['resp_indptr'][inicio:fin + 1]
+        vectores = sp.csr_matrix((a['resp_data'][r_indptr[0]:r_indptr[-1]], a['resp_indices'][r_indptr[0]:r_indptr[-1]], r_indptr - r_indptr[0]),
+                                 shape=(n, n_terminos))
+        roles = sp.csr_matrix((a['resp_roles_data'], a['resp_roles_indices'], a['resp_roles_indptr']),
+                              shape=(len(a['resp_roles_indptr']) - 1, n_terminos))
+        s_resp = (vectores @ roles.T).toarray() * 25
+    s_resp[a['resp_vacios_cand'][inicio:fin], :] = 0.0
+    s_resp[:, a['resp_vacios_rol']] = 25.0
+
+    s_amb = np.where(a['amb_emp'][inicio:fin, None] == a['amb_rol'][None, :], 15.0, 0.0)
+    total_ded = a['dedicacion'][inicio:fin, None]
+    requerida = a['dedicacion_requerida'][None, :]
+    s_ded = np.where(total_ded >= requerida, 10.0, (total_ded / requerida) * 10)
+
+    total = s_skills + s_resp + s_amb + s_ded
+    total[:, a['sin_definicion']] = 0.0
+    return total
+
+def _top_k(total, desplazamiento, k):
+    """
+    Top-K de cada rol en el shard: (filas globales, scores), k x roles,
+    ordenado por score desc y fila asc (-1 / -inf si hay menos de k filas).
+    """
+    n, n_roles = total.shape
+    filas = np.full((k, n_roles), -1, dtype=np.int64)
+    scores = np.full((k, n_roles), -np.inf)
+    for j in range(n_roles):
+        orden = np.lexsort((np.arange(n), -total[:, j]))[:k]
+        filas[:len(orden), j] = orden + desplazamiento
+        scores[:len(orden), j] = total[orden, j]
+    return filas, scores
+
+def _procesar_shard(inicio, fin, k, a=None, salida=None):
+    a = _estado_worker if a is None else a
+    total = _puntuar_rango(a, inicio, fin)
+    if salida is not None or 'salida' in a:
+        (a['salida'] if salida is None else salida)[inicio:fin] = total
+    internos = a['internos'][inicio:fin]
+    scores_int = total[internos]
+    mejor_score = np.zeros(total.shape[1])
+    mejor_fila = np.full(total.shape[1], -1, dtype=np.int64)
+    if len(scores_int):
+        mejores = scores_int.argmax(axis=0)
+        maximos = scores_int[mejores, np.arange(total.shape[1])]
+        supera = maximos > 0
+        mejor_score[supera] = maximos[supera]
+        mejor_fila[supera] = np.flatnonzero(internos)[mejores[supera]] + inicio
+    return {
+        'top': _top_k(total, inicio, k),
+        'mejor_score': mejor_score, 'mejor_fila': mejor_fila,
+        'cubiertos': (scores_int >= UMBRAL_COBERTURA).sum(axis=0),
+        'suma': total.sum(axis=0), 'n': fin - inicio,
+    }
+
+def _combinar(resultados, k, n_roles):
+    """
+    Une los resultados de los shards en orden de shard (determinista).
+    """
+    filas = np.concatenate([r['top'][0] for r in resultados]) if resultados else np.zeros((0, n_roles), dtype=np.int64)
+    scores = np.concatenate([r['top'][1] for r in resultados]) if resultados else np.zeros((0, n_roles))
+    top = []
+    for j in range(n_roles):
+        validas = filas[:, j] >= 0
+        f, s = filas[validas, j], scores[validas, j]
+        orden = np.lexsort((f, -s))[:k]
+        top.append(list(zip(f[orden].tolist(), s[orden].tolist())))
+
+    mejor_score, mejor_fila = np.zeros(n_roles), np.full(n_roles, -1, dtype=np.int64)
+    for r in resultados:
+        # Estrictamente mayor: a igualdad gana el shard anterior (fila menor), como argmax
+        mejora = r['mejor_score'] > mejor_score
+        mejor_score[mejora] = r['mejor_score'][mejora]
+        mejor_fila[mejora] = r['mejor_fila'][mejora]
+    n = sum(r['n'] for r in resultados)
+    return {
+        'top': top,
+        'kpis': {
+            'mejor_score_interno': mejor_score, 'mejor_fila_interna': mejor_fila,
+            'internos_cubiertos': sum((r['cubiertos'] for r in resultados), np.zeros(n_roles, dtype=np.int64)),
+            'score_medio': sum((r['suma'] for r in resultados), np.zeros(n_roles)) / n if n else np.zeros(n_roles),
+        },
+    }
+
+@instrumentar(filas=lambda talent_df, *args, **kwargs: len(talent_df))
+def puntuar_en_paralelo(talent_df, roles_futuros, roles_lookup, k=50, n_workers=None, indice_resp=None,
+                        tamano_shard=TAMANO_SHARD, devolver_matriz=False):
+    """
+    Re-ranking de todo el pool repartido en shards sobre un pool de procesos.
+    - n_workers: nº de procesos (por defecto, todos los cores); 1 = serie.
+    - indice_resp: IndiceResponsabilidades o IndiceVectorial de talent_df (se
+      construye un IndiceResponsabilidades si falta).
+    - devolver_matriz: si es True, los workers escriben también la matriz
+      completa de scores (candidato x rol) en memoria compartida.
+    Devuelve {'ids_rol', 'top': {rol: [(fila, score)]}, 'kpis': {...}, 'total'}.
+    Los scores coinciden con calcular_matriz_compatibilidad con el mismo índice.
+    Si el pool de procesos no se puede crear, se ejecuta en serie.
+    """
+    talento = talent_df if isinstance(talent_df, TalentoCompacto) else TalentoCompacto.desde_dataframe(talent_df)
+    if indice_resp is None:
+        indice_resp = construir_indice_responsabilidades(talento, roles_futuros, roles_lookup)
+    n, n_roles = len(talento), len(roles_futuros)
+    n_workers = n_workers or os.cpu_count() or 1
+    arrays = _preparar_arrays(talento, roles_futuros, roles_lookup, indice_resp)
+    rangos = [(inicio, min(inicio + tamano_shard, n)) for inicio in range(0, n, tamano_shard)]
+
+    resultados, total = None, None
+    if n_workers > 1 and len(rangos) > 1:
+        if devolver_matriz:
+            arrays['salida'] = np.zeros((n, n_roles))
+        bloques, descriptor = _a_memoria_compartida(arrays)
+        try:
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(rangos)), initializer=_inicializar_worker, initargs=(descriptor,)) as pool:
+                futuros = [pool.submit(_procesar_shard, inicio, fin, k) for inicio, fin in rangos]
+                resultados = [f.result() for f in futuros]
+            if devolver_matriz:
+                nombre, shape, dtype, _ = descriptor['salida']
+                bloque = next(b for b in bloques if b.name == nombre)
+                total = np.ndarray(shape, dtype=np.dtype(dtype), buffer=bloque.buf).copy()
+        except (OSError, RuntimeError) as e:
+            print(f"Advertencia: no se pudo usar el pool de procesos ({e}); se puntúa en serie.")
+            resultados = None
+        finally:
+            for bloque in bloques:
+                bloque.close()
+                bloque.unlink()
+
+    if resultados is None:
+        salida = np.zeros((n, n_roles)) if devolver_matriz else None
+        resultados = [_procesar_shard(inicio, fin, k, a=arrays, salida=salida) for inicio, fin in rangos]
+        total = salida
+
+    combinado = _combinar(resultados, k, n_roles)
+    ids_rol = [rol['id'] for rol in roles_futuros]
+    return {
+        'ids_rol': ids_rol,
+        'top': dict(zip(ids_rol, combinado['top'])),
+        'kpis': combinado['kpis'],
+        'total': total,
+    }
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+# Bandas de preparación: (nombre, score entero mínimo exclusivo), de mayor a menor
+BANDAS_READINESS = [('READY', 85), ('READY_WITH_SUPPORT', 70), ('NEAR', 50), ('FAR', 25), ('NOT_VIABLE', None)]
+NOMBRES_BANDAS = [nombre for nombre, _ in BANDAS_READINESS]
+
+ORDENES_RANKING = ('score_desc', 'score_asc', 'nombre')
+
+def score_entero(scores):
+    """
+    Parte entera del score tal como se muestra, con el criterio de la tabla
+    original, int(round(score, 2)): 85.996 ("86.00") cuenta como 86.
+    """
+    return np.floor(np.round(np.asarray(scores, dtype=float), 2))
+
+def clasificar_bandas(scores):
+    """
+    Banda de cada score (vectorizado): se compara score_entero con cada umbral.
+    """
+    enteros = score_entero(scores)
+    condiciones = [enteros > minimo for _, minimo in BANDAS_READINESS[:-1]]
+    return np.select(condiciones, NOMBRES_BANDAS[:-1], default=NOMBRES_BANDAS[-1])
+
+def filtrar_ranking(scores, mascara=None, bandas=None):
+    """
+    Filas candidatas del ranking de un rol.
+    - mascara: filas a considerar (p.ej. solo internos).
+    - bandas: lista de bandas a mostrar (por defecto todas).
+    """
+    seleccion = np.ones(len(scores), dtype=bool) if mascara is None else np.asarray(mascara, dtype=bool).copy()
+    if bandas is not None and set(bandas) != set(NOMBRES_BANDAS):
+        seleccion &= np.isin(clasificar_bandas(scores), list(bandas))
+    return np.flatnonzero(seleccion)
+
+def pagina_ranking(scores, filas, nombres=None, orden='score_desc', pagina=0, tamano_pagina=25):
+    """
+    Ordena y pagina en servidor la columna de scores precalculada de un rol.
+    - filas: candidatas ya filtradas (ver filtrar_ranking).
+    - orden: 'score_desc', 'score_asc' o 'nombre' (requiere nombres: array o
+      columna con take(), p.ej. talent_df['nombre']).
+    Devuelve las filas de la página. Para los órdenes por score solo se ordenan
+    las filas hasta el final de la página pedida (argpartition), así el coste
+    no crece con el tamaño del pool.
+    """
+    if orden not in ORDENES_RANKING:
+        raise ValueError(f"Orden no soportado: {orden}")
+    scores = np.asarray(scores, dtype=float)
+    total = len(filas)
+    inicio = pagina * tamano_pagina
+    fin = min(inicio + tamano_pagina, total)
+    if inicio >= total:
+        return np.array([], dtype=np.intp)
+
+    if orden == 'nombre':
+        claves = np.asarray(nombres.take(filas), dtype=object).astype(str)
+        orden_filas = filas[np.lexsort((filas, claves))]
+        return orden_filas[inicio:fin]
+
+    # Desempate estable por fila (mismo criterio que el ranking completo)
+    claves = -scores[filas] if orden == 'score_desc' else scores[filas]
+    if fin < total:
+        frontera = np.partition(claves, fin - 1)[fin - 1]
+        # Se incluyen todos los empates de la frontera para un orden determinista
+        parte = np.flatnonzero(claves <= frontera)
+    else:
+        parte = np.arange(total)
+    orden_filas = parte[np.lexsort((filas[parte], claves[parte]))]
+    return filas[orden_filas[inicio:fin]]
+
+def tabla_pagina(talent_df, filas, scores, tipos):
+    """
+    DataFrame de la página visible (solo se materializan esas filas).
+    """
+    scores_pagina = np.asarray(scores, dtype=float)[filas]
+    return pd.DataFrame({
+        'ID Empleado': np.asarray(talent_df['id_empleado'].take(filas)), 'Nombre': np.asarray(talent_df['nombre'].take(filas)),
+        'Rol Actual': np.asarray(talent_df['rol_actual'].take(filas)), 'Tipo': np.asarray(tipos)[filas],
+        'Compatibilidad': np.round(scores_pagina, 2), 'Banda': clasificar_bandas(scores_pagina)
+    })
@@ -1,53 +1,30 @@
 import os
-from dotenv import load_dotenv
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_groq import ChatGroq
-# Si prefieres OpenAI, cambia la línea de arriba por:
-# from langchain_openai import ChatOpenAI
+import json
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from functools import lru_cache
+from modules.instrumentation import instrumentar
+from modules.skill_gaps import UMBRAL_BRECHA
 
-# Cargar variables de entorno (API key)
-load_dotenv()
+# langchain y dotenv se importan en el primer uso del LLM (ver obtener_llm):
+# importar este módulo (p.ej. para get_skill_gap o los prompts) no los carga.
 
-def get_skill_gap(empleado_skills_dict, rol_skills_list, skills_lookup):
-    """
-    Identifica las habilidades que le faltan al empleado o que necesita mejorar.
-    """
-    gap = []
-    for skill_id in rol_skills_list:
-        nivel_empleado = empleado_skills_dict.get(skill_id, 0)
-        skill_nombre = skills_lookup.get(skill_id, skill_id)
-        
-        # Asumimos que < 7 es una brecha que necesita un plan
-        if nivel_empleado < 7: 
-            gap.append(f"{skill_nombre} (Nivel actual: {nivel_empleado}/10)")
-            
-    return gap if gap else ["Ninguna brecha de habilidad significativa identificada"]
+# Configuración del modelo (compartida por todas las llamadas)
+MODELO_LLM = "llama-3.1-8b-instant"
+TEMPERATURA_LLM = 0.7
 
-def generar_plan_desarrollo(empleado_row, rol_futuro, rol_def, score, skills_lookup):
-    """
-    Genera una narrativa y un plan de desarrollo usando un LLM.
-    """
-    
-    # --- 1. Inicializar el LLM ---
-    # (Asegúrate de tener la API Key en un archivo .env)
-    try:
-        # Usamos Groq porque es gratis y rapidísimo para hackathons
-        llm = ChatGroq(temperature=0.7, model_name="llama-3.1-8b-instant")
-        # Si usas OpenAI:
-        # llm = ChatOpenAI(temperature=0.7, model_name="gpt-3.5-turbo")
-    except Exception as e:
-        return f"Error al inicializar el LLM: {e}. ¿Falta la API Key en el archivo .env?"
+# Caché persistente de respuestas (clave = hash del prompt + ajustes del modelo)
+DIRECTORIO_CACHE_LLM = os.path.join('data', '.cache', 'llm')
 
-    # --- 2. Calcular la brecha de habilidades ---
-    brecha_skills = get_skill_gap(
-        empleado_row['habilidades'], 
-        rol_def.get('habilidades_requeridas', []),
-        skills_lookup
-    )
-    
-    # --- 3. Crear el Prompt Template ---
-    template = """
+# Límites del pipeline por lotes
+MAX_CONCURRENCIA = 5
+MAX_REINTENTOS = 3
+BACKOFF_INICIAL = 1.0 # segundos, se duplica en cada reintento
+
+PLANTILLA_PLAN = """
     Eres un coach de talento experto en Quether.
     
     Analiza al siguiente empleado para un rol futuro:
@@ -67,10 +44,93 @@ def generar_plan_desarrollo(empleado_row, rol_futuro, rol_def, score, skills_loo
     concretas y cuantificables para cerrar la brecha. 
     Usa Markdown para el formato.
     """
+
+PLANTILLA_RESUMEN = """
+    Eres un Consultor de Estrategia de Talento para Quether.
+    Aquí tienes los diagnósticos de la empresa:
+
+    **1. TALENTO EN RIESGO (Riesgo de Fuga 'Media' o 'Alta'):**
+    {riesgo}
+
+    **2. CAPACIDAD DEL EQUIPO (Empleados sobre-asignados > 95%):**
+    {capacidad}
+
+    **3. VACÍOS CRÍTICOS (Roles futuros sin candidato interno > 50%):**
+    {gaps}
+
+    Por favor, escribe una "Narrativa Ejecutiva" de 2 párrafos.
+    En el primer párrafo, resume los 3 problemas clave.
+    En el segundo párrafo, da una recomendación estratégica clara.
+    """
+
+@lru_cache(maxsize=None)
+def obtener_llm(model_name=MODELO_LLM, temperature=TEMPERATURA_LLM):
+    """
+    Cliente LLM compartido (uno por modelo/temperatura), con su pool de
+    conexiones HTTP. Los reintentos los gestiona el pipeline, no el cliente.
+    Para pruebas con un servidor local se puede apuntar GROQ_API_BASE a él.
+    """
+    from dotenv import load_dotenv
+    from langchain_groq import ChatGroq
+    # Si prefieres OpenAI, cambia la línea de arriba por:
+    # from langchain_openai import ChatOpenAI
+
+    # Cargar variables de entorno (API key)
+    load_dotenv()
+    # Usamos Groq porque es gratis y rapidísimo para hackathons
+    return ChatGroq(temperature=temperature, model_name=model_name, max_retries=0)
+    # Si usas OpenAI:
+    # return ChatOpenAI(temperature=temperature, model_name=model_name, max_retries=0)
+
+def _clave_cache(prompt_texto, model_name, temperature):
+    datos = json.dumps({'prompt': prompt_texto, 'model': model_name, 'temperature': temperature}, sort_keys=True)
+    return hashlib.sha256(datos.encode('utf-8')).hexdigest()
+
+def _leer_cache_llm(clave):
+    try:
+        with open(os.path.join(DIRECTORIO_CACHE_LLM, f"{clave}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)['respuesta']
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+def _guardar_cache_llm(clave, respuesta):
+    try:
+        os.makedirs(DIRECTORIO_CACHE_LLM, exist_ok=True)
+        ruta = os.path.join(DIRECTORIO_CACHE_LLM, f"{clave}.json")
+        # Escritura atómica: varias tareas pueden guardar a la vez
+        with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'respuesta': respuesta}, f, ensure_ascii=False)
+        os.replace(ruta + '.tmp', ruta)
+    except OSError as e:
+        print(f"Advertencia: no se pudo guardar la respuesta en caché: {e}")
+
+def get_skill_gap(empleado_skills_dict, rol_skills_list, skills_lookup):
+    """
+    Identifica las habilidades que le faltan al empleado o que necesita mejorar.
+    """
+    gap = []
+    for skill_id in rol_skills_list:
+        nivel_empleado = empleado_skills_dict.get(skill_id, 0)
+        skill_nombre = skills_lookup.get(skill_id, skill_id)
+        
+        # Asumimos que < 7 es una brecha que necesita un plan (ver skill_gaps para toda la organización)
+        if nivel_empleado < UMBRAL_BRECHA: 
+            gap.append(f"{skill_nombre} (Nivel actual: {nivel_empleado}/10)")
+            
+    return gap if gap else ["Ninguna brecha de habilidad significativa identificada"]
+
+def construir_prompt_plan(empleado_row, rol_futuro, rol_def, score, skills_lookup):
+    """
+    Renderiza el prompt del plan de desarrollo para un par (empleado, rol).
+    """
+    # --- 1. Calcular la brecha de habilidades ---
+    brecha_skills = get_skill_gap(
+        empleado_row['habilidades'], 
+        rol_def.get('habilidades_requeridas', []),
+        skills_lookup
+    )
     
-    prompt = PromptTemplate.from_template(template)
-    
-    # --- 4. Preparar los datos para el prompt ---
+    # --- 2. Preparar los datos para el prompt ---
     input_data = {
         "nombre_empleado": empleado_row['nombre'],
         "rol_actual": empleado_row['rol_actual'],
@@ -80,17 +140,93 @@ def generar_plan_desarrollo(empleado_row, rol_futuro, rol_def, score, skills_loo
         "nivel_rol": rol_def.get('nivel', 'N/A'),
         "brecha": ", ".join(brecha_skills)
     }
+    return PLANTILLA_PLAN.format(**input_data) # Mismo resultado que PromptTemplate (formato f-string)
+
+async def _invocar_con_reintentos(llm, prompt_texto, semaforo, reintentos, backoff):
+    """
+    Llama al LLM respetando el límite de concurrencia, con reintentos y
+    backoff exponencial (con jitter).
+    """
+    from langchain_core.output_parsers import StrOutputParser
+    chain = llm | StrOutputParser()
+    for intento in range(reintentos + 1):
+        async with semaforo:
+            try:
+                return await chain.ainvoke(prompt_texto)
+            except Exception as e:
+                if intento == reintentos:
+                    raise e
+        await asyncio.sleep(backoff * (2 ** intento) * (1 + random.random() * 0.1))
+
+async def generar_planes_async(peticiones, skills_lookup, max_concurrencia=MAX_CONCURRENCIA,
+                               reintentos=MAX_REINTENTOS, backoff=BACKOFF_INICIAL, llm=None):
+    """
+    Genera planes de desarrollo para muchos pares a la vez.
+    'peticiones' es una lista de (empleado_row, rol_futuro, rol_def, score).
+    Devuelve los textos en el mismo orden; los fallos se devuelven como
+    mensaje de error (igual que generar_plan_desarrollo) y no se cachean.
+    Las respuestas ya generadas salen de la caché en disco sin llamar al LLM.
+    """
+    if llm is None:
+        try:
+            llm = obtener_llm()
+        except Exception as e:
+            error = f"Error al inicializar el LLM: {e}. ¿Falta la API Key en el archivo .env?"
+            return [error] * len(peticiones)
+    model_name = getattr(llm, 'model_name', MODELO_LLM)
+    temperature = getattr(llm, 'temperature', TEMPERATURA_LLM)
+    semaforo = asyncio.Semaphore(max_concurrencia)
+
+    async def generar_uno(empleado_row, rol_futuro, rol_def, score):
+        prompt_texto = construir_prompt_plan(empleado_row, rol_futuro, rol_def, score, skills_lookup)
+        clave = _clave_cache(prompt_texto, model_name, temperature)
+        respuesta = _leer_cache_llm(clave)
+        if respuesta is not None:
+            return respuesta
+        try:
+            respuesta = await _invocar_con_reintentos(llm, prompt_texto, semaforo, reintentos, backoff)
+        except Exception as e:
+            return f"Error al llamar a la API de IA: {e}"
+        _guardar_cache_llm(clave, respuesta)
+        return respuesta
+
+    return await asyncio.gather(*(generar_uno(*peticion) for peticion in peticiones))
+
+@lru_cache(maxsize=None)
+def _bucle_fondo():
+    """
+    Event loop persistente en un hilo propio. El cliente compartido mantiene
+    su pool de conexiones ligado a un único loop entre llamadas.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True, name="llm-loop").start()
+    return loop
+
+@instrumentar(filas=lambda peticiones, *args, **kwargs: len(peticiones))
+def generar_planes_lote(peticiones, skills_lookup, **kwargs):
+    """
+    Versión síncrona de generar_planes_async (para llamarla desde Streamlit).
+    """
+    futuro = asyncio.run_coroutine_threadsafe(generar_planes_async(peticiones, skills_lookup, **kwargs), _bucle_fondo())
+    return futuro.result()
+
+@instrumentar()
+def generar_plan_desarrollo(empleado_row, rol_futuro, rol_def, score, skills_lookup):
+    """
+    Genera una narrativa y un plan de desarrollo usando un LLM.
+    Usa el cliente compartido y la caché de respuestas del pipeline por lotes.
+    """
+    return generar_planes_lote([(empleado_row, rol_futuro, rol_def, score)], skills_lookup, reintentos=0)[0]
     
-    # --- 5. Crear y ejecutar la cadena (chain) ---
-    # El StrOutputParser() solo devuelve el texto de la respuesta
-    chain = prompt | llm | StrOutputParser()
-    
-    try:
-        response = chain.invoke(input_data)
-        return response
-    except Exception as e:
-        return f"Error al llamar a la API de IA: {e}"
-    
+def construir_prompt_resumen(riesgo_str, capacidad_str, gaps_str):
+    """
+    Renderiza el prompt del resumen ejecutivo.
+    """
+    return PLANTILLA_RESUMEN.format(
+        riesgo=riesgo_str, capacidad=capacidad_str, gaps=gaps_str
+    )
+
+@instrumentar()
 def generar_resumen_ejecutivo(riesgo_str, capacidad_str, gaps_str):
     """
     Genera una narrativa ejecutiva basada en los KPIs de la empresa.
@@ -98,40 +234,83 @@ def generar_resumen_ejecutivo(riesgo_str, capacidad_str, gaps_str):
     
     # --- 1. Inicializar el LLM ---
     try:
-        llm = ChatGroq(temperature=0.7, model_name="llama-3.1-8b-instant")
+        llm = obtener_llm()
     except Exception as e:
         return f"Error al inicializar el LLM: {e}. ¿Falta la API Key en el archivo .env?"
 
-    # --- 2. Crear el Prompt Template ---
-    template = """
-    Eres un Consultor de Estrategia de Talento para Quether.
-    Aquí tienes los diagnósticos de la empresa:
+    # --- 2. Renderizar el prompt y ejecutar ---
+    # El StrOutputParser() solo devuelve el texto de la respuesta
+    from langchain_core.output_parsers import StrOutputParser
+    chain = llm | StrOutputParser()
+    
+    try:
+        response = chain.invoke(construir_prompt_resumen(riesgo_str, capacidad_str, gaps_str))
+        return response
+    except Exception as e:
+        return f"Error al llamar a la API de IA: {e}"
 
-    **1. TALENTO EN RIESGO (Riesgo de Fuga 'Media' o 'Alta'):**
-    {riesgo}
+# --- Streaming ---
+# Variantes que devuelven el texto por trozos a medida que llega, para
+# pintarlo incrementalmente (st.write_stream). Si se pasa un dict en
+# 'metricas', al terminar contiene 'ttft' (segundos hasta el primer trozo) y
+# 'total' (latencia total). 'llm' permite usar un modelo stub en pruebas.
 
-    **2. CAPACIDAD DEL EQUIPO (Empleados sobre-asignados > 95%):**
-    {capacidad}
+def _stream_con_metricas(llm, prompt_texto, metricas):
+    inicio = time.perf_counter()
+    metricas['ttft'] = None
+    from langchain_core.output_parsers import StrOutputParser
+    try:
+        for chunk in (llm | StrOutputParser()).stream(prompt_texto):
+            if metricas['ttft'] is None:
+                metricas['ttft'] = time.perf_counter() - inicio
+            yield chunk
+    finally:
+        metricas['total'] = time.perf_counter() - inicio
 
-    **3. VACÍOS CRÍTICOS (Roles futuros sin candidato interno > 50%):**
-    {gaps}
+@instrumentar()
+def generar_resumen_ejecutivo_stream(riesgo_str, capacidad_str, gaps_str, metricas=None, llm=None):
+    """
+    Versión en streaming de generar_resumen_ejecutivo.
+    """
+    metricas = {} if metricas is None else metricas
+    try:
+        llm = llm or obtener_llm()
+    except Exception as e:
+        yield f"Error al inicializar el LLM: {e}. ¿Falta la API Key en el archivo .env?"
+        return
+    try:
+        yield from _stream_con_metricas(llm, construir_prompt_resumen(riesgo_str, capacidad_str, gaps_str), metricas)
+    except Exception as e:
+        yield f"Error al llamar a la API de IA: {e}"
 
-    Por favor, escribe una "Narrativa Ejecutiva" de 2 párrafos.
-    En el primer párrafo, resume los 3 problemas clave.
-    En el segundo párrafo, da una recomendación estratégica clara.
+@instrumentar()
+def generar_plan_desarrollo_stream(empleado_row, rol_futuro, rol_def, score, skills_lookup, metricas=None, llm=None):
     """
-    
-    prompt = PromptTemplate.from_template(template)
-    
-    # --- 3. Preparar los datos y ejecutar ---
-    chain = prompt | llm | StrOutputParser()
-    
+    Versión en streaming de generar_plan_desarrollo. Comparte la caché de
+    respuestas: un plan ya generado se devuelve de golpe, y uno nuevo se
+    guarda al terminar el stream.
+    """
+    metricas = {} if metricas is None else metricas
     try:
-        response = chain.invoke({
-            "riesgo": riesgo_str,
-            "capacidad": capacidad_str,
-            "gaps": gaps_str
-        })
-        return response
+        llm = llm or obtener_llm()
+    except Exception as e:
+        yield f"Error al inicializar el LLM: {e}. ¿Falta la API Key en el archivo .env?"
+        return
+
+    prompt_texto = construir_prompt_plan(empleado_row, rol_futuro, rol_def, score, skills_lookup)
+    clave = _clave_cache(prompt_texto, getattr(llm, 'model_name', MODELO_LLM), getattr(llm, 'temperature', TEMPERATURA_LLM))
+    respuesta = _leer_cache_llm(clave)
+    if respuesta is not None:
+        metricas.update(ttft=0.0, total=0.0, cache=True)
+        yield respuesta
+        return
+
+    trozos = []
+    try:
+        for chunk in _stream_con_metricas(llm, prompt_texto, metricas):
+            trozos.append(chunk)
+            yield chunk
     except Exception as e:
-        return f"Error al llamar a la API de IA: {e}"
\ No newline at end of file
+        yield f"Error al llamar a la API de IA: {e}"
+        return
+    _guardar_cache_llm(clave, "".join(trozos))
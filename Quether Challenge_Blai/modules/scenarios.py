@@ -0,0 +1,237 @@
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from modules.compatibility import PESOS_COMPONENTES, construir_matriz_habilidades, _como_dict, _matriz_skills
+from modules.ranking import BANDAS_READINESS, score_entero
+
+# Nº de combinaciones de pesos cuya matriz total se guarda (movimientos de slider)
+MAX_TOTALES_CACHE = 8
+
+class Escenario:
+    """
+    Escenario what-if: pesos de los componentes y ediciones de nivel de skills.
+    - pesos: {'skills', 'responsabilidades', 'ambiciones', 'dedicacion'} (se
+      normalizan para sumar 100; por defecto los actuales 50/25/15/10).
+    - ediciones: lista de (id_empleado, skill_id, nivel nuevo).
+    """
+
+    def __init__(self, nombre, pesos=None, ediciones=None):
+        self.nombre = nombre
+        self.pesos = dict(PESOS_COMPONENTES if pesos is None else pesos)
+        self.ediciones = list(ediciones or [])
+
+    def pesos_normalizados(self):
+        suma = sum(self.pesos.values())
+        if suma <= 0:
+            raise ValueError("Los pesos del escenario deben sumar más de 0")
+        return {c: 100 * self.pesos.get(c, 0) / suma for c in PESOS_COMPONENTES}
+
+class MotorEscenarios:
+    """
+    Simulación incremental sobre las submatrices de score del dataset.
+    Los cambios de pesos se resuelven recombinando las cuatro submatrices
+    (normalizadas por su peso base) y las ediciones de skills solo recalculan
+    el componente de skills de las filas editadas, y solo en los roles que
+    piden esas skills. Con los pesos base y sin ediciones el total coincide
+    exactamente con el de calcular_matriz_compatibilidad.
+    """
+
+    def __init__(self, talent_df, score_matrix, roles_futuros, roles_lookup, fila_por_id):
+        self.talent_df = talent_df
+        self.score_matrix = score_matrix
+        self.roles_futuros = roles_futuros
+        self.roles_defs = [roles_lookup.get(rol['id']) for rol in roles_futuros]
+        self.fila_por_id = fila_por_id
+        self.sin_definicion = np.array([rol_def is None for rol_def in self.roles_defs], dtype=bool)
+        # Roles que piden cada skill
+        self.roles_por_skill = {}
+        for j, rol_def in enumerate(self.roles_defs):
+            for skill_id in (rol_def or {}).get('habilidades_requeridas', []):
+                self.roles_por_skill.setdefault(skill_id, set()).add(j)
+        self._totales = OrderedDict()
+        self._stats = OrderedDict()
+
+    @classmethod
+    def desde_dataset(cls, dataset):
+        estado = dataset.estado
+        return cls(estado.talent_df, estado.score_matrix, dataset.vision['roles_necesarios'],
+                   dataset.roles_lookup, estado.fila_por_id)
+
+    def _factores(self, escenario):
+        pesos = escenario.pesos_normalizados()
+        return {c: pesos[c] / PESOS_COMPONENTES[c] for c in PESOS_COMPONENTES}
+
+    def _combinar(self, componentes, factores):
+        # Mismo orden de suma que calcular_matriz_compatibilidad; factor 1 = sin reescalar (exacto)
+        total = None
+        for c in PESOS_COMPONENTES:
+            termino = componentes[c] if factores[c] == 1 else componentes[c] * factores[c]
+            total = termino if total is None else total + termino
+        return total
+
+    def _total_pesos(self, factores):
+        clave = tuple(factores[c] for c in PESOS_COMPONENTES)
+        if clave in self._totales:
+            self._totales.move_to_end(clave)
+            return self._totales[clave]
+        total = self._combinar(self.score_matrix, factores)
+        total[:, self.sin_definicion] = 0.0
+        self._totales[clave] = total
+        while len(self._totales) > MAX_TOTALES_CACHE:
+            self._totales.popitem(last=False)
+        return total
+
+    def _skills_editadas(self, escenario):
+        """
+        {fila: (columnas afectadas, nueva fila del componente de skills)}.
+        """
+        por_fila = {}
+        for id_empleado, skill_id, nivel in escenario.ediciones:
+            if id_empleado not in self.fila_por_id:
+                raise KeyError(f"Empleado no encontrado: {id_empleado}")
+            por_fila.setdefault(self.fila_por_id[id_empleado], {})[skill_id] = nivel
+
+        resultado = {}
+        for fila, cambios in por_fila.items():
+            columnas = sorted(set().union(*(self.roles_por_skill.get(s, set()) for s in cambios)))
+            skills = self.score_matrix['skills'][fila].copy()
+            if columnas:
+                habilidades = dict(_como_dict(self.talent_df.iloc[fila]['habilidades']))
+                habilidades.update(cambios)
+                matriz, skill_index = construir_matriz_habilidades(pd.DataFrame({'habilidades': [habilidades]}))
+                skills[columnas] = _matriz_skills(matriz, skill_index, [self.roles_defs[j] for j in columnas])[0]
+            resultado[fila] = (columnas, skills)
+        return resultado
+
+    def _filas_editadas(self, escenario, factores):
+        """
+        {fila: fila del total del escenario} para las filas con ediciones.
+        """
+        filas = {}
+        for fila, (_, skills) in self._skills_editadas(escenario).items():
+            componentes = {c: self.score_matrix[c][fila] for c in PESOS_COMPONENTES}
+            componentes['skills'] = skills
+            total_fila = self._combinar(componentes, factores)
+            total_fila[self.sin_definicion] = 0.0
+            filas[fila] = total_fila
+        return filas
+
+    def evaluar(self, escenario):
+        """
+        Matriz total (candidato x rol) del escenario. No modifica el dataset;
+        la matriz puede estar compartida con la caché, no se debe modificar.
+        """
+        factores = self._factores(escenario)
+        total = self._total_pesos(factores)
+        editadas = self._filas_editadas(escenario, factores)
+        if not editadas:
+            return total
+        total = total.copy()
+        for fila, total_fila in editadas.items():
+            total[fila] = total_fila
+        return total
+
+    def _estadisticas(self, factores, minimo, candidatos):
+        """
+        Para un juego de pesos (sin ediciones): máscara de 'en banda', nº por
+        rol y mejor candidato por rol. Se cachea: es lo caro de un escenario.
+        """
+        clave = (tuple(factores[c] for c in PESOS_COMPONENTES), minimo,
+                 None if candidatos is None else hash(candidatos.tobytes()))
+        if clave in self._stats:
+            self._stats.move_to_end(clave)
+            return self._stats[clave]
+        total = self._total_pesos(factores)
+        en_banda = score_entero(total) > minimo if minimo is not None else np.ones(total.shape, dtype=bool)
+        if candidatos is not None:
+            en_banda &= candidatos[:, None]
+        filas = np.flatnonzero(candidatos) if candidatos is not None else np.arange(len(total))
+        mejores = filas[total[filas].argmax(axis=0)] if len(filas) else np.full(total.shape[1], -1)
+        stats = {'en_banda': en_banda, 'conteo': en_banda.sum(axis=0), 'mejor_fila': mejores}
+        self._stats[clave] = stats
+        while len(self._stats) > MAX_TOTALES_CACHE:
+            self._stats.popitem(last=False)
+        return stats
+
+    def _en_banda_fila(self, total_fila, minimo):
+        return score_entero(total_fila) > minimo if minimo is not None else np.ones(len(total_fila), dtype=bool)
+
+    def cambios_banda(self, escenario, banda='READY', candidatos=None, base=None):
+        """
+        Pares (persona, rol) que entran o salen de 'banda' (o mejor) respecto a
+        'base' (por defecto, el escenario actual sin cambios).
+        Devuelve un DataFrame con ['id_empleado', 'nombre', 'Rol Futuro',
+        'Score Base', 'Score Escenario', 'Cambio'].
+        """
+        minimo = dict(BANDAS_READINESS)[banda]
+        candidatos = None if candidatos is None else np.asarray(candidatos, dtype=bool)
+        base = base or Escenario('Base')
+        f_base, f_esc = self._factores(base), self._factores(escenario)
+        ed_base, ed_esc = self._filas_editadas(base, f_base), self._filas_editadas(escenario, f_esc)
+        t_base, t_esc = self._total_pesos(f_base), self._total_pesos(f_esc)
+
+        # Con los mismos pesos solo pueden cambiar las filas editadas; si no, se
+        # comparan las máscaras cacheadas de cada juego de pesos
+        if f_base == f_esc:
+            diferencia = np.zeros(t_base.shape, dtype=bool)
+        else:
+            diferencia = self._estadisticas(f_base, minimo, candidatos)['en_banda'] != self._estadisticas(f_esc, minimo, candidatos)['en_banda']
+        for fila in set(ed_base) | set(ed_esc):
+            if candidatos is None or candidatos[fila]:
+                diferencia[fila] = (self._en_banda_fila(ed_base.get(fila, t_base[fila]), minimo)
+                                    != self._en_banda_fila(ed_esc.get(fila, t_esc[fila]), minimo))
+
+        filas, roles = np.nonzero(diferencia)
+        score_base = np.array([ed_base[f][j] if f in ed_base else t_base[f, j] for f, j in zip(filas, roles)])
+        score_esc = np.array([ed_esc[f][j] if f in ed_esc else t_esc[f, j] for f, j in zip(filas, roles)])
+        return pd.DataFrame({
+            'id_empleado': np.asarray(self.talent_df['id_empleado'].take(filas)),
+            'nombre': np.asarray(self.talent_df['nombre'].take(filas)),
+            'Rol Futuro': [self.roles_futuros[j]['título'] for j in roles],
+            'Score Base': score_base.round(2),
+            'Score Escenario': score_esc.round(2),
+            'Cambio': np.where(self._en_banda_fila(score_esc, minimo), f"Entra en {banda}", f"Sale de {banda}"),
+        })
+
+    def comparar(self, escenarios, banda='READY', candidatos=None):
+        """
+        Comparativa por rol de varios escenarios: nº de personas en 'banda'
+        (o mejor) y mejor candidato de cada uno.
+        """
+        minimo = dict(BANDAS_READINESS)[banda]
+        candidatos = None if candidatos is None else np.asarray(candidatos, dtype=bool)
+        nombres = self.talent_df['nombre']
+        n_roles = len(self.roles_futuros)
+        tabla = pd.DataFrame({'Rol Futuro': [rol['título'] for rol in self.roles_futuros]})
+        for escenario in escenarios:
+            factores = self._factores(escenario)
+            total = self._total_pesos(factores)
+            stats = self._estadisticas(factores, minimo, candidatos)
+            conteo, mejor_fila = stats['conteo'].copy(), stats['mejor_fila'].copy()
+            editadas = {f: t for f, t in self._filas_editadas(escenario, factores).items() if candidatos is None or candidatos[f]}
+
+            def valor(fila, j):
+                return editadas[fila][j] if fila in editadas else total[fila, j]
+
+            for fila, total_fila in editadas.items():
+                conteo += self._en_banda_fila(total_fila, minimo).astype(int) - stats['en_banda'][fila]
+            for j in range(n_roles):
+                if mejor_fila[j] in editadas:
+                    # El mejor ha cambiado: se reescanea solo esta columna
+                    columna = total[:, j].copy()
+                    for fila, total_fila in editadas.items():
+                        columna[fila] = total_fila[j]
+                    if candidatos is not None:
+                        columna[~candidatos] = -np.inf
+                    mejor_fila[j] = columna.argmax()
+                else:
+                    for fila in editadas:
+                        if (valor(fila, j), -fila) > (valor(mejor_fila[j], j), -mejor_fila[j]):
+                            mejor_fila[j] = fila
+            tabla[f"{escenario.nombre}: Nº {banda}"] = conteo
+            validos = mejor_fila >= 0
+            nombres_mejores = np.full(n_roles, None, dtype=object)
+            nombres_mejores[validos] = np.asarray(nombres.take(mejor_fila[validos]), dtype=object)
+            tabla[f"{escenario.nombre}: Mejor"] = [f"{n} ({valor(f, j):.1f})" if f >= 0 else None
+                                                   for j, (f, n) in enumerate(zip(mejor_fila, nombres_mejores))]
+        return tabla
@@ -0,0 +1,485 @@
+import glob
+import json
+import os
+import numpy as np
+from modules.compatibility import (_como_lista, _exportar_tfidf, _guardar_ajuste, _hash_valores, _huella_corpus,
+                                  _huella_json, _Huellas, _leer_ajuste, _tfidf_guardado)
+from modules.data_loader import _bloqueo
+from modules.instrumentation import instrumentar
+
+# --- Backends de Similitud de Responsabilidades ---
+# Cada backend convierte textos en vectores float32 normalizados (L2), así
+# que la similitud es un producto escalar. Los vectores se guardan en un
+# AlmacenVectores indexado por la huella del texto: solo se calculan los de
+# textos nuevos o cambiados, y el fichero se lee con memmap (varios procesos
+# comparten la misma copia a través de la caché de páginas del sistema).
+# Los backends que se ajustan al corpus (tfidf, denso sin modelo) guardan su
+# ajuste junto al almacén y lo reutilizan en las cargas siguientes (mismas
+# reglas de reajuste que IndiceResponsabilidades), así que también con ellos
+# solo se vectorizan los textos nuevos y un alta puntúa igual que tras recargar.
+# scikit-learn se importa al ajustar/vectorizar, no al cargar el módulo.
+
+VERSION_ALMACEN = 1
+# Filas por lote al calcular similitudes (acota la copia a float64)
+LOTE_SIMILITUD = 8192
+
+class BackendSimilitud:
+    """
+    Interfaz de los backends.
+    - ajustable: si los vectores dependen del corpus (p.ej. el IDF); en ese
+      caso hay que llamar a ajustar(docs) (o cargar_ajuste) antes de vectorizar.
+    - exportar_ajuste() / cargar_ajuste(arrays): el ajuste como dict de
+      arrays de numpy, para guardarlo y restaurarlo sin reajustar.
+    - parametros(): lo que identifica los vectores (entra en la huella).
+    - vectorizar(docs): matriz float32 (docs x dim) con filas de norma 1 (o 0).
+    """
+    nombre = None
+    ajustable = False
+
+    def parametros(self):
+        return {}
+
+    def ajustar(self, docs):
+        return self
+
+    def exportar_ajuste(self):
+        return {}
+
+    def cargar_ajuste(self, ajuste):
+        return self
+
+    def vectorizar(self, docs):
+        raise NotImplementedError
+
+def _normalizar(vectores):
+    vectores = np.asarray(vectores, dtype=np.float32)
+    normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+    return np.divide(vectores, normas, out=np.zeros_like(vectores), where=normas > 0)
+
+class BackendTfidf(BackendSimilitud):
+    """
+    TF-IDF con vocabulario e IDF del corpus (el de IndiceResponsabilidades,
+    pero en vectores densos float32). El almacén guarda cada texto como una
+    fila densa de 4 bytes por término, así que el vocabulario se limita a los
+    'max_terminos' términos más frecuentes (16 KB por texto con 4096). Con
+    un corpus de más términos los scores dejan de ser idénticos a los de
+    IndiceResponsabilidades, que usa el vocabulario completo en disperso.
+    """
+    nombre = 'tfidf'
+    ajustable = True
+
+    def __init__(self, max_terminos=4096):
+        self.max_terminos = max_terminos
+        self._vectorizer = None
+
+    def parametros(self):
+        return {'max_terminos': self.max_terminos}
+
+    def ajustar(self, docs):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self._vectorizer = TfidfVectorizer(dtype=np.float32, max_features=self.max_terminos)
+        try:
+            self._vectorizer.fit(docs)
+        except ValueError:
+            # Vocabulario vacío: todos los vectores son 0
+            self._vectorizer = None
+        return self
+
+    def exportar_ajuste(self):
+        return _exportar_tfidf(self._vectorizer)
+
+    def cargar_ajuste(self, ajuste):
+        self._vectorizer = _tfidf_guardado(ajuste, dtype=np.float32)
+        return self
+
+    def vectorizar(self, docs):
+        if self._vectorizer is None:
+            return np.zeros((len(docs), 1), dtype=np.float32)
+        return self._vectorizer.transform(docs).toarray().astype(np.float32)
+
+class BackendHashing(BackendSimilitud):
+    """
+    N-gramas de caracteres proyectados con hashing a 'dim' columnas. No
+    depende del corpus: un texto siempre tiene el mismo vector, y tolera
+    variantes de las palabras (plurales, tildes, erratas).
+    """
+    nombre = 'hashing'
+
+    def __init__(self, dim=512, ngramas=(3, 5)):
+        self.dim = dim
+        self.ngramas = tuple(ngramas)
+
+    def parametros(self):
+        return {'dim': self.dim, 'ngramas': list(self.ngramas)}
+
+    def vectorizar(self, docs):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        vectorizer = HashingVectorizer(analyzer='char_wb', ngram_range=self.ngramas, n_features=self.dim,
+                                       alternate_sign=False, norm=None, dtype=np.float32)
+        return _normalizar(vectorizer.transform(docs).toarray())
+
+class BackendDenso(BackendSimilitud):
+    """
+    Embeddings densos calculados en local.
+    - Sin 'modelo': LSA (TF-IDF + SVD truncada a 'dim' componentes) ajustado
+      sobre el corpus; captura sinónimos que aparecen en contextos parecidos.
+    - Con 'modelo': carpeta local de un modelo de sentence-transformers
+      (opcional, no se descarga nada).
+    """
+    nombre = 'denso'
+
+    def __init__(self, dim=64, modelo=None):
+        if modelo is not None and not os.path.isdir(modelo):
+            raise ValueError(f"El modelo de embeddings debe ser una carpeta local: {modelo}")
+        self.dim = dim
+        self.modelo = modelo
+        self.ajustable = modelo is None
+        self._tfidf = self._componentes = self._encoder = None
+
+    def parametros(self):
+        return {'dim': self.dim, 'modelo': os.path.basename(os.path.normpath(self.modelo)) if self.modelo else None}
+
+    def ajustar(self, docs):
+        if self.modelo is not None:
+            return self
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self._tfidf, self._componentes = TfidfVectorizer(sublinear_tf=True, dtype=np.float32), None
+        try:
+            matriz = self._tfidf.fit_transform(docs)
+        except ValueError:
+            self._tfidf = None
+            return self
+        componentes = min(self.dim, matriz.shape[1] - 1)
+        if componentes >= 1:
+            self._componentes = TruncatedSVD(n_components=componentes, random_state=0).fit(matriz).components_
+        return self
+
+    def exportar_ajuste(self):
+        ajuste = _exportar_tfidf(self._tfidf)
+        ajuste['componentes'] = self._componentes if self._componentes is not None else np.zeros((0, 0), dtype=np.float32)
+        return ajuste
+
+    def cargar_ajuste(self, ajuste):
+        if self.modelo is None:
+            self._tfidf = _tfidf_guardado(ajuste, sublinear_tf=True, dtype=np.float32)
+            self._componentes = ajuste['componentes'] if ajuste['componentes'].size else None
+        return self
+
+    def vectorizar(self, docs):
+        if self.modelo is not None:
+            if self._encoder is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise ImportError("El backend denso con 'modelo' necesita sentence-transformers instalado") from e
+                self._encoder = SentenceTransformer(self.modelo, device='cpu')
+            return _normalizar(self._encoder.encode(list(docs), batch_size=256, show_progress_bar=False))
+        if self._tfidf is None:
+            return np.zeros((len(docs), 1), dtype=np.float32)
+        matriz = self._tfidf.transform(docs)
+        # Proyección de la SVD (lo mismo que TruncatedSVD.transform)
+        return _normalizar(matriz @ self._componentes.T if self._componentes is not None else matriz.toarray())
+
+BACKENDS = {'tfidf': BackendTfidf, 'hashing': BackendHashing, 'denso': BackendDenso}
+
+def crear_backend(nombre, **opciones):
+    """
+    Backend por nombre ('tfidf', 'hashing' o 'denso') con sus opciones.
+    """
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend de similitud desconocido: {nombre} (disponibles: {', '.join(BACKENDS)})")
+    return BACKENDS[nombre](**opciones)
+
+# --- Almacén de Vectores (memmap) ---
+
+class AlmacenVectores:
+    """
+    Vectores float32 indexados por la huella (uint64) de su texto. Con
+    'directorio' se guardan en <prefijo>.f32 (filas contiguas, solo se añade
+    al final) + <prefijo>.npz (huellas y dimensión) y se leen con memmap; sin
+    directorio viven en memoria. Las altas de varios procesos se serializan
+    con un bloqueo de archivo.
+    """
+
+    def __init__(self, directorio, prefijo):
+        self.directorio = directorio
+        self.ruta = os.path.join(directorio, prefijo) if directorio else None
+        self.calculados = self.reutilizados = 0
+        self._huellas = _Huellas(np.zeros(0, dtype=np.uint64))
+        self._dim = None
+        self._vectores = None
+        if self.ruta:
+            self._leer()
+
+    def __len__(self):
+        return len(self._huellas.valores)
+
+    @property
+    def vectores(self):
+        """
+        Matriz (filas x dim); en disco es un np.memmap de solo lectura.
+        """
+        if self._vectores is None or len(self._vectores) != len(self):
+            if self.ruta and len(self):
+                self._vectores = np.memmap(self.ruta + '.f32', dtype=np.float32, mode='r', shape=(len(self), self._dim))
+            elif self._vectores is None:
+                self._vectores = np.zeros((0, self._dim or 1), dtype=np.float32)
+        return self._vectores
+
+    def filas(self, huellas):
+        """
+        Fila de cada huella en el almacén (-1 si no está).
+        """
+        posiciones = self._huellas.posiciones(huellas)
+        return np.arange(len(huellas)) if posiciones is None else posiciones
+
+    def asegurar(self, huellas, docs, vectorizar):
+        """
+        Devuelve la fila de cada documento, calculando con vectorizar(docs)
+        solo los que no estén guardados (cada texto distinto una sola vez).
+        """
+        faltan = self.filas(huellas) < 0
+        if faltan.any():
+            if self.ruta:
+                with _bloqueo(self.ruta + '.lock'):
+                    self._leer() # Otro proceso puede haberlos añadido ya
+                    self._añadir(huellas, docs, vectorizar)
+            else:
+                self._añadir(huellas, docs, vectorizar)
+        filas = self.filas(huellas)
+        self.reutilizados += int((~faltan).sum())
+        return filas
+
+    def _añadir(self, huellas, docs, vectorizar):
+        faltan = np.flatnonzero(self.filas(huellas) < 0)
+        if not len(faltan):
+            return
+        _, primeras = np.unique(huellas[faltan], return_index=True)
+        nuevas = faltan[np.sort(primeras)]
+        vectores = np.ascontiguousarray(vectorizar([docs[i] for i in nuevas]), dtype=np.float32)
+        if self._dim is not None and vectores.shape[1] != self._dim:
+            raise ValueError(f"Dimensión de vectores inconsistente: {vectores.shape[1]} (almacén: {self._dim})")
+        self._dim = vectores.shape[1]
+        huellas_unidas = np.concatenate([self._huellas.valores, huellas[nuevas]])
+        if self.ruta:
+            with open(self.ruta + '.f32', 'r+b' if os.path.exists(self.ruta + '.f32') else 'wb') as f:
+                # Se descarta lo que hubiera tras la última fila registrada (escritura interrumpida)
+                f.truncate(len(self) * self._dim * 4)
+                f.seek(0, os.SEEK_END)
+                f.write(vectores.tobytes())
+            # El índice se publica después de los datos: un lector nunca ve filas sin escribir
+            temporal = f"{self.ruta}.{os.getpid()}.tmp.npz"
+            np.savez(temporal, huellas=huellas_unidas,
+                     manifiesto=np.array(json.dumps({'version': VERSION_ALMACEN, 'dim': self._dim})))
+            os.replace(temporal, self.ruta + '.npz')
+        else:
+            self._vectores = np.concatenate([self.vectores, vectores]) if len(self) else vectores
+        self._huellas = _Huellas(huellas_unidas)
+        self.calculados += len(nuevas)
+
+    def _leer(self):
+        try:
+            with np.load(self.ruta + '.npz') as datos:
+                manifiesto = json.loads(str(datos['manifiesto']))
+                if manifiesto.get('version') != VERSION_ALMACEN:
+                    return
+                huellas = datos['huellas']
+            if os.path.getsize(self.ruta + '.f32') < len(huellas) * manifiesto['dim'] * 4:
+                raise ValueError("fichero de vectores incompleto")
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Advertencia: almacén de vectores ilegible ({e}); se recalcula.")
+            return
+        if len(huellas) != len(self):
+            self._huellas, self._dim = _Huellas(huellas), manifiesto['dim']
+
+    def estadisticas(self):
+        return {'vectores': len(self), 'dim': self._dim, 'calculados': self.calculados,
+                'reutilizados': self.reutilizados, 'ruta': self.ruta}
+
+# --- Índice de Responsabilidades sobre un Backend ---
+
+def similitud_densa(vectores, filas_a, filas_b):
+    """
+    Coseno (0 a 1) entre las filas 'filas_a' y 'filas_b' de una matriz de
+    vectores normalizados. Se recorta a [0, 1]: los embeddings densos pueden
+    dar cosenos negativos y el redondeo en float32, algo más de 1.
+    Se usa einsum y no BLAS: cada coseno sale igual se calcule para un
+    subconjunto de filas (shards, re-ranking) o para todas.
+    """
+    filas_a = np.asarray(filas_a, dtype=np.intp)
+    b = np.asarray(vectores[filas_b], dtype=np.float64)
+    salida = np.empty((len(filas_a), len(b)))
+    for inicio in range(0, len(filas_a), LOTE_SIMILITUD):
+        a = np.asarray(vectores[filas_a[inicio:inicio + LOTE_SIMILITUD]], dtype=np.float64)
+        salida[inicio:inicio + len(a)] = np.einsum('ij,kj->ik', a, b)
+    return np.clip(salida, 0.0, 1.0, out=salida)
+
+class IndiceVectorial:
+    """
+    Mismo uso que IndiceResponsabilidades (scores, similitudes,
+    añadir_candidato, candidatos_vacios, huella) con los vectores de un
+    BackendSimilitud guardados en un AlmacenVectores. Si el almacén ya tiene
+    los vectores de todos los textos, el backend no llega a ajustarse.
+    Con 'directorio', un backend ajustable guarda su ajuste en
+    <backend>-<parámetros>.ajuste.npz y el almacén se nombra con la huella de
+    ese ajuste; al reajustar se crea un almacén nuevo y se borran los del
+    ajuste anterior.
+    """
+
+    def __init__(self, backend, listas_candidatos, listas_roles, directorio=None):
+        self.backend = backend
+        self._vacios_cand = [not l for l in listas_candidatos]
+        self._vacios_rol = [not l for l in listas_roles]
+        docs_cand = [" ".join(l) for l in listas_candidatos]
+        docs_rol = [" ".join(l) for l in listas_roles]
+        self._directorio = directorio
+        self._prefijo_backend = f"{backend.nombre}-{_huella_json([backend.nombre, backend.parametros()]):016x}"
+        self._ajustado = not backend.ajustable
+        self._ajuste = None
+        if backend.ajustable:
+            # Un backend ajustable da vectores distintos con otro ajuste: va en la huella y en el almacén
+            self._ruta_ajuste = os.path.join(directorio, self._prefijo_backend + '.ajuste.npz') if directorio else None
+            self._huella_roles = _huella_json(docs_rol)
+            self._ajuste = _leer_ajuste(self._ruta_ajuste, self._huella_roles, len(docs_cand))
+            huella_ajuste = self._ajuste['huella'] if self._ajuste is not None else _huella_corpus(docs_cand, docs_rol)
+            prefijo = f"{self._prefijo_backend}-{huella_ajuste:016x}"
+        else:
+            huella_ajuste, prefijo = 0, self._prefijo_backend
+        self._huella_ajuste = huella_ajuste
+        self.huella = _huella_json([backend.nombre, backend.parametros()]) ^ huella_ajuste
+        self.almacen = AlmacenVectores(directorio, prefijo)
+        self._corpus = docs_cand + docs_rol # Hasta que el backend se ajuste (o ya no haga falta)
+        self._n_candidatos = len(docs_cand)
+        self._filas_cand = self._filas_rol = None
+        self._pendientes = []
+
+    def _vectorizar(self, docs):
+        if not self._ajustado:
+            if self._ajuste is not None:
+                self.backend.cargar_ajuste(self._ajuste)
+                self._ajuste = None
+            else:
+                self.backend.ajustar(self._corpus)
+                _guardar_ajuste(self._ruta_ajuste, self._huella_ajuste, self._huella_roles, self._n_candidatos,
+                                self.backend.exportar_ajuste())
+                self._borrar_almacenes_antiguos()
+            self._ajustado = True
+        return self.backend.vectorizar(docs)
+
+    def _borrar_almacenes_antiguos(self):
+        """
+        Borra los almacenes de ajustes anteriores de este backend (con los
+        mismos parámetros): sus vectores ya no se van a leer.
+        """
+        if not self._directorio:
+            return
+        actual = os.path.basename(self.almacen.ruta) + '.'
+        for ruta in glob.glob(os.path.join(self._directorio, glob.escape(self._prefijo_backend) + '-*')):
+            if not os.path.basename(ruta).startswith(actual):
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+    def _filas_almacen(self, docs):
+        return self.almacen.asegurar(_hash_valores(docs), docs, self._vectorizar)
+
+    def ajustar(self):
+        """
+        Calcula (o lee del almacén) los vectores de todos los documentos.
+        Devuelve el propio índice.
+        """
+        if self._filas_cand is None:
+            filas = self._filas_almacen(self._corpus)
+            n = len(self._vacios_cand) - len(self._pendientes)
+            self._filas_cand, self._filas_rol = filas[:n], filas[n:]
+        if self._pendientes:
+            self._filas_cand = np.concatenate([self._filas_cand, self._filas_almacen(self._pendientes)])
+            self._pendientes = []
+        if self._ajustado or self._ajuste is not None:
+            self._corpus = None # Ya no hace falta para ajustar
+        return self
+
+    def añadir_candidato(self, lista_resp):
+        """
+        Añade un candidato nuevo y devuelve su fila en el índice (su vector se
+        calcula cuando se necesite, si no estaba ya en el almacén).
+        """
+        lista_resp = _como_lista(lista_resp)
+        self._pendientes.append(" ".join(lista_resp))
+        self._vacios_cand.append(not lista_resp)
+        return len(self._vacios_cand) - 1
+
+    def actualizar_candidato(self, fila, lista_resp):
+        """
+        Cambia las responsabilidades del candidato de 'fila'.
+        """
+        lista_resp = _como_lista(lista_resp)
+        self.ajustar()
+        filas_cand = self._filas_cand.copy()
+        filas_cand[fila] = self._filas_almacen([" ".join(lista_resp)])[0]
+        self._filas_cand = filas_cand
+        self._vacios_cand[fila] = not lista_resp
+
+    @property
+    def filas_candidatos(self):
+        return self.ajustar()._filas_cand
+
+    @property
+    def filas_roles(self):
+        return self.ajustar()._filas_rol
+
+    def similitudes(self, filas=None, roles=None):
+        """
+        Similitud coseno (0 a 1) de los candidatos (todos, o solo 'filas') con
+        cada rol (todos, o solo las columnas 'roles').
+        """
+        self.ajustar()
+        filas_cand = self._filas_cand if filas is None else self._filas_cand[filas]
+        filas_rol = self._filas_rol if roles is None else self._filas_rol[roles]
+        return similitud_densa(self.almacen.vectores, filas_cand, filas_rol)
+
+    def scores(self, filas=None, roles=None):
+        """
+        Score de responsabilidades (25%) con las mismas reglas que score_responsibilities
+        para listas vacías.
+        """
+        scores = self.similitudes(filas, roles) * 25
+        if filas is None:
+            vacios_cand = np.array(self._vacios_cand, dtype=bool)
+        else: # Sin convertir la lista entera: con una alta se consulta una fila
+            vacios_cand = np.array([self._vacios_cand[f] for f in np.ravel(filas).tolist()], dtype=bool)
+        vacios_rol = np.array(self._vacios_rol, dtype=bool)
+        if roles is not None:
+            vacios_rol = vacios_rol[roles]
+        scores[vacios_cand, :] = 0.0
+        scores[:, vacios_rol] = 25.0
+        return scores
+
+    def candidatos_vacios(self):
+        """
+        Máscara de los candidatos sin responsabilidades (score de responsabilidades 0).
+        """
+        return np.array(self._vacios_cand, dtype=bool)
+
+@instrumentar(filas=lambda backend, talent_df, *args, **kwargs: len(talent_df))
+def construir_indice_vectorial(backend, talent_df, roles_futuros, roles_lookup, directorio=None):
+    """
+    Crea un IndiceVectorial con las filas de talent_df y las columnas en el
+    orden de roles_futuros. 'backend' puede ser un BackendSimilitud o su
+    nombre; con 'directorio' los vectores se guardan allí (memmap).
+    """
+    if isinstance(backend, str):
+        backend = crear_backend(backend)
+    listas_candidatos = [_como_lista(r) for r in talent_df['responsabilidades_actuales']]
+    listas_roles = []
+    for rol in roles_futuros:
+        rol_def = roles_lookup.get(rol['id'])
+        listas_roles.append(rol_def.get('responsabilidades', []) if rol_def else [])
+    return IndiceVectorial(backend, listas_candidatos, listas_roles, directorio)
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from modules.compatibility import construir_matriz_habilidades
+from modules.instrumentation import instrumentar
+
+# --- Matriz de Brechas de Habilidades (toda la organización) ---
+# Misma regla que get_skill_gap: una skill requerida por el rol es brecha si
+# el nivel del empleado es < UMBRAL_BRECHA (0 si no la tiene). El tensor
+# empleado x rol x skill no se materializa: es puntos[e, s] * requisitos[s, j],
+# con 'puntos' = niveles que faltan hasta el umbral.
+
+UMBRAL_BRECHA = 7
+
+class MatrizBrechas:
+    """
+    Brechas empleado x rol x skill en forma factorizada, calculadas en una
+    sola pasada vectorizada. Los agregados (bloqueos por skill, puntos por
+    chapter, ruta más barata por rol) se cachean por conjunto de candidatos;
+    el objeto entero se reconstruye cuando cambia la versión del dataset.
+    """
+
+    @instrumentar('brechas.construir')
+    def __init__(self, talent_df, roles_futuros, roles_lookup, skills_lookup):
+        self.talent_df = talent_df
+        self.roles_futuros = roles_futuros
+        self.skills_lookup = skills_lookup
+        roles_defs = [roles_lookup.get(rol['id']) or {} for rol in roles_futuros]
+        # Lista de skills de cada rol en su orden (como la recorre get_skill_gap)
+        self.skills_rol = [list(rol_def.get('habilidades_requeridas', [])) for rol_def in roles_defs]
+        self.skill_ids = sorted({s for skills in self.skills_rol for s in skills})
+        niveles, skill_index = construir_matriz_habilidades(talent_df, self.skill_ids)
+        self.niveles = niveles[:, :-1]
+        self.puntos = np.where(self.niveles < UMBRAL_BRECHA, UMBRAL_BRECHA - self.niveles, 0.0)
+        self.columnas_rol = [np.array([skill_index[s] for s in skills], dtype=np.intp) for skills in self.skills_rol]
+
+        # requisitos[s, j] = veces que el rol j pide la skill s
+        filas = np.concatenate(self.columnas_rol) if self.columnas_rol else np.array([], dtype=np.intp)
+        columnas = np.repeat(np.arange(len(roles_futuros)), [len(c) for c in self.columnas_rol])
+        self.requisitos = sp.csr_matrix((np.ones(len(filas)), (filas, columnas)), shape=(len(self.skill_ids), len(roles_futuros)))
+        self._agregados = {}
+
+    def _filas(self, candidatos):
+        return np.arange(len(self.puntos)) if candidatos is None else np.flatnonzero(np.asarray(candidatos, dtype=bool))
+
+    def _cacheado(self, nombre, candidatos, calcular):
+        clave = (nombre, None if candidatos is None else hash(np.asarray(candidatos, dtype=bool).tobytes()))
+        if clave not in self._agregados:
+            self._agregados[clave] = calcular(self._filas(candidatos))
+        return self._agregados[clave]
+
+    def tensor_disperso(self, candidatos=None, roles=None):
+        """
+        Forma dispersa (COO) del tensor: un registro por (empleado, rol, skill)
+        con brecha, en el mismo orden que get_skill_gap dentro de cada par.
+        - roles: ids de rol a incluir (por defecto, todos).
+        Devuelve un DataFrame con ['fila', 'id_empleado', 'rol', 'skill_id',
+        'nivel_actual', 'puntos'] ('rol' y 'skill_id' categóricas). A escala de
+        toda la organización puede tener decenas de millones de filas: para
+        agregados, mejor los métodos de abajo.
+        """
+        filas = self._filas(candidatos)
+        ids_rol = [rol['id'] for rol in self.roles_futuros]
+        incluidos = range(len(ids_rol)) if roles is None else [ids_rol.index(r) for r in roles]
+        trozos = []
+        for j in incluidos:
+            columnas = self.columnas_rol[j]
+            if not len(columnas):
+                continue
+            f, c = np.nonzero(self.puntos[np.ix_(filas, columnas)] > 0)
+            trozos.append((filas[f].astype(np.int32), np.full(len(f), j, dtype=np.int32), columnas[c].astype(np.int32)))
+        f, j, c = (np.concatenate(partes) for partes in zip(*trozos)) if trozos else (np.array([], dtype=np.int32),) * 3
+        orden = np.lexsort((j, f))
+        f, j, c = f[orden], j[orden], c[orden]
+        return pd.DataFrame({
+            'fila': f,
+            'id_empleado': np.asarray(self.talent_df['id_empleado'].take(f)),
+            'rol': pd.Categorical.from_codes(j, categories=ids_rol),
+            'skill_id': pd.Categorical.from_codes(c, categories=self.skill_ids),
+            'nivel_actual': self.niveles[f, c].astype(np.float32),
+            'puntos': self.puntos[f, c].astype(np.float32),
+        })
+
+    def bloqueos_por_skill(self, candidatos=None):
+        """
+        Skills que bloquean más pares (candidato, rol): personas con brecha en
+        la skill x roles que la piden.
+        """
+        def calcular(filas):
+            con_brecha = (self.puntos[filas] > 0).sum(axis=0)
+            roles_que_la_piden = np.asarray(self.requisitos.sum(axis=1)).ravel()
+            df = pd.DataFrame({
+                'skill_id': self.skill_ids,
+                'Skill': [self.skills_lookup.get(s, s) for s in self.skill_ids],
+                'Personas con Brecha': con_brecha,
+                'Roles que la Piden': roles_que_la_piden.astype(int),
+                'Pares Bloqueados': (con_brecha * roles_que_la_piden).astype(int),
+                'Puntos a Cerrar': self.puntos[filas].sum(axis=0),
+            })
+            return df.sort_values(['Pares Bloqueados', 'Puntos a Cerrar'], ascending=False, kind='stable').reset_index(drop=True)
+        return self._cacheado('bloqueos', candidatos, calcular)
+
+    def puntos_por_chapter(self, candidatos=None):
+        """
+        Niveles totales que faltan por chapter y skill (cada persona cuenta una
+        vez por skill, aunque la pidan varios roles). Incluye 'Personas' y 'Total'.
+        """
+        def calcular(filas):
+            chapters = np.asarray(self.talent_df['chapter'].take(filas), dtype=object)
+            codigos, nombres = pd.factorize(pd.Series(chapters).fillna('Sin chapter'))
+            pertenencia = sp.csr_matrix((np.ones(len(filas)), (codigos, np.arange(len(filas)))), shape=(len(nombres), len(filas)))
+            puntos = pertenencia @ self.puntos[filas]
+            df = pd.DataFrame(puntos, index=pd.Index(nombres, name='chapter'), columns=[self.skills_lookup.get(s, s) for s in self.skill_ids])
+            df.insert(0, 'Total', puntos.sum(axis=1))
+            df.insert(0, 'Personas', np.bincount(codigos, minlength=len(nombres)))
+            return df.sort_values('Total', ascending=False, kind='stable')
+        return self._cacheado('chapters', candidatos, calcular)
+
+    def ruta_mas_barata(self, candidatos=None):
+        """
+        Por rol futuro, el candidato al que le faltan menos niveles para cerrar
+        todas sus brechas (empate: primera fila) y las skills a formar, de
+        menor a mayor esfuerzo.
+        """
+        def calcular(filas):
+            # coste[e, j] = niveles que le faltan al candidato e para el rol j
+            coste = np.asarray(self.puntos[filas] @ self.requisitos)
+            ids = np.asarray(self.talent_df['id_empleado'].take(filas))
+            nombres = np.asarray(self.talent_df['nombre'].take(filas), dtype=object)
+            resultado = []
+            for j, rol in enumerate(self.roles_futuros):
+                registro = {'Rol Futuro': rol['título'], 'id_empleado': None, 'Nombre': None,
+                            'Puntos a Cerrar': None, 'Skills a Formar': 0, 'Ruta': ''}
+                if len(filas) and len(self.columnas_rol[j]):
+                    i = int(coste[:, j].argmin())
+                    fila = filas[i]
+                    pasos = sorted((self.puntos[fila, c], c) for c in np.unique(self.columnas_rol[j]) if self.puntos[fila, c] > 0)
+                    registro.update({
+                        'id_empleado': int(ids[i]),
+                        'Nombre': nombres[i],
+                        'Puntos a Cerrar': float(coste[i, j]),
+                        'Skills a Formar': len(pasos),
+                        'Ruta': ' → '.join(f"{self.skills_lookup.get(self.skill_ids[c], self.skill_ids[c])} ({self.niveles[fila, c]:g}→{UMBRAL_BRECHA})"
+                                           for _, c in pasos),
+                    })
+                resultado.append(registro)
+            return pd.DataFrame(resultado)
+        return self._cacheado('rutas', candidatos, calcular)
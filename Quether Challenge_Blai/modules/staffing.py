@@ -0,0 +1,92 @@
+import math
+import numpy as np
+from modules.compatibility import DEDICACION_POR_MODALIDAD, dedicacion_total
+
+# Score mínimo para considerar cubierta una plaza (mismo umbral que los "Vacíos Críticos")
+UMBRAL_COBERTURA = 50.0
+
+def capacidad_restante(talent_df, capacidad_maxima=100, considerar_dedicacion_actual=True):
+    """
+    Capacidad libre (%) de cada persona: capacidad_maxima menos la suma de su dedicación actual.
+    """
+    if not considerar_dedicacion_actual:
+        return np.full(len(talent_df), float(capacidad_maxima))
+    return np.maximum(0.0, capacidad_maxima - dedicacion_total(talent_df))
+
+def expandir_plazas(roles_futuros):
+    """
+    Una columna por plaza: 'cantidad' redondeada hacia arriba (0.5 -> 1 plaza).
+    Devuelve (columna de rol de cada plaza, dedicación requerida de cada plaza).
+    """
+    plaza_rol, plaza_dedicacion = [], []
+    for j, rol in enumerate(roles_futuros):
+        plazas = max(0, math.ceil(rol.get('cantidad', 1)))
+        plaza_rol += [j] * plazas
+        plaza_dedicacion += [DEDICACION_POR_MODALIDAD.get(rol.get('modalidad', 'FT'), 100)] * plazas
+    return np.array(plaza_rol, dtype=np.intp), np.array(plaza_dedicacion, dtype=float)
+
+def resolver_plan_staffing(score_total, roles_futuros, capacidad, candidatos=None, umbral=UMBRAL_COBERTURA):
+    """
+    Plan de staffing globalmente óptimo (algoritmo húngaro).
+    Cada persona ocupa como mucho una plaza y solo si su capacidad libre
+    cubre la dedicación de la modalidad del rol y su score llega al umbral.
+    Se maximiza primero el número de plazas cubiertas y, a igualdad, la suma
+    de scores.
+
+    - score_total: matriz candidato x rol (ver calcular_matriz_compatibilidad).
+    - capacidad: capacidad libre de cada candidato (ver capacidad_restante).
+    - candidatos: máscara o índices de las filas a considerar (por defecto todas).
+
+    Devuelve un dict con las asignaciones (fila, columna de rol, score), las
+    plazas cubiertas por rol, la lista de roles con vacíos reales y
+    'sin_capacidad' (ningún candidato tiene capacidad libre para ninguna plaza).
+    """
+    filas = np.arange(score_total.shape[0])
+    if candidatos is not None:
+        filas = filas[candidatos]
+    plaza_rol, plaza_dedicacion = expandir_plazas(roles_futuros)
+    n_plazas = len(plaza_rol)
+
+    asignaciones = []
+    sin_capacidad = bool(n_plazas and len(filas)) and not (capacidad[filas] >= plaza_dedicacion.min()).any()
+    if n_plazas and len(filas):
+        # Elegibilidad candidato x rol (score y capacidad para la modalidad)
+        dedicacion_rol = np.array([DEDICACION_POR_MODALIDAD.get(r.get('modalidad', 'FT'), 100) for r in roles_futuros], dtype=float)
+        scores = score_total[filas]
+        elegible = (scores >= umbral) & (capacidad[filas][:, None] >= dedicacion_rol[None, :])
+
+        # Poda: la solución óptima solo usa, para cada rol, sus n_plazas mejores candidatos elegibles
+        ponderado = np.where(elegible, scores, -np.inf)
+        if len(filas) > n_plazas:
+            top = np.argpartition(-ponderado, n_plazas - 1, axis=0)[:n_plazas]
+            utiles = np.unique(top[np.isfinite(np.take_along_axis(ponderado, top, axis=0))])
+        else:
+            utiles = np.flatnonzero(elegible.any(axis=1))
+
+        if len(utiles):
+            # Peso = bono por plaza cubierta + score (0 = no asignable)
+            bono = 100.0 * n_plazas + 1
+            sub = ponderado[utiles][:, plaza_rol]
+            pesos = np.where(np.isfinite(sub), sub + bono, 0.0)
+            from scipy.optimize import linear_sum_assignment # Solo al resolver (scipy.optimize tarda en importarse)
+            fila_idx, plaza_idx = linear_sum_assignment(pesos, maximize=True)
+            for i, p in zip(fila_idx, plaza_idx):
+                if pesos[i, p] > 0:
+                    fila = int(filas[utiles[i]])
+                    asignaciones.append((fila, int(plaza_rol[p]), float(score_total[fila, plaza_rol[p]])))
+
+    cubiertas = np.zeros(len(roles_futuros), dtype=int)
+    for _, j, _ in asignaciones:
+        cubiertas[j] += 1
+    plazas_por_rol = np.bincount(plaza_rol, minlength=len(roles_futuros))
+    vacios = [
+        {'rol': rol['título'], 'plazas': int(plazas_por_rol[j]), 'cubiertas': int(cubiertas[j])}
+        for j, rol in enumerate(roles_futuros) if cubiertas[j] < plazas_por_rol[j]
+    ]
+    return {
+        'asignaciones': sorted(asignaciones, key=lambda a: (a[1], -a[2])),
+        'cubiertas': cubiertas,
+        'plazas': plazas_por_rol,
+        'vacios': vacios,
+        'sin_capacidad': sin_capacidad,
+    }
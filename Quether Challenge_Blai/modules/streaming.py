@@ -0,0 +1,235 @@
+import argparse
+import heapq
+import io
+import itertools
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from modules.compatibility import calcular_matriz_compatibilidad, construir_indice_responsabilidades
+from modules.data_loader import OPCIONES_CSV, load_all_data, load_json_file, parsear_talento_columnar
+from modules.dataset import ruta_ajuste_tfidf
+from modules.instrumentation import etapa
+from modules.ranking import NOMBRES_BANDAS, clasificar_bandas
+from modules.staffing import UMBRAL_COBERTURA
+from modules.talent_store import TalentoCompacto
+
+# --- Scoring en Streaming de Archivos de Candidatos ---
+# Para ficheros de sourcing externo que no caben en memoria: se leen por
+# chunks, se parsean las columnas literales de cada chunk, se puntúan contra
+# todos los roles futuros y solo se guarda un heap top-K por rol y
+# estadísticas agregadas. Responsabilidades se puntúa con el ajuste TF-IDF de
+# la organización (el mismo que la app y la API), así que los scores y los
+# rankings coinciden con los del dashboard. El estado se puede guardar en un checkpoint JSON
+# para reanudar tras una interrupción: guarda el byte donde acaba el último
+# chunk, y al reanudar se salta hasta ahí con seek (sin releer lo procesado).
+#
+# Uso (desde la carpeta de la app):
+#     python -m modules.streaming data/candidatos_externos.csv --k 50 --checkpoint /tmp/externos.ckpt.json
+
+TAMANO_CHUNK = 50_000
+VERSION_CHECKPOINT = 2
+
+def indice_organizacion(data_dir, config, vision):
+    """
+    IndiceResponsabilidades del talento de 'data_dir' con su ajuste TF-IDF
+    guardado (si aún no existe, se ajusta y se guarda, como al cargar la app).
+    """
+    _, _, talento = load_all_data(data_dir, compacto=True)
+    roles_lookup = {rol['id']: rol for rol in config['roles']}
+    return construir_indice_responsabilidades(talento, vision['roles_necesarios'], roles_lookup, ruta_ajuste_tfidf(data_dir))
+
+def _estado_inicial(roles_futuros):
+    return {
+        'filas_procesadas': 0,
+        'byte': 0, # Donde empieza el siguiente chunk (0 = tras la cabecera)
+        'segundos': 0.0,
+        # Por rol: heap de (score, -fila, id_empleado, nombre); la raíz es el peor del top K
+        'heaps': {rol['id']: [] for rol in roles_futuros},
+        'estadisticas': {
+            rol['id']: {'n': 0, 'suma': 0.0, 'suma_cuadrados': 0.0, 'min': None, 'max': None,
+                        'cubiertos': 0, 'bandas': {banda: 0 for banda in NOMBRES_BANDAS}}
+            for rol in roles_futuros
+        },
+    }
+
+def _firma_archivo(filepath):
+    stat = os.stat(filepath)
+    return {'archivo': os.path.abspath(filepath), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _leer_checkpoint(ruta, firma, k):
+    """
+    Estado guardado si el checkpoint corresponde al mismo archivo y K; si no, None.
+    """
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if checkpoint.get('version') != VERSION_CHECKPOINT or checkpoint.get('firma') != firma or checkpoint.get('k') != k:
+        print(f"Advertencia: el checkpoint {ruta} es de otro archivo o configuración; se empieza de cero.")
+        return None
+    estado = checkpoint['estado']
+    estado['heaps'] = {rol: [tuple(e) for e in heap] for rol, heap in estado['heaps'].items()}
+    return estado
+
+def _guardar_checkpoint(ruta, firma, k, estado):
+    # Escritura atómica: un corte a mitad nunca deja un checkpoint corrupto
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump({'version': VERSION_CHECKPOINT, 'firma': firma, 'k': k, 'estado': estado}, f, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+def _chunks_csv(filepath, tamano_chunk, desde=0):
+    """
+    Lee el CSV por chunks de 'tamano_chunk' registros empezando en el byte
+    'desde' (0 = primer registro) y devuelve (DataFrame, byte donde acaba).
+    Un registro puede ocupar varias líneas si tiene saltos entre comillas.
+    """
+    with open(filepath, 'rb') as f:
+        cabecera = f.readline()
+        if desde:
+            f.seek(desde)
+        while True:
+            lineas, comillas = [], 0
+            while len(lineas) < tamano_chunk or comillas % 2:
+                linea = f.readline()
+                if not linea:
+                    break
+                lineas.append(linea)
+                comillas += linea.count(b'"')
+            if not lineas:
+                return
+            if not lineas[-1].endswith(b'\n'):
+                lineas[-1] += b'\n'
+            chunk = pd.read_csv(io.BytesIO(cabecera + b''.join(lineas)), **OPCIONES_CSV)
+            if len(chunk):
+                yield chunk, f.tell()
+
+def _acumular_chunk(estado, talento, total, ids_rol, desplazamiento, k):
+    """
+    Actualiza heaps y estadísticas con la matriz de scores (chunk x rol) de un chunk.
+    """
+    n = total.shape[0]
+    ids = talento['id_empleado'].to_numpy()
+    nombres = talento['nombre']
+    for j, rol_id in enumerate(ids_rol):
+        columna = total[:, j]
+        stats = estado['estadisticas'][rol_id]
+        stats['n'] += n
+        stats['suma'] += float(columna.sum())
+        stats['suma_cuadrados'] += float(np.square(columna).sum())
+        stats['min'] = float(columna.min()) if stats['min'] is None else min(stats['min'], float(columna.min()))
+        stats['max'] = float(columna.max()) if stats['max'] is None else max(stats['max'], float(columna.max()))
+        stats['cubiertos'] += int((columna >= UMBRAL_COBERTURA).sum())
+        bandas, conteos = np.unique(clasificar_bandas(columna), return_counts=True)
+        for banda, conteo in zip(bandas.tolist(), conteos.tolist()):
+            stats['bandas'][banda] += conteo
+
+        # Solo los k mejores del chunk (más los empates con el k-ésimo) pueden entrar en el top K global
+        heap = estado['heaps'][rol_id]
+        candidatas = np.flatnonzero(columna >= -np.partition(-columna, k - 1)[k - 1]) if n > k else np.arange(n)
+        for fila in candidatas.tolist():
+            entrada = (float(columna[fila]), -(desplazamiento + fila))
+            if len(heap) < k:
+                heapq.heappush(heap, entrada + (int(ids[fila]), nombres[fila]))
+            elif entrada > heap[0][:2]:
+                heapq.heapreplace(heap, entrada + (int(ids[fila]), nombres[fila]))
+
+def _resumen(estado, roles_futuros):
+    top, estadisticas = {}, {}
+    for rol in roles_futuros:
+        rol_id = rol['id']
+        top[rol_id] = [
+            {'fila': -fila_neg, 'id_empleado': emp_id, 'nombre': nombre, 'score': round(score, 2)}
+            for score, fila_neg, emp_id, nombre in sorted(estado['heaps'][rol_id], reverse=True)
+        ]
+        stats = estado['estadisticas'][rol_id]
+        n = stats['n']
+        media = stats['suma'] / n if n else 0.0
+        varianza = max(0.0, stats['suma_cuadrados'] / n - media ** 2) if n else 0.0
+        estadisticas[rol_id] = {
+            'n': n, 'media': round(media, 2), 'desviacion': round(varianza ** 0.5, 2),
+            'min': stats['min'], 'max': stats['max'], 'cubiertos': stats['cubiertos'], 'bandas': stats['bandas'],
+        }
+    segundos = estado['segundos']
+    return {
+        'filas': estado['filas_procesadas'],
+        'segundos': round(segundos, 3),
+        'filas_por_segundo': round(estado['filas_procesadas'] / segundos, 1) if segundos > 0 else None,
+        'top': top,
+        'estadisticas': estadisticas,
+    }
+
+def puntuar_archivo_streaming(filepath, config, vision, k=50, tamano_chunk=TAMANO_CHUNK, checkpoint=None, max_chunks=None,
+                              data_dir='data', indice_resp=None):
+    """
+    Puntúa un CSV de candidatos (mismo formato que candidatos_externos.csv)
+    contra todos los roles futuros sin cargarlo entero en memoria.
+    - k: tamaño del top por rol.
+    - checkpoint: ruta de un JSON donde se guarda el progreso tras cada chunk;
+      si ya existe (mismo archivo y k), se reanuda desde ahí.
+    - max_chunks: procesa como mucho este nº de chunks (útil para trocear el trabajo).
+    Responsabilidades usa el TF-IDF global de la organización de 'data_dir'
+    (ver indice_organizacion), o 'indice_resp' si se pasa: cada chunk se
+    transforma con ese ajuste sin reajustarlo, así que el score de cada fila
+    es el de la app y no depende del resto del archivo.
+    Devuelve {'filas', 'segundos', 'filas_por_segundo', 'top', 'estadisticas'}.
+    """
+    roles_futuros = vision['roles_necesarios']
+    roles_lookup = {rol['id']: rol for rol in config['roles']}
+    ids_rol = [rol['id'] for rol in roles_futuros]
+    if indice_resp is None:
+        indice_resp = indice_organizacion(data_dir, config, vision)
+    # Con otro ajuste los scores cambian: el checkpoint solo vale para el mismo
+    firma = dict(_firma_archivo(filepath), ajuste=indice_resp.huella)
+
+    estado = _leer_checkpoint(checkpoint, firma, k) if checkpoint else None
+    if estado is None:
+        estado = _estado_inicial(roles_futuros)
+    elif estado['filas_procesadas']:
+        print(f"Reanudando {filepath} desde la fila {estado['filas_procesadas']}")
+
+    # Las filas ya procesadas no se vuelven a leer: se salta a su byte final
+    for chunk, fin in itertools.islice(_chunks_csv(filepath, tamano_chunk, estado['byte']), max_chunks):
+        inicio = time.perf_counter()
+        with etapa('streaming.chunk', filas=len(chunk)):
+            talento = TalentoCompacto.desde_tablas(parsear_talento_columnar(chunk))
+            # Las filas del chunk entran en el índice solo mientras se puntúan
+            desde = len(indice_resp.candidatos_vacios())
+            filas_resp = np.array([indice_resp.añadir_candidato(r) for r in talento['responsabilidades_actuales']], dtype=np.intp)
+            total = calcular_matriz_compatibilidad(talento, roles_futuros, roles_lookup, indice_resp, filas_resp)['total']
+            indice_resp.descartar_candidatos(desde)
+            _acumular_chunk(estado, talento, total, ids_rol, estado['filas_procesadas'], k)
+        duracion = time.perf_counter() - inicio
+        estado['filas_procesadas'] += len(chunk)
+        estado['byte'] = fin
+        estado['segundos'] += duracion
+        if checkpoint:
+            _guardar_checkpoint(checkpoint, firma, k, estado)
+        print(f"{estado['filas_procesadas']} filas · {len(chunk) / duracion if duracion > 0 else 0:,.0f} filas/s")
+    return _resumen(estado, roles_futuros)
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntúa un CSV de candidatos por chunks (top-K por rol + estadísticas).")
+    parser.add_argument('archivo')
+    parser.add_argument('--datos', default='data', help="Carpeta con org_config.json y vision_futura.json")
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--chunk', type=int, default=TAMANO_CHUNK)
+    parser.add_argument('--checkpoint', default=None)
+    parser.add_argument('--salida', default=None, help="JSON con el resultado (por defecto se imprime)")
+    args = parser.parse_args()
+
+    config = load_json_file(os.path.join(args.datos, 'org_config.json'))
+    vision = load_json_file(os.path.join(args.datos, 'vision_futura.json'))
+    resultado = puntuar_archivo_streaming(args.archivo, config, vision, args.k, args.chunk, args.checkpoint, data_dir=args.datos)
+    print(f"Total: {resultado['filas']} filas en {resultado['segundos']}s ({resultado['filas_por_segundo']} filas/s)")
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(resultado['estadisticas'], indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
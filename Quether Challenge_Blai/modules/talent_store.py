@@ -0,0 +1,566 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import scipy.sparse as sp
+from modules.data_loader import COLUMNAS_TALENTO, tablas_a_partir_de_registros
+
+# --- Modelo Compacto de Talento ---
+# Mismo contenido que el DataFrame de talento, sin un dict/lista de Python por
+# celda: ids de skills, proyectos y textos repetidos internados a códigos
+# enteros, niveles y dedicación en arrays estilo CSR, categóricos en enteros
+# pequeños y textos libres en arrays de Arrow. Las filas y columnas se leen a
+# través de vistas ligeras que devuelven los mismos valores que el DataFrame.
+
+# Columnas de texto libre (un valor distinto por persona)
+COLUMNAS_TEXTO = ('nombre', 'email', 'meta_trayectoria')
+# Columnas categóricas: códigos enteros sobre un vocabulario
+COLUMNAS_CATEGORICAS = ('chapter', 'rol_actual', 'manager', 'antigüedad',
+                        'amb_nivel_aspiración', 'meta_performance_rating', 'meta_retention_risk', 'meta_tipo')
+# Columnas lista: códigos por persona (estilo CSR)
+COLUMNAS_LISTA = ('responsabilidades_actuales', 'amb_especialidades_preferidas')
+# Columnas dict clave -> valor numérico (estilo CSR)
+COLUMNAS_MAPA = ('habilidades', 'dedicación_actual')
+# Columnas dict reconstruidas a partir de los campos aplanados
+COLUMNAS_DICT = {'ambiciones': 'amb_', 'metadata': 'meta_'}
+
+def _es_nulo(valor):
+    return valor is None or (isinstance(valor, float) and valor != valor)
+
+def _tipo_codigos(n):
+    """
+    Entero más pequeño capaz de guardar n códigos (más el -1 de 'sin valor').
+    """
+    for tipo in (np.int8, np.int16, np.int32):
+        if n <= np.iinfo(tipo).max:
+            return tipo
+    return np.int64
+
+def _tipo_valores(valores):
+    """
+    int16 si todos los valores son enteros pequeños (niveles 0-10, dedicación
+    en %), float64 en otro caso.
+    """
+    valores = np.asarray(valores, dtype=float)
+    if len(valores) == 0 or (np.all(np.mod(valores, 1) == 0) and np.all(np.abs(valores) <= np.iinfo(np.int16).max)):
+        return np.int16
+    return np.float64
+
+def _posiciones(filas, n):
+    """
+    Filas como índices int64; una máscara booleana (de longitud n) se
+    convierte en las posiciones de sus True, como en pandas.
+    """
+    filas = np.asarray(filas)
+    if filas.dtype == bool:
+        if len(filas) != n:
+            raise IndexError(f"La máscara tiene {len(filas)} elementos y hay {n} filas")
+        return np.flatnonzero(filas)
+    return filas.astype(np.int64)
+
+def _indptr(filas, n):
+    return np.concatenate([[0], np.cumsum(np.bincount(filas, minlength=n))]).astype(np.int64)
+
+# --- Arrays que crecen por el final ---
+# Las altas no copian el pool: cada columna vive en un buffer con capacidad de
+# sobra y la foto publicada es un prefijo suyo. Crece un 50% al llenarse (y no
+# el doble, para no duplicar de golpe la memoria de las matrices de scores).
+
+FACTOR_CRECIMIENTO = 1.5
+
+class ArrayCreciente:
+    """
+    Prefijo fijo ('array') de un buffer que crece por el final del eje 0:
+    añadir k filas cuesta O(k) amortizado. añadir() devuelve otro objeto y
+    escribe en sitio solo si este es el prefijo más largo (nadie ha añadido
+    aún detrás); si no, o si los valores piden un dtype más ancho, copia.
+    Así un array ya publicado nunca cambia. No es thread-safe: quien añade
+    debe serializar las altas (DatasetTalento lo hace con su lock).
+    """
+    __slots__ = ('_buffer', '_ocupado', 'array')
+
+    def __init__(self, datos):
+        # Sin copia: el propio array hace de buffer lleno hasta la primera alta
+        datos = np.asarray(datos)
+        self._buffer, self._ocupado, self.array = datos, [len(datos)], datos
+
+    @classmethod
+    def _prefijo(cls, buffer, ocupado, n):
+        creciente = cls.__new__(cls)
+        creciente._buffer, creciente._ocupado, creciente.array = buffer, ocupado, buffer[:n]
+        return creciente
+
+    def __len__(self):
+        return len(self.array)
+
+    @property
+    def al_final(self):
+        """
+        True si nadie ha añadido detrás de este prefijo (añadir escribe en sitio).
+        """
+        return len(self.array) == self._ocupado[0]
+
+    def añadir(self, valores):
+        valores = np.asarray(valores)
+        n, k = len(self.array), len(valores)
+        tipo = np.result_type(self._buffer.dtype, valores.dtype)
+        if self.al_final and n + k <= len(self._buffer) and tipo == self._buffer.dtype:
+            self._buffer[n:n + k] = valores
+            self._ocupado[0] = n + k
+            return self._prefijo(self._buffer, self._ocupado, n + k)
+        buffer = np.empty((max(int((n + k) * FACTOR_CRECIMIENTO), n + k + 16),) + self.array.shape[1:], dtype=tipo)
+        buffer[:n] = self.array
+        buffer[n:n + k] = valores
+        return self._prefijo(buffer, [n + k], n + k)
+
+def _añadir_texto(a, b):
+    """
+    Une dos columnas de texto de Arrow sin recopiar la primera: se guardan
+    como trozos y los dos últimos se funden mientras el penúltimo no sea
+    mayor que el último (como un contador binario: O(log n) trozos y cada
+    valor se copia O(log n) veces).
+    """
+    trozos = (list(a.chunks) if isinstance(a, pa.ChunkedArray) else [a]) + \
+             (list(b.chunks) if isinstance(b, pa.ChunkedArray) else [b])
+    trozos = [t for t in trozos if len(t)] or trozos[:1]
+    while len(trozos) > 1 and len(trozos[-2]) <= len(trozos[-1]):
+        trozos[-2:] = [pa.concat_arrays(trozos[-2:])]
+    return trozos[0] if len(trozos) == 1 else pa.chunked_array(trozos, type=pa.string())
+
+class Vocabulario:
+    """
+    Internado de valores: valor <-> código entero. Solo crece, así que los
+    códigos de un TalentoCompacto siguen siendo válidos tras nuevas altas.
+    """
+    __slots__ = ('valores', 'codigos')
+
+    def __init__(self):
+        self.valores = []
+        self.codigos = {}
+
+    def __len__(self):
+        return len(self.valores)
+
+    def codigo(self, valor):
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def codificar(self, valores):
+        """
+        Códigos de una secuencia de valores (-1 para los nulos).
+        """
+        inversos, unicos = pd.factorize(pd.Series(valores, dtype=object), use_na_sentinel=True)
+        mapa = np.array([self.codigo(v) for v in unicos] + [-1], dtype=np.int64)
+        return mapa[inversos]
+
+def tipos_talento(talent_df):
+    """
+    Tipo de talento ('Interno' / 'Externo') de cada fila, para DataFrame o TalentoCompacto.
+    """
+    if isinstance(talent_df, TalentoCompacto):
+        return talent_df.tipos()
+    return np.array([m.get('tipo', 'Interno') if isinstance(m, dict) else 'Interno' for m in talent_df['metadata']], dtype=object)
+
+class TalentoCompacto:
+    """
+    Talent pool en arrays. Se usa como un DataFrame de solo lectura:
+    - talento['habilidades'] -> ColumnaTalento (iterable, to_numpy, take...).
+    - talento.iloc[fila] -> FilaTalento; talento.iloc[filas] o talento[mascara]
+      -> DataFrame con solo esas filas.
+    Las altas (añadir) devuelven un TalentoCompacto nuevo que comparte los
+    vocabularios; el original no cambia, igual que con pd.concat, pero sus
+    arrays crecen en sitio (coste por alta independiente del tamaño del pool).
+    """
+
+    def __init__(self, ids, campos, columnas, vocabularios, crecientes=None):
+        self.ids = ids
+        self._campos = campos # columna -> ('texto'|'categoria'|'lista'|'mapa'|'objeto', datos)
+        self.columnas_base = columnas # orden de columnas (con los campos amb_/meta_ aplanados)
+        self.vocabularios = vocabularios
+        self._crecientes = crecientes or {} # buffers de los arrays de _campos, para las altas
+
+    # --- Construcción ---
+
+    @classmethod
+    def desde_tablas(cls, tablas, vocabularios=None):
+        """
+        Construye el modelo a partir de las tablas columnares de data_loader
+        (ver parsear_talento_columnar), sin pasar por dicts de Python.
+        """
+        vocabularios = {} if vocabularios is None else vocabularios
+        base = tablas['base']
+        n = len(base)
+        ids = pd.to_numeric(base['id_empleado']).to_numpy(np.int64) if n else np.zeros(0, dtype=np.int64)
+        campos = {}
+
+        def vocabulario(nombre):
+            return vocabularios.setdefault(nombre, Vocabulario())
+
+        for columna in base.columns:
+            if columna == 'id_empleado':
+                continue
+            serie = base[columna]
+            if columna in COLUMNAS_TEXTO:
+                valores = [None if _es_nulo(v) else str(v) for v in serie.tolist()]
+                campos[columna] = ('texto', pa.array(valores, type=pa.string()))
+            elif columna in COLUMNAS_CATEGORICAS:
+                codigos = vocabulario(columna).codificar(serie.tolist())
+                campos[columna] = ('categoria', codigos.astype(_tipo_codigos(len(vocabularios[columna]))))
+            elif columna in COLUMNAS_LISTA:
+                celdas = serie.tolist()
+                presentes = np.array([isinstance(c, (list, tuple, np.ndarray)) for c in celdas], dtype=bool)
+                listas = [list(c) if presente else [] for c, presente in zip(celdas, presentes)]
+                filas = np.repeat(np.arange(n), [len(l) for l in listas])
+                codigos = vocabulario(columna).codificar([v for l in listas for v in l])
+                campos[columna] = ('lista', (_indptr(filas, n), codigos.astype(np.int32), presentes))
+            else:
+                campos[columna] = ('objeto', serie.to_numpy(dtype=object))
+
+        resp = tablas['responsabilidades'].sort_values(['fila', 'orden'], kind='stable')
+        filas = resp['fila'].to_numpy(np.int64)
+        codigos = vocabulario('responsabilidades_actuales').codificar(resp['responsabilidad'].tolist())
+        campos['responsabilidades_actuales'] = ('lista', (_indptr(filas, n), codigos.astype(np.int32), None))
+
+        for columna, tabla, clave, valor in (('habilidades', 'habilidades', 'skill_id', 'nivel'),
+                                             ('dedicación_actual', 'dedicacion', 'proyecto', 'dedicacion')):
+            largo = tablas[tabla]
+            orden = np.argsort(largo['fila'].to_numpy(np.int64), kind='stable')
+            filas = largo['fila'].to_numpy(np.int64)[orden]
+            claves = vocabulario(columna).codificar(largo[clave].to_numpy(dtype=object)[orden])
+            valores = largo[valor].to_numpy(dtype=float)[orden]
+            campos[columna] = ('mapa', (_indptr(filas, n), claves.astype(np.int32), valores.astype(_tipo_valores(valores))))
+
+        columnas = [c for c in base.columns if c != 'id_empleado']
+        return cls(ids, campos, columnas, vocabularios)
+
+    @classmethod
+    def desde_registros(cls, registros, vocabularios=None):
+        """
+        Construye el modelo a partir de registros (dicts como los del journal).
+        """
+        return cls.desde_tablas(tablas_a_partir_de_registros(registros), vocabularios)
+
+    @classmethod
+    def desde_dataframe(cls, talent_df, vocabularios=None):
+        """
+        Compacta un DataFrame de talento ya parseado (ver load_all_data).
+        """
+        return cls.desde_registros(talent_df.to_dict(orient='records'), vocabularios)
+
+    def añadir(self, registro):
+        """
+        Devuelve un TalentoCompacto nuevo con el registro al final.
+        """
+        return self.concatenar(TalentoCompacto.desde_registros([registro], self.vocabularios))
+
+    def concatenar(self, otro):
+        """
+        Une dos modelos que comparten vocabularios (mismos códigos). Las
+        columnas de este crecen por el final (ver ArrayCreciente), así que
+        añadir pocas filas no copia las del pool.
+        """
+        if otro.vocabularios is not self.vocabularios:
+            raise ValueError("Solo se pueden concatenar modelos con los mismos vocabularios")
+        n, m = len(self), len(otro)
+        columnas = self.columnas_base + [c for c in otro.columnas_base if c not in self.columnas_base]
+        crecientes = {}
+
+        def unir(clave, a, b):
+            creciente = self._crecientes.get(clave)
+            if creciente is None or creciente.array is not a:
+                creciente = ArrayCreciente(a)
+            crecientes[clave] = creciente.añadir(b)
+            return crecientes[clave].array
+
+        campos = {}
+        for columna in set(self._campos) | set(otro._campos):
+            tipo, _ = self._campos.get(columna) or otro._campos[columna]
+            a, b = self._datos(columna, tipo, n), otro._datos(columna, tipo, m)
+            if tipo == 'texto':
+                campos[columna] = (tipo, _añadir_texto(a, b))
+            elif tipo in ('categoria', 'objeto'):
+                campos[columna] = (tipo, unir(columna, a, b))
+            else:
+                indptr = unir((columna, 'indptr'), a[0], b[0][1:] + a[0][-1])
+                codigos = unir((columna, 'codigos'), a[1], b[1])
+                if tipo == 'lista' and a[2] is None and b[2] is None:
+                    extra = None
+                else:
+                    extra = unir((columna, 'extra'), np.ones(n, dtype=bool) if a[2] is None else a[2],
+                                 np.ones(m, dtype=bool) if b[2] is None else b[2])
+                campos[columna] = (tipo, (indptr, codigos, extra))
+        return TalentoCompacto(unir('id_empleado', self.ids, otro.ids), campos, columnas, self.vocabularios, crecientes)
+
+    def tomar(self, filas):
+        """
+        Modelo nuevo con solo esas filas (en ese orden) y los mismos vocabularios.
+        """
+        filas = np.asarray(filas, dtype=np.int64)
+        campos = {}
+        for columna, (tipo, datos) in self._campos.items():
+            if tipo == 'texto':
+                campos[columna] = (tipo, datos.take(pa.array(filas)))
+            elif tipo in ('categoria', 'objeto'):
+                campos[columna] = (tipo, datos[filas])
+            else:
+                indptr, codigos, extra = datos
+                largos = indptr[filas + 1] - indptr[filas]
+                nuevo_indptr = np.concatenate([[0], np.cumsum(largos)]).astype(indptr.dtype)
+                posiciones = np.repeat(indptr[filas] - nuevo_indptr[:-1], largos) + np.arange(nuevo_indptr[-1])
+                if tipo == 'lista': # 'extra' es por fila (presentes)
+                    extra = None if extra is None else extra[filas]
+                else: # 'extra' es por elemento (valores)
+                    extra = extra[posiciones]
+                campos[columna] = (tipo, (nuevo_indptr, codigos[posiciones], extra))
+        return TalentoCompacto(self.ids[filas], campos, self.columnas_base, self.vocabularios)
+
+    def reemplazar(self, fila, otro):
+        """
+        Modelo nuevo con la fila 'fila' sustituida por la única fila de 'otro'
+        (p.ej. un cambio de una persona). Copia las columnas.
+        """
+        filas = np.arange(len(self))
+        filas[fila] = len(self)
+        return self.concatenar(otro).tomar(filas)
+
+    def _datos(self, columna, tipo, n):
+        # Datos de la columna, o su equivalente "vacío" si este modelo no la tiene
+        if columna in self._campos:
+            return self._campos[columna][1]
+        if tipo == 'texto':
+            return pa.nulls(n, type=pa.string())
+        if tipo == 'categoria':
+            return np.full(n, -1, dtype=np.int8)
+        if tipo == 'objeto':
+            return np.full(n, None, dtype=object)
+        vacio = (np.zeros(n + 1, dtype=np.int64), np.zeros(0, dtype=np.int32))
+        return vacio + ((np.zeros(n, dtype=bool),) if tipo == 'lista' else (np.zeros(0, dtype=np.int16),))
+
+    # --- Acceso columnar (para los cálculos vectorizados) ---
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def columns(self):
+        return list(COLUMNAS_TALENTO) + [c for c in self.columnas_base if c not in COLUMNAS_TALENTO and not c.startswith(('amb_', 'meta_'))]
+
+    def codigos(self, columna):
+        """
+        (códigos, valores del vocabulario) de una columna categórica
+        (p.ej. 'amb_nivel_aspiración', 'meta_tipo'); -1 = sin valor.
+        """
+        tipo, datos = self._campos.get(columna, ('categoria', np.full(len(self), -1, dtype=np.int8)))
+        return datos, self.vocabularios.get(columna, Vocabulario()).valores
+
+    def mapa(self, columna):
+        """
+        (indptr, códigos de clave, valores, vocabulario de claves) de
+        'habilidades' o 'dedicación_actual'.
+        """
+        indptr, claves, valores = self._campos[columna][1]
+        return indptr, claves, valores, self.vocabularios[columna].valores
+
+    def lista(self, columna):
+        """
+        (indptr, códigos, vocabulario) de una columna de listas
+        (p.ej. 'responsabilidades_actuales').
+        """
+        if columna not in self._campos:
+            return np.zeros(len(self) + 1, dtype=np.int64), np.zeros(0, dtype=np.int32), []
+        indptr, codigos, _ = self._campos[columna][1]
+        return indptr, codigos, self.vocabularios[columna].valores
+
+    def matriz_dispersa(self, columna):
+        """
+        Matriz dispersa persona x clave (p.ej. dedicación por proyecto).
+        """
+        indptr, claves, valores, vocabulario = self.mapa(columna)
+        return sp.csr_matrix((valores.astype(float), claves, indptr), shape=(len(self), len(vocabulario)))
+
+    def tipos(self):
+        """
+        Tipo de talento de cada fila ('Interno' si no consta).
+        """
+        codigos, valores = self.codigos('meta_tipo')
+        return np.array(valores + ['Interno'], dtype=object)[codigos]
+
+    # --- Valores de Python (misma forma que las celdas del DataFrame) ---
+
+    def valor(self, columna, fila):
+        if columna == 'id_empleado':
+            return int(self.ids[fila])
+        if columna in COLUMNAS_DICT:
+            prefijo = COLUMNAS_DICT[columna]
+            resultado = {}
+            for campo in self.columnas_base:
+                if campo.startswith(prefijo):
+                    v = self._valor_campo(campo, fila)
+                    if not _es_nulo(v):
+                        resultado[campo[len(prefijo):]] = v
+            return resultado
+        if columna not in self._campos:
+            if columna in COLUMNAS_MAPA:
+                return {}
+            if columna in COLUMNAS_LISTA:
+                return []
+            raise KeyError(columna)
+        return self._valor_campo(columna, fila)
+
+    def _valor_campo(self, columna, fila):
+        tipo, datos = self._campos[columna]
+        if tipo == 'texto':
+            return datos[fila].as_py()
+        if tipo == 'categoria':
+            codigo = datos[fila]
+            return None if codigo < 0 else self.vocabularios[columna].valores[codigo]
+        if tipo == 'objeto':
+            return datos[fila]
+        indptr, codigos, extra = datos
+        inicio, fin = indptr[fila], indptr[fila + 1]
+        vocabulario = self.vocabularios[columna].valores
+        if tipo == 'lista':
+            if extra is not None and not extra[fila]:
+                return None
+            return [vocabulario[c] for c in codigos[inicio:fin].tolist()]
+        return dict(zip([vocabulario[c] for c in codigos[inicio:fin].tolist()], extra[inicio:fin].tolist()))
+
+    def a_dataframe(self, filas=None, columnas=None):
+        """
+        Materializa un DataFrame (solo las filas pedidas) con dicts/listas en
+        las columnas literales, igual que load_all_data.
+        """
+        filas = range(len(self)) if filas is None else np.asarray(filas, dtype=np.int64).tolist()
+        columnas = self.columns if columnas is None else columnas
+        return pd.DataFrame({c: [self.valor(c, f) for f in filas] for c in columnas}, columns=columnas)
+
+    def __getitem__(self, clave):
+        if isinstance(clave, str):
+            if clave not in self.columns and clave not in self._campos:
+                raise KeyError(clave)
+            return ColumnaTalento(self, clave)
+        if isinstance(clave, list) and clave and all(isinstance(c, str) for c in clave):
+            return self.a_dataframe(columnas=clave)
+        return self.a_dataframe(_posiciones(clave, len(self)))
+
+    @property
+    def iloc(self):
+        return _Indexador(self)
+
+    def memoria_bytes(self):
+        """
+        Memoria aproximada de los arrays (sin contar los vocabularios).
+        """
+        total = self.ids.nbytes
+        for tipo, datos in self._campos.values():
+            if tipo == 'texto':
+                total += datos.nbytes
+            elif tipo == 'objeto':
+                total += datos.nbytes + sum(64 for v in datos if not _es_nulo(v))
+            elif tipo == 'categoria':
+                total += datos.nbytes
+            else:
+                total += sum(a.nbytes for a in datos if a is not None)
+        return total
+
+class _Indexador:
+    __slots__ = ('_talento',)
+
+    def __init__(self, talento):
+        self._talento = talento
+
+    def __getitem__(self, filas):
+        if isinstance(filas, (int, np.integer)):
+            fila = int(filas)
+            if fila < 0:
+                fila += len(self._talento)
+            return FilaTalento(self._talento, fila)
+        if isinstance(filas, slice):
+            filas = range(len(self._talento))[filas]
+        return self._talento.a_dataframe(_posiciones(filas, len(self._talento)))
+
+class FilaTalento:
+    """
+    Vista de una persona: se usa como la fila (Series) del DataFrame, pero
+    solo crea los dicts/listas que se piden.
+    """
+    __slots__ = ('_talento', 'name')
+
+    def __init__(self, talento, fila):
+        self._talento = talento
+        self.name = fila
+
+    def __getitem__(self, columna):
+        return self._talento.valor(columna, self.name)
+
+    def get(self, columna, defecto=None):
+        try:
+            return self[columna]
+        except KeyError:
+            return defecto
+
+    def keys(self):
+        return self._talento.columns
+
+    def to_dict(self):
+        return {c: self[c] for c in self.keys()}
+
+class ColumnaTalento:
+    """
+    Vista de una columna: iterable y con el subconjunto de la API de
+    pd.Series que usa la app (to_numpy, tolist, take, unique, iloc, iat).
+    """
+    __slots__ = ('_talento', 'nombre')
+
+    def __init__(self, talento, nombre):
+        self._talento = talento
+        self.nombre = nombre
+
+    def __len__(self):
+        return len(self._talento)
+
+    def __iter__(self):
+        valor, columna = self._talento.valor, self.nombre
+        return (valor(columna, fila) for fila in range(len(self._talento)))
+
+    def __getitem__(self, fila):
+        if isinstance(fila, (int, np.integer)):
+            return self._talento.valor(self.nombre, int(fila))
+        return self.take(fila)
+
+    @property
+    def iloc(self):
+        return self
+
+    @property
+    def iat(self):
+        return self
+
+    def take(self, filas):
+        filas = _posiciones(filas, len(self))
+        if self.nombre == 'id_empleado':
+            return self._talento.ids[filas]
+        tipo, datos = self._talento._campos.get(self.nombre, (None, None))
+        if tipo == 'texto':
+            return np.array(datos.take(pa.array(filas)).to_pylist(), dtype=object)
+        resultado = np.empty(len(filas), dtype=object)
+        resultado[:] = [self._talento.valor(self.nombre, f) for f in filas.tolist()]
+        return resultado
+
+    def to_numpy(self):
+        if self.nombre == 'id_empleado':
+            return self._talento.ids.copy()
+        tipo, datos = self._talento._campos.get(self.nombre, (None, None))
+        if tipo == 'texto':
+            return np.array(datos.to_pylist(), dtype=object)
+        if tipo == 'categoria':
+            return np.array(self._talento.vocabularios[self.nombre].valores + [None], dtype=object)[datos]
+        return self.take(np.arange(len(self)))
+
+    def tolist(self):
+        return self.to_numpy().tolist()
+
+    def unique(self):
+        return pd.unique(pd.Series(self.to_numpy(), dtype=object))
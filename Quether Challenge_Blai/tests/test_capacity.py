@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modules.capacity import PlanCapacidad, ventana_inicio
+from modules.talent_store import TalentoCompacto
+
+# --- Organización mínima hecha a mano (sin data/) ---
+# Chapter A: dos internos al 80% y 60% en P1 (capacidad 200, carga 140) y un
+# externo al 100% que no cuenta. Chapter B: un interno al 50% en P2. Un rol FT
+# de A que se abre entre los meses 3 y 6.
+
+PERSONAS = [
+    (1, 'A', {'P1': 80}, 'Interno'),
+    (2, 'A', {'P1': 60}, 'Interno'),
+    (3, 'A', {'P1': 100}, 'Externo'),
+    (4, 'B', {'P2': 50}, 'Interno'),
+]
+VISION = {
+    'roles_necesarios': [{'id': 'R-A', 'título': 'Rol A', 'capítulo': 'A', 'modalidad': 'FT', 'cantidad': 1,
+                          'inicio_estimado': '3-6m'}],
+    'timeline': {'12_meses': {'hitos': ['Hito']}},
+}
+
+def _talento(compacto):
+    registros = [{'id_empleado': i, 'nombre': f"Persona {i}", 'email': '', 'chapter': chapter, 'rol_actual': '', 'manager': '',
+                  'antigüedad': '', 'habilidades': {}, 'responsabilidades_actuales': [], 'dedicación_actual': dedicacion,
+                  'ambiciones': {}, 'metadata': {'tipo': tipo}} for i, chapter, dedicacion, tipo in PERSONAS]
+    return TalentoCompacto.desde_registros(registros) if compacto else pd.DataFrame(registros)
+
+def _primer_mes(plan):
+    df = plan.primer_mes_exceso().set_index('Chapter')
+    return {c: (None if pd.isna(m) else int(m)) for c, m in df['Primer Mes en Exceso'].items()}
+
+def test_ventana_inicio():
+    assert ventana_inicio('3-6m') == (3, 6)
+    assert ventana_inicio('12m') == (12, 12)
+    assert ventana_inicio(None) == (0, 0)
+
+@pytest.mark.parametrize('compacto', [False, True])
+@pytest.mark.parametrize('inicio, mes', [('temprano', 3), ('rampa', 5), ('tardio', 6)])
+def test_primer_mes_en_exceso(compacto, inicio, mes):
+    plan = PlanCapacidad(_talento(compacto), VISION, inicio=inicio)
+    assert plan.horizonte == 24
+    assert _primer_mes(plan) == {'A': mes, 'B': None}
+    # La carga por chapter es la suma del tensor de sus internos más la demanda del rol
+    carga = plan.carga_chapters()
+    np.testing.assert_allclose(carga['A'], plan.tensor([0, 1]).sum(axis=(1, 2)) + plan.demanda_roles[:, 0])
+    np.testing.assert_allclose(carga['B'], plan.tensor([3]).sum(axis=(1, 2)))
+
+@pytest.mark.parametrize('compacto', [False, True])
+def test_cambio_de_carga_de_proyecto(compacto):
+    plan = PlanCapacidad(_talento(compacto), VISION)
+    plan.carga_empleados()
+    simulado = plan.copia().cambiar_carga_proyecto('P1', 2.0, desde_mes=1)
+    assert _primer_mes(simulado) == {'A': 1, 'B': None}
+    assert _primer_mes(plan) == {'A': 3, 'B': None} # El original no cambia
+    # Mismo resultado que construir el plan con la carga ya cambiada
+    nuevo = PlanCapacidad(_talento(compacto), VISION)
+    nuevo.cambiar_carga_proyecto('P1', 2.0, desde_mes=1)
+    np.testing.assert_allclose(simulado.carga_empleados(), nuevo.carga_empleados())
+    assert simulado.sobre_asignados()['id_empleado'].tolist() == [1, 2]
+    assert simulado.sobre_asignados()['Primer Mes'].tolist() == [1, 1]
@@ -0,0 +1,32 @@
+import os
+import numpy as np
+import pytest
+from benchmarks.generar_datos import escribir_dataset
+from modules.compatibility import calcular_compatibilidad_total, calcular_matriz_compatibilidad
+from modules.data_loader import load_all_data
+
+# --- Organización sintética pequeña (sin data/) ---
+
+@pytest.fixture(scope='module')
+def organizacion(tmp_path_factory):
+    directorio = str(tmp_path_factory.mktemp('org'))
+    escribir_dataset(directorio, 40, fraccion_externos=0.5, n_skills=25, n_roles=6, n_chapters=3, n_proyectos=4)
+    config, vision, talent_df = load_all_data(directorio)
+    roles_lookup = {rol['id']: rol for rol in config['roles']}
+    # Un rol sin definición en org_config.json (puntúa 0) y otro sin skills ni responsabilidades
+    rol_vacio = dict(roles_lookup[vision['roles_necesarios'][0]['id']], id='R-VACIO', habilidades_requeridas=[],
+                     responsabilidades=[])
+    roles_lookup['R-VACIO'] = rol_vacio
+    roles_futuros = vision['roles_necesarios'] + [{'id': 'R-SIN-DEFINIR', 'modalidad': 'FT'},
+                                                  {'id': 'R-VACIO', 'modalidad': 'PT'}]
+    return talent_df, roles_futuros, roles_lookup
+
+def test_matriz_igual_que_el_score_escalar(organizacion):
+    talent_df, roles_futuros, roles_lookup = organizacion
+    matriz = calcular_matriz_compatibilidad(talent_df, roles_futuros, roles_lookup)
+    assert matriz['total'].shape == (len(talent_df), len(roles_futuros))
+    assert matriz['ids_rol'] == [rol['id'] for rol in roles_futuros]
+    esperado = np.array([[calcular_compatibilidad_total(talent_df.iloc[i], rol, roles_lookup) for rol in roles_futuros]
+                         for i in range(len(talent_df))])
+    np.testing.assert_allclose(matriz['total'], esperado, rtol=0, atol=1e-9)
+    assert (matriz['total'][:, -2] == 0).all()
@@ -0,0 +1,39 @@
+import os
+import pandas as pd
+import pytest
+from benchmarks.generar_datos import escribir_dataset
+from modules import data_loader
+from modules.data_loader import COLUMNAS_TALENTO, TALENT_FILES, _parsear_columna, load_all_data, registrar_talento, ruta_journal
+
+# --- Parseo de columnas literales ---
+
+def test_celda_con_varios_valores_y_celdas_vacias():
+    serie = pd.Series(['{"S1": 5}', '1, 2', None, '', '  ', "{'S2': 3}"], name='habilidades')
+    assert _parsear_columna(serie) == [{'S1': 5}, (1, 2), {}, {}, {}, {'S2': 3}]
+
+def test_celda_ilegible_da_value_error():
+    with pytest.raises(ValueError, match="fila 1"):
+        _parsear_columna(pd.Series(['{"S1": 5}', "{'S2': "], name='habilidades'))
+
+# --- Compactación del journal ---
+
+def test_carga_tras_compactar_igual(tmp_path, monkeypatch):
+    directorio = str(tmp_path / 'org')
+    escribir_dataset(directorio, 80, fraccion_externos=0.5, n_skills=20, n_roles=4, n_chapters=3, n_proyectos=4)
+    for i in range(20):
+        tipo = 'Interno' if i % 2 else 'Externo'
+        registrar_talento(os.path.join(directorio, TALENT_FILES[0 if tipo == 'Interno' else 1]), {
+            'nombre': f"Nuevo {i}", 'email': 'N/A', 'chapter': 'Externo', 'rol_actual': 'Candidato', 'manager': 'N/A',
+            'antigüedad': '0m', 'habilidades': {'S-0001': i % 10},
+            'responsabilidades_actuales': [f"Tarea {i}"], 'dedicación_actual': {'P-01': 50} if i % 3 else {},
+            'ambiciones': {'nivel_aspiración': 'senior'}, 'metadata': {'tipo': tipo},
+        })
+    antes = [load_all_data(directorio, compacto=compacto)[2] for compacto in (False, True)]
+
+    monkeypatch.setattr(data_loader, 'MAX_BYTES_JOURNAL', 0)
+    despues = [load_all_data(directorio, compacto=compacto)[2] for compacto in (False, True)]
+    assert not any(os.path.exists(ruta_journal(os.path.join(directorio, f))) for f in TALENT_FILES)
+    for a, b in zip(antes, despues):
+        assert len(a) == len(b) == 100
+        for columna in COLUMNAS_TALENTO:
+            assert a[columna].tolist() == b[columna].tolist(), columna
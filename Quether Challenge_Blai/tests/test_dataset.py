@@ -0,0 +1,84 @@
+import os
+import numpy as np
+import pytest
+from benchmarks.generar_datos import escribir_dataset
+from modules.data_loader import registrar_cambio_talento, registrar_talento
+from modules.dataset import cargar_dataset
+
+# --- Organización sintética pequeña (sin data/) ---
+
+@pytest.fixture
+def directorio(tmp_path):
+    directorio = str(tmp_path / 'org')
+    escribir_dataset(directorio, 200, fraccion_externos=0.5, n_skills=30, n_roles=6, n_chapters=3, n_proyectos=5)
+    return directorio
+
+def _alta(directorio, i):
+    return registrar_talento(os.path.join(directorio, 'candidatos_externos.csv'), {
+        'nombre': f"Nuevo {i}", 'habilidades': {'S-0001': 6, 'S-0002': i % 10},
+        'responsabilidades_actuales': [f"Responsabilidad inédita {i}"] if i % 2 else [],
+        'metadata': {'tipo': 'Externo'}, 'ambiciones': {'nivel_aspiración': 'senior'}, 'dedicación_actual': {},
+    })
+
+@pytest.mark.parametrize('cache_scores', [False, True])
+def test_altas_igual_que_recargar(directorio, cache_scores):
+    dataset = cargar_dataset(directorio, cache_scores=cache_scores)
+    dataset.kpis # Construidos antes de las altas: se actualizan con ellas
+    foto = dataset.estado
+    totales = foto.score_matrix['total'].copy()
+
+    filas = [dataset.añadir_talento(_alta(directorio, i)) for i in range(3)]
+    filas += dataset.añadir_talentos([_alta(directorio, i) for i in range(3, 40)])
+    assert filas == list(range(len(totales), len(totales) + 40))
+
+    # La foto anterior no cambia aunque los arrays hayan crecido en sitio
+    assert len(foto.talent_df) == len(totales)
+    np.testing.assert_array_equal(foto.score_matrix['total'], totales)
+    assert dataset.estado.talent_df['id_empleado'].iloc[filas[-1]] not in foto.fila_por_id
+
+    recargado = cargar_dataset(directorio, cache_scores=cache_scores)
+    for clave in ('total', 'skills', 'responsabilidades', 'ambiciones', 'dedicacion', 'ids_empleado'):
+        np.testing.assert_array_equal(dataset.score_matrix[clave], recargado.score_matrix[clave])
+    for columna in ('nombre', 'habilidades', 'responsabilidades_actuales'):
+        assert dataset.talent_df[columna].tolist() == recargado.talent_df[columna].tolist()
+    assert dataset.kpis_dataframes()[2].equals(recargado.kpis_dataframes()[2])
+
+@pytest.mark.parametrize('compacto', [True, False])
+def test_cambios_igual_que_recargar(directorio, compacto):
+    dataset = cargar_dataset(directorio, compacto=compacto)
+    dataset.kpis
+    foto = dataset.estado
+    talento = foto.talent_df
+    internos = np.flatnonzero(dataset.kpis.internos)
+    registros = {int(talento['id_empleado'].iloc[f]): talento.iloc[f] for f in range(len(talento))}
+    registros = {emp_id: {c: fila[c] for c in talento.columns} for emp_id, fila in registros.items()}
+
+    # Mejores candidatos internos que dejan de serlo (obliga a reescanear sus roles)
+    for fila in set(dataset.kpis.mejor_fila[dataset.kpis.mejor_fila >= 0].tolist()):
+        registro = registros[int(talento['id_empleado'].iloc[fila])]
+        dataset.actualizar_talento(registrar_cambio_talento(directorio, dict(registro, habilidades={}, responsabilidades_actuales=[])))
+    # Un interno cambia de riesgo y de proyectos, y un externo pasa a interno
+    registro = registros[int(talento['id_empleado'].iloc[internos[0]])]
+    dataset.actualizar_talento(registrar_cambio_talento(directorio, dict(
+        registro, metadata=dict(registro['metadata'], retention_risk='Media'), **{'dedicación_actual': {'P-Nuevo': 120}})))
+    externo = int(np.flatnonzero(~np.array(dataset.kpis.internos))[0])
+    registro = registros[int(talento['id_empleado'].iloc[externo])]
+    dataset.actualizar_talento(registrar_cambio_talento(directorio, dict(
+        registro, metadata={'tipo': 'Interno'}, habilidades={'S-0001': 10}, **{'dedicación_actual': {'P-Nuevo': 50}})))
+    # Un alta de esta sesión que luego cambia
+    fila = dataset.añadir_talento(_alta(directorio, 1))
+    alta = {c: dataset.talent_df.iloc[fila][c] for c in talento.columns}
+    dataset.actualizar_talento(registrar_cambio_talento(directorio, dict(alta, nombre='Cambiado')))
+
+    assert dataset.talent_df.iloc[fila]['nombre'] == 'Cambiado'
+    assert foto.talent_df['habilidades'].iloc[externo] == registros[int(talento['id_empleado'].iloc[externo])]['habilidades']
+    with pytest.raises(KeyError):
+        dataset.actualizar_talento(dict(alta, id_empleado=-1))
+
+    recargado = cargar_dataset(directorio, compacto=compacto)
+    for clave in ('total', 'skills', 'responsabilidades', 'ambiciones', 'dedicacion', 'ids_empleado'):
+        np.testing.assert_array_equal(dataset.score_matrix[clave], recargado.score_matrix[clave])
+    for columna in ('nombre', 'habilidades', 'dedicación_actual', 'metadata'):
+        assert dataset.talent_df[columna].tolist() == recargado.talent_df[columna].tolist()
+    for vivo, nuevo in zip(dataset.kpis_dataframes(), recargado.kpis_dataframes()):
+        assert vivo.reset_index(drop=True).equals(nuevo.reset_index(drop=True))
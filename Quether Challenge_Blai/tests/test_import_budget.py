@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+# --- Presupuesto de importación en frío ---
+# Cada módulo del núcleo de scoring se importa en un intérprete nuevo: debe
+# tardar menos de PRESUPUESTO_S y no arrastrar las dependencias pesadas, que
+# solo se cargan al usar la función que las necesita.
+
+MODULOS = [
+    'modules.compatibility', 'modules.dataset', 'modules.ranking', 'modules.staffing',
+    'modules.scenarios', 'modules.skill_gaps', 'modules.capacity', 'modules.chapter_analytics', 'modules.similarity',
+    'modules.recommendations', 'modules.graph',
+]
+PROHIBIDOS = ['sklearn', 'langchain_core', 'langchain_groq', 'dotenv', 'networkx', 'pyvis', 'plotly', 'polars']
+
+PRESUPUESTO_S = 1.0
+
+CODIGO_MEDIDA = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+segundos = time.perf_counter() - inicio
+print(json.dumps({{'segundos': segundos, 'cargados': [m for m in {prohibidos!r} if m in sys.modules]}}))
+"""
+
+@pytest.mark.parametrize('modulo', MODULOS)
+def test_importacion_en_frio(modulo):
+    salida = subprocess.run(
+        [sys.executable, '-c', CODIGO_MEDIDA.format(modulo=modulo, prohibidos=PROHIBIDOS)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True, check=True,
+    )
+    medida = json.loads(salida.stdout.strip().splitlines()[-1])
+    assert medida['cargados'] == [], f"{modulo} importa {', '.join(medida['cargados'])}"
+    assert medida['segundos'] < PRESUPUESTO_S
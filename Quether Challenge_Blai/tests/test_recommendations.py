@@ -0,0 +1,154 @@
+import asyncio
+import os
+import time
+import pytest
+from langchain_core.runnables import Runnable
+from modules import recommendations as rc
+
+# Referencia al sleep real: algunas pruebas sustituyen asyncio.sleep para medir el backoff
+_dormir = asyncio.sleep
+
+# --- LLM stub (sin red) ---
+
+class LLMStub(Runnable):
+    """
+    Modelo determinista: responde 'PLAN <nº de empleado>' (el prompt lleva el
+    nombre), tarda 'retardo' segundos y falla las primeras 'fallos' llamadas.
+    Cuenta llamadas y el máximo de llamadas simultáneas.
+    """
+    model_name = 'stub'
+    temperature = 0.0
+
+    def __init__(self, retardo=0.0, fallos=0, trozos=3):
+        self.retardo, self.fallos, self.trozos = retardo, fallos, trozos
+        self.llamadas = 0
+        self.activas = self.max_activas = 0
+
+    def _responder(self, prompt):
+        self.llamadas += 1
+        if self.llamadas <= self.fallos:
+            raise RuntimeError(f"fallo {self.llamadas}")
+        return "PLAN " + prompt.split("**Empleado:** ")[1].split()[0] if "**Empleado:**" in prompt else "RESUMEN"
+
+    def invoke(self, input, config=None, **kwargs):
+        time.sleep(self.retardo)
+        return self._responder(input)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.activas += 1
+        self.max_activas = max(self.max_activas, self.activas)
+        try:
+            await _dormir(self.retardo)
+            return self._responder(input)
+        finally:
+            self.activas -= 1
+
+    def stream(self, input, config=None, **kwargs):
+        time.sleep(self.retardo) # Tiempo hasta el primer trozo
+        texto = self._responder(input)
+        paso = -(-len(texto) // self.trozos)
+        for i in range(0, len(texto), paso):
+            yield texto[i:i + paso]
+
+def _peticion(i):
+    empleado = {'nombre': f"E{i}", 'rol_actual': 'Analista', 'habilidades': {'S1': 5},
+                'ambiciones': {'nivel_aspiración': 'Senior'}}
+    return empleado, {'título': 'Rol futuro'}, {'habilidades_requeridas': ['S1'], 'nivel': 'Senior'}, 50.0 + i
+
+SKILLS = {'S1': 'Analítica'}
+
+@pytest.fixture(autouse=True)
+def cache_llm(tmp_path, monkeypatch):
+    directorio = str(tmp_path / 'llm')
+    monkeypatch.setattr(rc, 'DIRECTORIO_CACHE_LLM', directorio)
+    return directorio
+
+def _generar(peticiones, llm, **kwargs):
+    return asyncio.run(rc.generar_planes_async(peticiones, SKILLS, llm=llm, **kwargs))
+
+# --- Pipeline por lotes ---
+
+def test_lote_respeta_el_limite_de_concurrencia_y_el_orden():
+    llm = LLMStub(retardo=0.02)
+    respuestas = _generar([_peticion(i) for i in range(12)], llm, max_concurrencia=3)
+    assert respuestas == [f"PLAN E{i}" for i in range(12)]
+    assert llm.llamadas == 12
+    assert llm.max_activas == 3
+
+def test_reintentos_con_backoff_exponencial(monkeypatch):
+    esperas = []
+
+    async def dormir(segundos):
+        esperas.append(segundos)
+        await _dormir(0)
+
+    monkeypatch.setattr(rc.asyncio, 'sleep', dormir)
+    monkeypatch.setattr(rc.random, 'random', lambda: 0.0) # Sin jitter
+    llm = LLMStub(fallos=2)
+    assert _generar([_peticion(0)], llm, reintentos=2, backoff=0.5) == ["PLAN E0"]
+    assert llm.llamadas == 3
+    assert esperas == [0.5, 1.0]
+
+def test_fallo_tras_los_reintentos_no_se_cachea(cache_llm):
+    llm = LLMStub(fallos=10)
+    [respuesta] = _generar([_peticion(0)], llm, reintentos=1, backoff=0.0)
+    assert respuesta.startswith("Error al llamar a la API de IA: fallo 2")
+    assert llm.llamadas == 2
+    assert not os.path.exists(cache_llm) or not os.listdir(cache_llm)
+
+def test_respuestas_cacheadas_en_disco():
+    peticiones = [_peticion(i) for i in range(4)]
+    primeras = _generar(peticiones, LLMStub())
+    llm = LLMStub()
+    assert _generar(peticiones + [_peticion(4)], llm) == primeras + ["PLAN E4"]
+    assert llm.llamadas == 1 # Solo la petición nueva
+
+def test_lote_sincrono_desde_otro_hilo():
+    llm = LLMStub(retardo=0.01)
+    peticiones = [_peticion(i) for i in range(6)]
+    assert rc.generar_planes_lote(peticiones, SKILLS, llm=llm, max_concurrencia=2) == [f"PLAN E{i}" for i in range(6)]
+    assert llm.max_activas == 2
+    # Segunda llamada: mismo event loop de fondo, todo desde la caché
+    assert rc.generar_planes_lote(peticiones, SKILLS, llm=LLMStub(fallos=10)) == [f"PLAN E{i}" for i in range(6)]
+
+def test_error_al_inicializar_el_llm(monkeypatch):
+    def sin_clave():
+        raise RuntimeError("sin clave")
+
+    monkeypatch.setattr(rc, 'obtener_llm', sin_clave)
+    respuestas = asyncio.run(rc.generar_planes_async([_peticion(0), _peticion(1)], SKILLS))
+    assert len(respuestas) == 2
+    assert all(r.startswith("Error al inicializar el LLM: sin clave") for r in respuestas)
+
+# --- Streaming ---
+
+def test_stream_plan_mide_ttft_y_total_y_cachea():
+    metricas = {}
+    llm = LLMStub(retardo=0.05, trozos=3)
+    trozos = list(rc.generar_plan_desarrollo_stream(*_peticion(7), SKILLS, metricas=metricas, llm=llm))
+    assert "".join(trozos) == "PLAN E7"
+    assert len(trozos) == 3
+    assert metricas['ttft'] >= 0.05
+    assert metricas['total'] >= metricas['ttft']
+
+    # Segunda vez: de golpe desde la caché (compartida con el pipeline por lotes)
+    metricas_cache = {}
+    llm_cache = LLMStub()
+    assert list(rc.generar_plan_desarrollo_stream(*_peticion(7), SKILLS, metricas=metricas_cache, llm=llm_cache)) == ["PLAN E7"]
+    assert metricas_cache == {'ttft': 0.0, 'total': 0.0, 'cache': True}
+    assert _generar([_peticion(7)], llm_cache) == ["PLAN E7"]
+    assert llm_cache.llamadas == 0
+
+def test_stream_con_error_no_cachea(cache_llm):
+    metricas = {}
+    trozos = list(rc.generar_plan_desarrollo_stream(*_peticion(0), SKILLS, metricas=metricas, llm=LLMStub(fallos=1)))
+    assert len(trozos) == 1 and trozos[0].startswith("Error al llamar a la API de IA: fallo 1")
+    assert metricas['ttft'] is None and metricas['total'] >= 0
+    assert not os.path.exists(cache_llm) or not os.listdir(cache_llm)
+
+def test_stream_resumen_ejecutivo():
+    metricas = {}
+    trozos = list(rc.generar_resumen_ejecutivo_stream("riesgo", "capacidad", "gaps", metricas=metricas,
+                                                      llm=LLMStub(retardo=0.02, trozos=2)))
+    assert "".join(trozos) == "RESUMEN"
+    assert metricas['ttft'] >= 0.02 and metricas['total'] >= metricas['ttft']
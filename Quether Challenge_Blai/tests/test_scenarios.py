@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.generar_datos import escribir_dataset
+from modules.compatibility import PESOS_COMPONENTES, calcular_matriz_compatibilidad
+from modules.dataset import cargar_dataset
+from modules.scenarios import Escenario, MotorEscenarios
+
+# --- Organización sintética pequeña (sin data/) ---
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    directorio = str(tmp_path_factory.mktemp('org'))
+    escribir_dataset(directorio, 120, fraccion_externos=0.3, n_skills=30, n_roles=6, n_chapters=3, n_proyectos=4)
+    return cargar_dataset(directorio, compacto=False)
+
+def test_pesos_base_exactos(dataset):
+    motor = MotorEscenarios.desde_dataset(dataset)
+    np.testing.assert_array_equal(motor.evaluar(Escenario('Base')), dataset.score_matrix['total'])
+    # Los pesos se normalizan: el doble de los base es el mismo escenario
+    doble = Escenario('Doble', pesos={c: 2 * p for c, p in PESOS_COMPONENTES.items()})
+    np.testing.assert_array_equal(motor.evaluar(doble), dataset.score_matrix['total'])
+    assert motor.cambios_banda(doble).empty
+
+def test_otros_pesos_recombinan_los_componentes(dataset):
+    pesos = {'skills': 30, 'responsabilidades': 30, 'ambiciones': 20, 'dedicacion': 20}
+    total = MotorEscenarios.desde_dataset(dataset).evaluar(Escenario('Otro', pesos=pesos))
+    esperado = sum(dataset.score_matrix[c] * pesos[c] / PESOS_COMPONENTES[c] for c in PESOS_COMPONENTES)
+    np.testing.assert_allclose(total, esperado, rtol=0, atol=1e-9)
+
+def test_ediciones_igual_que_recalcular(dataset):
+    talento = dataset.talent_df
+    ids = talento['id_empleado'].tolist()
+    skill = dataset.roles_lookup[dataset.vision['roles_necesarios'][0]['id']]['habilidades_requeridas'][0]
+    ediciones = [(ids[0], skill, 10), (ids[5], skill, 0), (ids[5], 'S-INEXISTENTE', 7)]
+    total = MotorEscenarios.desde_dataset(dataset).evaluar(Escenario('Formación', ediciones=ediciones))
+
+    habilidades = [dict(h) for h in talento['habilidades']]
+    for id_empleado, skill_id, nivel in ediciones:
+        habilidades[ids.index(id_empleado)][skill_id] = nivel
+    editado = talento.assign(habilidades=pd.Series(habilidades, index=talento.index))
+    esperado = calcular_matriz_compatibilidad(editado, dataset.vision['roles_necesarios'], dataset.roles_lookup,
+                                              dataset.indice_resp)['total']
+    np.testing.assert_array_equal(total, esperado)
+    assert (total[[0, 5]] != dataset.score_matrix['total'][[0, 5]]).any()
+    # El dataset no cambia
+    np.testing.assert_array_equal(MotorEscenarios.desde_dataset(dataset).evaluar(Escenario('Base')), dataset.score_matrix['total'])
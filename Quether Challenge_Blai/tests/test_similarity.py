@@ -0,0 +1,116 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from modules.similarity import BACKENDS, AlmacenVectores, construir_indice_vectorial, crear_backend
+
+# --- Datos de prueba locales (sin data/) ---
+
+RESPONSABILIDADES = [
+    ['Gestionar campañas de performance', 'Optimizar el presupuesto de medios'],
+    ['Diseñar la arquitectura de datos', 'Gestionar el CDP'],
+    ['Definir la estrategia de marca'],
+    [],
+    ['Gestionar campañas de performance', 'Optimizar el presupuesto de medios'],
+]
+ROLES_FUTUROS = [{'id': 'R-PERF'}, {'id': 'R-DATA'}, {'id': 'R-VACIO'}]
+
+def _roles_lookup(texto_data='Diseñar la arquitectura de datos'):
+    return {
+        'R-PERF': {'responsabilidades': ['Gestionar campañas de performance', 'Optimizar el presupuesto de medios']},
+        'R-DATA': {'responsabilidades': [texto_data, 'Gobierno del dato']},
+        'R-VACIO': {'responsabilidades': []},
+    }
+
+def _talento(responsabilidades=RESPONSABILIDADES):
+    return pd.DataFrame({'responsabilidades_actuales': list(responsabilidades)})
+
+def _indice(backend, directorio=None, talento=None, roles_lookup=None):
+    return construir_indice_vectorial(crear_backend(backend), _talento() if talento is None else talento,
+                                      ROLES_FUTUROS, roles_lookup or _roles_lookup(), directorio)
+
+# --- Backends ---
+
+@pytest.mark.parametrize('backend', list(BACKENDS))
+def test_scores_con_reglas_de_listas_vacias(backend):
+    scores = _indice(backend).scores()
+    assert scores.shape == (len(RESPONSABILIDADES), len(ROLES_FUTUROS))
+    assert ((scores >= 0) & (scores <= 25)).all()
+    assert (scores[3, :2] == 0).all() # Candidato sin responsabilidades
+    assert (scores[:, 2] == 25).all() # Rol sin responsabilidades
+    # Mismo texto que el rol: coseno 1 (salvo redondeo en float32)
+    assert scores[0, 0] == pytest.approx(25, abs=1e-4)
+    assert scores[0, 0] > scores[2, 0]
+
+@pytest.mark.parametrize('backend', list(BACKENDS))
+def test_disco_igual_que_memoria(backend, tmp_path):
+    np.testing.assert_array_equal(_indice(backend, str(tmp_path)).scores(), _indice(backend).scores())
+
+def test_tfidf_limita_la_dimension():
+    indice = construir_indice_vectorial(crear_backend('tfidf', max_terminos=4), _talento(), ROLES_FUTUROS, _roles_lookup())
+    assert indice.scores().shape == (len(RESPONSABILIDADES), len(ROLES_FUTUROS))
+    assert indice.almacen.vectores.shape[1] == 4
+
+def test_backend_desconocido():
+    with pytest.raises(ValueError):
+        crear_backend('word2vec')
+
+# --- Almacén de vectores ---
+
+@pytest.mark.parametrize('backend', list(BACKENDS))
+def test_almacen_reutiliza_y_recarga_con_memmap(backend, tmp_path):
+    indice = _indice(backend, str(tmp_path))
+    scores = indice.scores()
+    # Cada texto distinto se vectoriza una vez (las filas 0 y 4 son iguales, y R-PERF también)
+    distintos = len({" ".join(l) for l in RESPONSABILIDADES} | {" ".join(r['responsabilidades']) for r in _roles_lookup().values()})
+    assert indice.almacen.calculados == distintos
+
+    recargado = _indice(backend, str(tmp_path))
+    np.testing.assert_array_equal(recargado.scores(), scores)
+    assert recargado.almacen.calculados == 0
+    assert recargado.almacen.reutilizados == len(RESPONSABILIDADES) + len(ROLES_FUTUROS)
+    assert isinstance(recargado.almacen.vectores, np.memmap)
+
+@pytest.mark.parametrize('backend', list(BACKENDS))
+def test_alta_solo_vectoriza_el_texto_nuevo_y_puntua_como_al_recargar(backend, tmp_path):
+    indice = _indice(backend, str(tmp_path))
+    indice.scores()
+    antes = indice.almacen.calculados
+    nuevo = ['Optimizar el presupuesto de medios', 'Liderar squads de datos']
+    fila = indice.añadir_candidato(nuevo)
+    score_vivo = indice.scores([fila])
+    assert indice.almacen.calculados == antes + 1
+
+    recargado = _indice(backend, str(tmp_path), talento=_talento(RESPONSABILIDADES + [nuevo]))
+    np.testing.assert_array_equal(recargado.scores([fila]), score_vivo)
+    assert recargado.almacen.calculados == 0
+
+def test_almacen_en_memoria_y_huellas_repetidas():
+    almacen = AlmacenVectores(None, 'prueba')
+    llamadas = []
+
+    def vectorizar(docs):
+        llamadas.append(list(docs))
+        return np.eye(len(docs), 4, dtype=np.float32)
+
+    huellas = np.array([1, 2, 1], dtype=np.uint64)
+    filas = almacen.asegurar(huellas, ['a', 'b', 'a'], vectorizar)
+    assert llamadas == [['a', 'b']]
+    assert filas[0] == filas[2] != filas[1]
+    almacen.asegurar(np.array([2, 3], dtype=np.uint64), ['b', 'c'], vectorizar)
+    assert llamadas[-1] == ['c']
+    assert (almacen.calculados, almacen.reutilizados) == (3, 1)
+
+@pytest.mark.parametrize('backend', ['tfidf', 'denso'])
+def test_reajuste_borra_los_almacenes_antiguos(backend, tmp_path):
+    _indice(backend, str(tmp_path)).scores()
+    # Otros textos de rol: el ajuste guardado ya no vale y se crea otro almacén
+    _indice(backend, str(tmp_path), roles_lookup=_roles_lookup('Modelar el dato de clientes')).scores()
+    almacenes = {f.rsplit('.', 1)[0] for f in os.listdir(tmp_path) if f.endswith('.f32')}
+    assert len(almacenes) == 1
+    assert len([f for f in os.listdir(tmp_path) if f.endswith('.ajuste.npz')]) == 1
+
+def test_hashing_no_depende_del_corpus(tmp_path):
+    base = _indice('hashing', str(tmp_path)).scores()
+    otro = _indice('hashing', str(tmp_path), talento=_talento(RESPONSABILIDADES[:2])).scores()
+    np.testing.assert_array_equal(otro, base[:2])
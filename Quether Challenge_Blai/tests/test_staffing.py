@@ -0,0 +1,59 @@
+import itertools
+import numpy as np
+import pytest
+from modules.staffing import UMBRAL_COBERTURA, expandir_plazas, resolver_plan_staffing
+
+# --- Matrices de score pequeñas (sin data/) ---
+
+def _roles(*plazas):
+    return [{'id': f"R-{j}", 'título': f"Rol {j}", 'modalidad': modalidad, 'cantidad': cantidad}
+            for j, (cantidad, modalidad) in enumerate(plazas)]
+
+def _optimo_por_fuerza_bruta(scores, roles, capacidad):
+    """
+    (plazas cubiertas, suma de scores) del mejor plan probando todos.
+    """
+    plaza_rol, plaza_dedicacion = expandir_plazas(roles)
+    plazas_por_rol = np.bincount(plaza_rol, minlength=len(roles))
+    dedicacion_rol = {int(j): d for j, d in zip(plaza_rol, plaza_dedicacion)}
+    mejor = (0, 0.0)
+    for plan in itertools.product([None, *range(len(roles))], repeat=len(scores)):
+        if any(plan.count(j) > plazas_por_rol[j] for j in range(len(roles))):
+            continue
+        if any(j is not None and (scores[i, j] < UMBRAL_COBERTURA or capacidad[i] < dedicacion_rol[j])
+               for i, j in enumerate(plan)):
+            continue
+        asignados = [(i, j) for i, j in enumerate(plan) if j is not None]
+        mejor = max(mejor, (len(asignados), sum(scores[i, j] for i, j in asignados)))
+    return mejor
+
+def test_no_es_voraz():
+    # El mejor candidato de los dos roles debe ir al que nadie más cubre
+    scores = np.array([[90.0, 80.0], [85.0, 10.0]])
+    plan = resolver_plan_staffing(scores, _roles((1, 'FT'), (1, 'FT')), np.full(2, 100.0))
+    assert plan['asignaciones'] == [(1, 0, 85.0), (0, 1, 80.0)]
+    assert plan['vacios'] == []
+
+@pytest.mark.parametrize('semilla', range(20))
+def test_optimo_igual_que_fuerza_bruta(semilla):
+    rng = np.random.default_rng(semilla)
+    roles = _roles((2, 'FT'), (0.5, 'PT'), (1, 'Fractional'))
+    scores = rng.uniform(20, 100, size=(6, len(roles)))
+    capacidad = rng.choice([0.0, 25.0, 50.0, 100.0], size=6)
+    plan = resolver_plan_staffing(scores, roles, capacidad)
+    cubiertas, suma = _optimo_por_fuerza_bruta(scores, roles, capacidad)
+    assert len(plan['asignaciones']) == cubiertas == plan['cubiertas'].sum()
+    assert sum(score for _, _, score in plan['asignaciones']) == pytest.approx(suma)
+    filas = [fila for fila, _, _ in plan['asignaciones']]
+    assert len(filas) == len(set(filas)) # Cada persona, como mucho una plaza
+    assert (plan['cubiertas'] <= plan['plazas']).all()
+
+def test_candidatos_y_sin_capacidad():
+    scores = np.array([[95.0], [70.0]])
+    roles = _roles((1, 'FT'))
+    assert resolver_plan_staffing(scores, roles, np.full(2, 100.0), candidatos=np.array([False, True]))['asignaciones'] == [(1, 0, 70.0)]
+    plan = resolver_plan_staffing(scores, roles, np.zeros(2))
+    assert plan['sin_capacidad'] and plan['asignaciones'] == []
+    assert plan['vacios'] == [{'rol': 'Rol 0', 'plazas': 1, 'cubiertas': 0}]
+    # Con capacidad pero sin score suficiente no es falta de capacidad
+    assert not resolver_plan_staffing(scores / 10, roles, np.full(2, 100.0))['sin_capacidad']
@@ -0,0 +1,52 @@
+import json
+import os
+import numpy as np
+import pytest
+from benchmarks.generar_datos import escribir_dataset
+from modules.data_loader import load_json_file
+from modules.dataset import cargar_dataset
+from modules.ranking import filtrar_ranking, pagina_ranking
+from modules.streaming import puntuar_archivo_streaming
+from modules.talent_store import tipos_talento
+
+# --- Organización sintética pequeña (sin data/) ---
+
+@pytest.fixture
+def organizacion(tmp_path):
+    directorio = str(tmp_path / 'org')
+    escribir_dataset(directorio, 400, fraccion_externos=0.5, n_skills=40, n_roles=8, n_chapters=4, n_proyectos=6)
+    config = load_json_file(os.path.join(directorio, 'org_config.json'))
+    vision = load_json_file(os.path.join(directorio, 'vision_futura.json'))
+    return directorio, config, vision
+
+def test_top_k_igual_que_el_dataset(organizacion):
+    directorio, config, vision = organizacion
+    dataset = cargar_dataset(directorio)
+    resultado = puntuar_archivo_streaming(os.path.join(directorio, 'candidatos_externos.csv'), config, vision,
+                                          k=10, tamano_chunk=37, data_dir=directorio)
+    assert resultado['filas'] == 200
+    externos = tipos_talento(dataset.talent_df) == 'Externo'
+    for j, rol in enumerate(vision['roles_necesarios']):
+        scores = dataset.score_matrix['total'][:, j]
+        top = pagina_ranking(scores, filtrar_ranking(scores, externos), tamano_pagina=10)
+        streaming = resultado['top'][rol['id']]
+        assert [c['id_empleado'] for c in streaming] == dataset.talent_df['id_empleado'].take(top).tolist()
+        np.testing.assert_allclose([c['score'] for c in streaming], scores[top].round(2))
+
+def test_reanudar_con_checkpoint_da_el_mismo_resultado(organizacion, tmp_path):
+    directorio, config, vision = organizacion
+    archivo = os.path.join(directorio, 'candidatos_externos.csv')
+    completo = puntuar_archivo_streaming(archivo, config, vision, k=5, tamano_chunk=30, data_dir=directorio)
+    checkpoint = str(tmp_path / 'externos.ckpt.json')
+    parcial = puntuar_archivo_streaming(archivo, config, vision, k=5, tamano_chunk=30, checkpoint=checkpoint,
+                                        max_chunks=2, data_dir=directorio)
+    assert parcial['filas'] == 60
+    # El checkpoint apunta al byte donde empieza la fila 61 (cabecera + 60 filas)
+    with open(archivo, 'rb') as f:
+        leidos = sum(len(f.readline()) for _ in range(61))
+    with open(checkpoint, encoding='utf-8') as f:
+        assert json.load(f)['estado']['byte'] == leidos
+    reanudado = puntuar_archivo_streaming(archivo, config, vision, k=5, tamano_chunk=30, checkpoint=checkpoint,
+                                          data_dir=directorio)
+    assert reanudado['top'] == completo['top']
+    assert reanudado['estadisticas'] == completo['estadisticas']
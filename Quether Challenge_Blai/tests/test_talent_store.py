@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from benchmarks.generar_datos import escribir_dataset
+from modules.data_loader import load_all_data
+
+# --- Mismo talento como DataFrame y como TalentoCompacto ---
+
+@pytest.fixture(scope='module')
+def talentos(tmp_path_factory):
+    directorio = str(tmp_path_factory.mktemp('org'))
+    escribir_dataset(directorio, 60, fraccion_externos=0.5, n_skills=20, n_roles=4, n_chapters=3, n_proyectos=4)
+    return load_all_data(directorio)[2], load_all_data(directorio, compacto=True)[2]
+
+@pytest.mark.parametrize('columna', ['id_empleado', 'nombre', 'chapter', 'habilidades', 'responsabilidades_actuales',
+                                     'dedicación_actual', 'metadata'])
+def test_mascara_booleana_igual_que_el_dataframe(talentos, columna):
+    df, compacto = talentos
+    mascara = (df['id_empleado'] % 3 == 0).to_numpy()
+    esperado = df[columna][mascara].tolist()
+    assert list(compacto[columna].take(mascara)) == esperado
+    assert list(compacto[columna][mascara]) == esperado
+    assert compacto[mascara][columna].tolist() == esperado
+    assert compacto.iloc[mascara][columna].tolist() == esperado
+    assert list(compacto[columna].take(np.flatnonzero(mascara))) == esperado
+
+def test_mascara_de_otra_longitud(talentos):
+    _, compacto = talentos
+    with pytest.raises(IndexError):
+        compacto['nombre'].take(np.ones(len(compacto) - 1, dtype=bool))
+    with pytest.raises(IndexError):
+        compacto[np.ones(len(compacto) + 1, dtype=bool)]